@@ -0,0 +1,553 @@
+"""
+Bitboard representation of a chess position
+Each piece type of each color is stored as a 64 bit integer with one bit per square
+Square index is row * 8 + col, so a8 is bit 0 and h1 is bit 63 (same rows and cols as GameState.board)
+A position is a list of 14 bitboards: white pawn, knight, bishop, rook, queen, king, the same for black,
+then the white and the black occupancy
+
+Moves are packed integers, start square (6 bits), end square (6 bits), flags (4 bits) and the moving piece (4 bits)
+GameState only turns them into Move objects at its API edge, perft stays on the integers the whole way down:
+children are made by copying the 14 bitboards, and the last ply is counted from the target masks without
+listing the moves (bulk counting)
+
+Usage:
+position = BitboardPosition(gs.board)
+nodes = perft(position.boards, gs.whiteToMove, castlingMask(gs.currentCastlingRight),
+              enpassantSquare(gs.enpassantPossible), 4)
+"""
+
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+BLACK = 6 # Offset of the black bitboards
+WHITE_OCCUPANCY = 12
+BLACK_OCCUPANCY = 13
+PIECE_INDEX = {color + name: offset + pieceType
+               for color, offset in (('w', 0), ('b', BLACK))
+               for name, pieceType in (('p', PAWN), ('N', KNIGHT), ('B', BISHOP), ('R', ROOK), ('Q', QUEEN), ('K', KING))}
+
+# Move flags, bits 12 to 15 of a packed move
+ENPASSANT = 1
+CASTLE = 2
+PROMOTION = 4
+DOUBLE_PUSH = 8
+FLAG_SHIFT = 12
+PIECE_SHIFT = 16
+
+# Castling rights as a 4 bit mask
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+FULL_BOARD = (1 << 64) - 1
+FILE_A = sum(1 << (r * 8) for r in range(8))
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL_BOARD ^ FILE_A
+NOT_FILE_H = FULL_BOARD ^ FILE_H
+ROW_2 = 0xFF << 16 # Squares black pawns land on after a single step from their start row
+ROW_5 = 0xFF << 40 # Squares white pawns land on after a single step from their start row
+ROW_8 = 0xFF       # Promotion row for white
+ROW_1 = 0xFF << 56 # Promotion row for black
+
+# Ray directions as (dirRow, dirCol). Rays with a positive square step find their closest blocker at the lowest bit
+ROOK_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+# (row, col) of every square index
+SQUARE_COORDS = tuple(divmod(sq, 8) for sq in range(64))
+
+# Castling rights kept when a move starts or ends on each square, moving the king or a rook or capturing a rook
+# on its corner clears them
+CASTLING_KEPT = [15] * 64
+CASTLING_KEPT[60] = 15 ^ (WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_KEPT[63] = 15 ^ WHITE_KINGSIDE
+CASTLING_KEPT[56] = 15 ^ WHITE_QUEENSIDE
+CASTLING_KEPT[4] = 15 ^ (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_KEPT[7] = 15 ^ BLACK_KINGSIDE
+CASTLING_KEPT[0] = 15 ^ BLACK_QUEENSIDE
+
+
+def squareBit(r, c):
+    return 1 << (r * 8 + c)
+
+
+def buildLeaperTable(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        attacks = 0
+        for dr, dc in offsets:
+            if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+                attacks |= squareBit(r + dr, c + dc)
+        table.append(attacks)
+    return table
+
+
+def buildRayTable(direction):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        ray = 0
+        r += direction[0]
+        c += direction[1]
+        while 0 <= r < 8 and 0 <= c < 8:
+            ray |= squareBit(r, c)
+            r += direction[0]
+            c += direction[1]
+        table.append(ray)
+    return table
+
+
+KNIGHT_ATTACKS = buildLeaperTable(((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)))
+KING_ATTACKS = buildLeaperTable(((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)))
+# Squares attacked by a pawn of the given color standing on each square
+WHITE_PAWN_ATTACKS = buildLeaperTable(((-1, -1), (-1, 1)))
+BLACK_PAWN_ATTACKS = buildLeaperTable(((1, -1), (1, 1)))
+PAWN_ATTACKS = {'w': WHITE_PAWN_ATTACKS, 'b': BLACK_PAWN_ATTACKS}
+# (rays, positive) pairs, positive rays go towards higher square indices
+ROOK_RAYS = tuple((buildRayTable(d), d[0] * 8 + d[1] > 0) for d in ROOK_DIRECTIONS)
+BISHOP_RAYS = tuple((buildRayTable(d), d[0] * 8 + d[1] > 0) for d in BISHOP_DIRECTIONS)
+# Rays out of every square as (ray table, positive, orthogonal), for the pin and check scan around the king
+KING_RAYS = tuple((table, positive, True) for table, positive in ROOK_RAYS) + \
+            tuple((table, positive, False) for table, positive in BISHOP_RAYS)
+
+
+def slidingAttacks(sq, occupied, rays):
+    """
+    Classical ray lookup: take the full ray and cut it off behind the closest blocker
+    """
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def buildRelevantMasks(rays):
+    """
+    Squares whose occupancy can change the attacks from each square, the last square of every ray never blocks
+    """
+    masks = []
+    for sq in range(64):
+        mask = 0
+        for table, positive in rays:
+            ray = table[sq]
+            if ray:
+                last = ray.bit_length() - 1 if positive else (ray & -ray).bit_length() - 1
+                mask |= ray ^ (1 << last)
+        masks.append(mask)
+    return masks
+
+
+ROOK_MASKS = buildRelevantMasks(ROOK_RAYS)
+BISHOP_MASKS = buildRelevantMasks(BISHOP_RAYS)
+# Attacks by square and relevant occupancy, filled as positions come up so importing stays cheap
+ROOK_TABLES = [{} for _ in range(64)]
+BISHOP_TABLES = [{} for _ in range(64)]
+
+
+def rookAttacks(sq, occupied):
+    occupied &= ROOK_MASKS[sq]
+    attacks = ROOK_TABLES[sq].get(occupied)
+    if attacks is None:
+        attacks = ROOK_TABLES[sq][occupied] = slidingAttacks(sq, occupied, ROOK_RAYS)
+    return attacks
+
+
+def bishopAttacks(sq, occupied):
+    occupied &= BISHOP_MASKS[sq]
+    attacks = BISHOP_TABLES[sq].get(occupied)
+    if attacks is None:
+        attacks = BISHOP_TABLES[sq][occupied] = slidingAttacks(sq, occupied, BISHOP_RAYS)
+    return attacks
+
+
+if hasattr(int, "bit_count"): # Python 3.10
+    popCount = int.bit_count
+else:
+    def popCount(bb):
+        return bin(bb).count('1')
+
+
+def castlingMask(castleRights):
+    """
+    4 bit castling mask of a ChessEngine.CastleRights
+    """
+    return (castleRights.wks and WHITE_KINGSIDE) | (castleRights.wqs and WHITE_QUEENSIDE) | \
+        (castleRights.bks and BLACK_KINGSIDE) | (castleRights.bqs and BLACK_QUEENSIDE)
+
+
+def enpassantSquare(enpassantPossible):
+    """
+    Square index of a GameState.enpassantPossible, -1 when there is none
+    """
+    return enpassantPossible[0] * 8 + enpassantPossible[1] if enpassantPossible else -1
+
+
+def isSquareAttacked(boards, sq, enemy, occupied, captured=0):
+    """
+    Whether any piece of the enemy offset (0 or BLACK) not in the captured mask attacks sq given the occupancy
+    """
+    notCaptured = ~captured
+    if KNIGHT_ATTACKS[sq] & boards[enemy + KNIGHT] & notCaptured:
+        return True
+    pawnAttacks = BLACK_PAWN_ATTACKS if enemy == 0 else WHITE_PAWN_ATTACKS # Seen from sq, so the ally's direction
+    if pawnAttacks[sq] & boards[enemy + PAWN] & notCaptured:
+        return True
+    if KING_ATTACKS[sq] & boards[enemy + KING]:
+        return True
+    queens = boards[enemy + QUEEN]
+    diagonal = (boards[enemy + BISHOP] | queens) & notCaptured
+    if diagonal and bishopAttacks(sq, occupied) & diagonal:
+        return True
+    orthogonal = (boards[enemy + ROOK] | queens) & notCaptured
+    if orthogonal and rookAttacks(sq, occupied) & orthogonal:
+        return True
+    return False
+
+
+def inCheck(boards, whiteToMove):
+    ally, enemy = (0, BLACK) if whiteToMove else (BLACK, 0)
+    return isSquareAttacked(boards, boards[ally + KING].bit_length() - 1, enemy,
+                            boards[WHITE_OCCUPANCY] | boards[BLACK_OCCUPANCY])
+
+
+def getPinsAndCheckMask(boards, ally, enemy, kingSq, occupied, own):
+    """
+    Walks the eight rays out of the king once
+    Returns: pins (dict of pinned square to the squares it may still move to), checkMask, checkCount
+    checkMask holds the squares that capture or block the check, or every square when not in check
+    """
+    pins = {}
+    checkMask = 0
+    checkCount = 0
+    queens = boards[enemy + QUEEN]
+    orthogonalSliders = boards[enemy + ROOK] | queens
+    diagonalSliders = boards[enemy + BISHOP] | queens
+    for table, positive, orthogonal in KING_RAYS:
+        sliders = orthogonalSliders if orthogonal else diagonalSliders
+        if not sliders:
+            continue
+        ray = table[kingSq]
+        if not ray & sliders:
+            continue
+        blockers = ray & occupied
+        first = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+        firstBit = 1 << first
+        if firstBit & sliders:
+            checkMask |= ray ^ table[first]
+            checkCount += 1
+        elif firstBit & own:
+            blockers ^= firstBit
+            if blockers:
+                second = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+                if (1 << second) & sliders:
+                    pins[first] = ray ^ table[second]
+    pawnAttacks = WHITE_PAWN_ATTACKS if ally == 0 else BLACK_PAWN_ATTACKS
+    leapers = (KNIGHT_ATTACKS[kingSq] & boards[enemy + KNIGHT]) | (pawnAttacks[kingSq] & boards[enemy + PAWN])
+    if leapers:
+        checkMask |= leapers
+        checkCount += popCount(leapers)
+    if checkCount == 0:
+        checkMask = FULL_BOARD
+    return pins, checkMask, checkCount
+
+
+def generateMoves(boards, whiteToMove, castling, epSq, moves=None, capturesOnly=False):
+    """
+    Legal moves straight from the bitboards using the pins and checks on the king
+    Only king moves and en passant captures need an attack test, and those only toggle occupancy bits
+    moves: list the packed moves are appended to, None only counts them from the target masks
+    capturesOnly restricts the moves to captures and promotions, for the quiescence search
+    Returns: the number of legal moves
+    """
+    if whiteToMove:
+        ally, enemy = 0, BLACK
+        own, enemies = boards[WHITE_OCCUPANCY], boards[BLACK_OCCUPANCY]
+    else:
+        ally, enemy = BLACK, 0
+        own, enemies = boards[BLACK_OCCUPANCY], boards[WHITE_OCCUPANCY]
+    occupied = own | enemies
+    empty = FULL_BOARD ^ occupied
+    kingSq = boards[ally + KING].bit_length() - 1
+    pins, checkMask, checkCount = getPinsAndCheckMask(boards, ally, enemy, kingSq, occupied, own)
+    targetMask = enemies if capturesOnly else FULL_BOARD
+    notOwn = FULL_BOARD ^ own
+    count = 0
+
+    if checkCount < 2: # In double check only the king can move
+        # Pawns, generated target-first using shifts over the whole pawn set
+        pawns = boards[ally + PAWN]
+        pinnedPawns = 0
+        for sq in pins:
+            pinnedPawns |= (1 << sq) & pawns
+        freePawns = pawns ^ pinnedPawns
+        pawnPiece = (ally + PAWN) << PIECE_SHIFT
+        for pawnSet, freeSet in ((freePawns, True), (pinnedPawns, False)):
+            if not pawnSet:
+                continue
+            if whiteToMove:
+                single = (pawnSet >> 8) & empty
+                double = ((single & ROW_5) >> 8) & empty
+                leftCaptures = ((pawnSet & NOT_FILE_A) >> 9) & enemies
+                rightCaptures = ((pawnSet & NOT_FILE_H) >> 7) & enemies
+                steps = ((single, 8, 0), (double, 16, DOUBLE_PUSH), (leftCaptures, 9, 0), (rightCaptures, 7, 0))
+                promotionRow = ROW_8
+            else:
+                single = (pawnSet << 8) & empty
+                double = ((single & ROW_2) << 8) & empty
+                leftCaptures = ((pawnSet & NOT_FILE_A) << 7) & enemies
+                rightCaptures = ((pawnSet & NOT_FILE_H) << 9) & enemies
+                steps = ((single, -8, 0), (double, -16, DOUBLE_PUSH), (leftCaptures, -7, 0), (rightCaptures, -9, 0))
+                promotionRow = ROW_1
+            if capturesOnly: # Pushes only count when they promote
+                steps = ((single & promotionRow, steps[0][1], 0), steps[2], steps[3])
+            for targets, back, flags in steps:
+                targets &= checkMask
+                if not targets:
+                    continue
+                if freeSet and moves is None: # Promotions are queen only, so every target is one move
+                    count += popCount(targets)
+                    continue
+                while targets:
+                    bit = targets & -targets
+                    targets ^= bit
+                    endSq = bit.bit_length() - 1
+                    startSq = endSq + back
+                    if freeSet or bit & pins[startSq]:
+                        count += 1
+                        if moves is not None:
+                            moveFlags = flags | PROMOTION if bit & promotionRow else flags
+                            moves.append(startSq | endSq << 6 | moveFlags << FLAG_SHIFT | pawnPiece)
+        if epSq >= 0:
+            pawnAttacks = BLACK_PAWN_ATTACKS if whiteToMove else WHITE_PAWN_ATTACKS # Pawns that attack epSq
+            attackers = pawnAttacks[epSq] & pawns
+            while attackers:
+                bit = attackers & -attackers
+                attackers ^= bit
+                startSq = bit.bit_length() - 1
+                # Both pawns leave the row at once so test the king directly
+                capturedBit = 1 << (startSq - startSq % 8 + epSq % 8)
+                newOccupied = (occupied ^ bit ^ capturedBit) | (1 << epSq)
+                if not isSquareAttacked(boards, kingSq, enemy, newOccupied, capturedBit):
+                    count += 1
+                    if moves is not None:
+                        moves.append(startSq | epSq << 6 | ENPASSANT << FLAG_SHIFT | pawnPiece)
+
+        # Pieces, pinned knights can never move
+        pieceTargetMask = checkMask & targetMask & notOwn
+        rookMasks, rookTables, bishopMasks, bishopTables = ROOK_MASKS, ROOK_TABLES, BISHOP_MASKS, BISHOP_TABLES
+        for pieceType in (KNIGHT, BISHOP, ROOK, QUEEN):
+            bb = boards[ally + pieceType]
+            piece = (ally + pieceType) << PIECE_SHIFT
+            while bb:
+                bit = bb & -bb
+                bb ^= bit
+                startSq = bit.bit_length() - 1
+                if pieceType == KNIGHT:
+                    if startSq in pins:
+                        continue
+                    targets = KNIGHT_ATTACKS[startSq]
+                else:
+                    targets = 0
+                    if pieceType != ROOK:
+                        key = occupied & bishopMasks[startSq]
+                        attacks = bishopTables[startSq].get(key)
+                        targets = attacks if attacks is not None else bishopAttacks(startSq, key)
+                    if pieceType != BISHOP:
+                        key = occupied & rookMasks[startSq]
+                        attacks = rookTables[startSq].get(key)
+                        targets |= attacks if attacks is not None else rookAttacks(startSq, key)
+                targets &= pieceTargetMask
+                if startSq in pins:
+                    targets &= pins[startSq]
+                if moves is None:
+                    if targets:
+                        count += popCount(targets)
+                    continue
+                while targets:
+                    t = targets & -targets
+                    targets ^= t
+                    count += 1
+                    moves.append(startSq | (t.bit_length() - 1) << 6 | piece)
+
+    # King, tested with the king lifted off the board so it cannot hide behind itself
+    kingBit = 1 << kingSq
+    kingPiece = (ally + KING) << PIECE_SHIFT
+    targets = KING_ATTACKS[kingSq] & targetMask & notOwn
+    withoutKing = occupied ^ kingBit
+    while targets:
+        t = targets & -targets
+        targets ^= t
+        endSq = t.bit_length() - 1
+        if not isSquareAttacked(boards, endSq, enemy, withoutKing, t & enemies):
+            count += 1
+            if moves is not None:
+                moves.append(kingSq | endSq << 6 | kingPiece)
+
+    # Castling, the king may not start on, pass or land on an attacked square
+    if whiteToMove:
+        kingside, queenside = castling & WHITE_KINGSIDE, castling & WHITE_QUEENSIDE
+    else:
+        kingside, queenside = castling & BLACK_KINGSIDE, castling & BLACK_QUEENSIDE
+    if (kingside or queenside) and checkCount == 0 and kingSq % 8 == 4 and not capturesOnly:
+        if kingside and not occupied & ((1 << (kingSq + 1)) | (1 << (kingSq + 2))) and \
+                not isSquareAttacked(boards, kingSq + 1, enemy, occupied) and \
+                not isSquareAttacked(boards, kingSq + 2, enemy, occupied):
+            count += 1
+            if moves is not None:
+                moves.append(kingSq | (kingSq + 2) << 6 | CASTLE << FLAG_SHIFT | kingPiece)
+        if queenside and not occupied & ((1 << (kingSq - 1)) | (1 << (kingSq - 2)) | (1 << (kingSq - 3))) and \
+                not isSquareAttacked(boards, kingSq - 1, enemy, occupied) and \
+                not isSquareAttacked(boards, kingSq - 2, enemy, occupied):
+            count += 1
+            if moves is not None:
+                moves.append(kingSq | (kingSq - 2) << 6 | CASTLE << FLAG_SHIFT | kingPiece)
+    return count
+
+
+def makeMove(boards, move, whiteToMove):
+    """
+    Copy-make, the child position is a new list and boards is left as it was
+    Returns: the child's bitboards
+    """
+    child = boards[:]
+    startSq = move & 63
+    endSq = (move >> 6) & 63
+    flags = (move >> FLAG_SHIFT) & 15
+    piece = move >> PIECE_SHIFT
+    startBit = 1 << startSq
+    endBit = 1 << endSq
+    if whiteToMove:
+        ally, enemy, ownOccupancy, enemyOccupancy = 0, BLACK, WHITE_OCCUPANCY, BLACK_OCCUPANCY
+    else:
+        ally, enemy, ownOccupancy, enemyOccupancy = BLACK, 0, BLACK_OCCUPANCY, WHITE_OCCUPANCY
+    if endBit & child[enemyOccupancy]:
+        child[enemyOccupancy] ^= endBit
+        for captured in range(enemy, enemy + KING):
+            if child[captured] & endBit:
+                child[captured] ^= endBit
+                break
+    child[piece] ^= startBit
+    child[ally + QUEEN if flags & PROMOTION else piece] ^= endBit
+    child[ownOccupancy] ^= startBit | endBit
+    if flags & ENPASSANT:
+        capturedBit = 1 << (endSq + 8 if whiteToMove else endSq - 8)
+        child[enemy + PAWN] ^= capturedBit
+        child[enemyOccupancy] ^= capturedBit
+    elif flags & CASTLE:
+        if endSq > startSq:
+            rookBits = (1 << (endSq + 1)) | (1 << (endSq - 1))
+        else:
+            rookBits = (1 << (endSq - 2)) | (1 << (endSq + 1))
+        child[ally + ROOK] ^= rookBits
+        child[ownOccupancy] ^= rookBits
+    return child
+
+
+def perft(boards, whiteToMove, castling, epSq, depth):
+    """
+    Number of leaf nodes depth plies below the position, the last ply is bulk counted
+    castling: 4 bit mask, see castlingMask
+    epSq: en passant square index, -1 when there is none
+    """
+    if depth <= 1:
+        return generateMoves(boards, whiteToMove, castling, epSq) if depth == 1 else 1
+    moves = []
+    generateMoves(boards, whiteToMove, castling, epSq, moves)
+    nodes = 0
+    for move in moves:
+        startSq = move & 63
+        endSq = (move >> 6) & 63
+        childEpSq = (startSq + endSq) >> 1 if (move >> FLAG_SHIFT) & DOUBLE_PUSH else -1
+        nodes += perft(makeMove(boards, move, whiteToMove), not whiteToMove,
+                       castling & CASTLING_KEPT[startSq] & CASTLING_KEPT[endSq], childEpSq, depth - 1)
+    return nodes
+
+
+class BitboardPosition:
+    """
+    Piece bitboards kept in sync with a GameState board
+    Generates legal moves as packed integers, see generateMoves
+    """
+    def __init__(self, board):
+        self.boards = [0] * 14
+        for r in range(8):
+            for c in range(8):
+                if board[r][c] != '--':
+                    self.boards[PIECE_INDEX[board[r][c]]] |= squareBit(r, c)
+        self.boards[WHITE_OCCUPANCY] = 0
+        self.boards[BLACK_OCCUPANCY] = 0
+        for pieceType in range(PAWN, KING + 1):
+            self.boards[WHITE_OCCUPANCY] |= self.boards[pieceType]
+            self.boards[BLACK_OCCUPANCY] |= self.boards[BLACK + pieceType]
+
+    def makeMove(self, move):
+        """
+        Applies a ChessEngine.Move in place, undoMove with the same move reverts it
+        """
+        self.toggleMove(move)
+
+    def undoMove(self, move):
+        self.toggleMove(move) # Every change is an exclusive or, so undoing is making again
+
+    def toggleMove(self, move):
+        b = self.boards
+        startBit = squareBit(move.startRow, move.startCol)
+        endBit = squareBit(move.endRow, move.endCol)
+        moved = PIECE_INDEX[move.pieceMoved]
+        ownOccupancy = WHITE_OCCUPANCY if moved < BLACK else BLACK_OCCUPANCY
+        b[moved] ^= startBit
+        b[PIECE_INDEX[move.pieceMoved[0] + move.promotionPiece] if move.isPawnPromotion else moved] ^= endBit
+        b[ownOccupancy] ^= startBit | endBit
+        if move.pieceCaptured != '--':
+            capturedBit = squareBit(move.startRow, move.endCol) if move.isEnpassantMove else endBit
+            b[PIECE_INDEX[move.pieceCaptured]] ^= capturedBit
+            b[WHITE_OCCUPANCY + BLACK_OCCUPANCY - ownOccupancy] ^= capturedBit
+        if move.isCastleMove: # Rook hop
+            if move.endCol - move.startCol == 2:
+                rookBits = squareBit(move.endRow, move.endCol + 1) | squareBit(move.endRow, move.endCol - 1)
+            else:
+                rookBits = squareBit(move.endRow, move.endCol - 2) | squareBit(move.endRow, move.endCol + 1)
+            b[moved - KING + ROOK] ^= rookBits
+            b[ownOccupancy] ^= rookBits
+
+    def kingSquare(self, ally):
+        return self.boards[PIECE_INDEX[ally + 'K']].bit_length() - 1
+
+    def inCheck(self, whiteToMove):
+        return inCheck(self.boards, whiteToMove)
+
+    def pieceCount(self):
+        return popCount(self.boards[WHITE_OCCUPANCY] | self.boards[BLACK_OCCUPANCY])
+
+    def getLegalMoves(self, whiteToMove, enpassantPossible, castleRights, capturesOnly=False):
+        """
+        Returns: list of packed moves for a GameState's side to move, en passant square and CastleRights
+        """
+        moves = []
+        generateMoves(self.boards, whiteToMove, castlingMask(castleRights), enpassantSquare(enpassantPossible), moves,
+                      capturesOnly)
+        return moves
+
+    def hasLegalMove(self, whiteToMove, enpassantPossible):
+        """
+        Whether the side to move can move at all, the moves are only counted from the target masks
+        Castling is never needed, the king could also step to the square it passes
+        """
+        return generateMoves(self.boards, whiteToMove, 0, enpassantSquare(enpassantPossible)) > 0
+
+    def perft(self, whiteToMove, enpassantPossible, castleRights, depth):
+        return perft(self.boards, whiteToMove, castlingMask(castleRights), enpassantSquare(enpassantPossible), depth)
@@ -2,13 +2,40 @@
 Class responsible for storing information about state of chess game
 Determines valid moves at current position and keeps move log
 """
+import random
+
+import BitboardEngine
+import MailboxEngine
+
 HEXAPAWN = "HEXAPAWN"
+GARDNER = "GARDNER" # Chess on the 5x5 gardnerBoard, no castling, no en passant and no two square pawn moves
 CHESS = "Chess"
 WHITE = "WHITE"
 BLACK = "BLACK"
+# Move generation modes for chess
+MAKE_UNDO = "MAKE_UNDO"    # Make every pseudo-legal move and reject the ones that leave the king in check
+PIN_CHECK = "PIN_CHECK"    # Detect pins and checks first and only generate legal moves
+# Board backends for chess
+LIST_BOARD = "LIST_BOARD"  # Generate moves from the 8x8 list of strings
+BITBOARD = "BITBOARD"      # Keep bitboards in sync with the list and generate moves from them
+MAILBOX = "MAILBOX"        # Store the board in a flat 10x12 mailbox, self.board becomes a read-only view of it
+
+ORTHOGONAL_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+DIAGONAL_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KING_DIRECTIONS = ORTHOGONAL_DIRECTIONS + DIAGONAL_DIRECTIONS
+KNIGHT_JUMPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+
+# Zobrist keys, one random 64 bit number per piece per square (index row * 8 + col) plus game state
+# A fixed seed keeps keys identical between runs so hashes can be stored and compared
+zobristRandom = random.Random(20240601)
+ZOBRIST_PIECES = {piece: [zobristRandom.getrandbits(64) for _ in range(64)]
+                  for piece in ('wp', 'wR', 'wN', 'wB', 'wQ', 'wK', 'bp', 'bR', 'bN', 'bB', 'bQ', 'bK')}
+ZOBRIST_BLACK_TO_MOVE = zobristRandom.getrandbits(64)
+ZOBRIST_CASTLING = [zobristRandom.getrandbits(64) for _ in range(4)] # wks, bks, wqs, bqs
+ZOBRIST_ENPASSANT = [zobristRandom.getrandbits(64) for _ in range(8)] # By column of the en passant square
 
 class GameState:
-    def __init__(self, gameMode=CHESS):
+    def __init__(self, gameMode=CHESS, moveGeneration=PIN_CHECK, boardBackend=LIST_BOARD, verifyZobrist=False):
         """
         Board is a 8x8 2 dimensional list
         Each element of the list is 2 characters
@@ -18,6 +45,8 @@ class GameState:
         """
 
         self.gameMode = gameMode
+        self.moveGeneration = moveGeneration
+        self.boardBackend = boardBackend
         
         self.board = [
             ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
@@ -77,11 +106,137 @@ class GameState:
             self.currentCastlingRight.wqs,
             self.currentCastlingRight.bqs)]
         self.winner = None
+        self.bitboards = BitboardEngine.BitboardPosition(self.board) if boardBackend == BITBOARD else None
+        self.mailbox = None
+        if boardBackend == MAILBOX:
+            self.mailbox = MailboxEngine.MailboxPosition(self.board)
+            self.board = MailboxEngine.MailboxBoard(self.mailbox)
+        # Debug mode, compare the incremental key with a full recompute after every move
+        self.verifyZobrist = verifyZobrist
+        self.zobristKey = self.computeZobristKey()
+        self.zobristLog = [self.zobristKey]
+        # Incremental evaluation, set by the AI with setEvaluationTable
+        self.evaluationTable = None
+        self.boardScore = 0
+        # Move counters for FEN, the halfmove clock counts moves since the last capture or pawn move
+        self.halfmoveClock = 0
+        self.halfmoveClockLog = [self.halfmoveClock]
+        self.fullmoveNumber = 1
+
+    @classmethod
+    def from_fen(cls, fen, **gameStateArgs):
+        """
+        Creates a GameState from a FEN string, extra arguments are passed to the constructor
+        """
+        gs = cls(**gameStateArgs)
+        gs.setFen(fen)
+        return gs
+
+    def setFen(self, fen):
+        """
+        Replaces the position with the one in a FEN string and clears the move log
+        Fields after the board are optional and default to white to move, no castling and no en passant
+        The number of ranks decides the board size so smaller boards can be loaded too
+        """
+        fields = fen.split()
+        board = []
+        for rankText in fields[0].split('/'):
+            row = []
+            for char in rankText:
+                if char.isdigit():
+                    row.extend(['--'] * int(char))
+                elif char.lower() in 'pnbrqk':
+                    row.append(('w' if char.isupper() else 'b') + (char.upper() if char.lower() != 'p' else 'p'))
+                else:
+                    raise ValueError("Invalid piece %r in FEN %r" % (char, fen))
+            board.append(row)
+        if any(len(row) != len(board) for row in board):
+            raise ValueError("FEN board is not square: %r" % fen)
+        self.board = board
+        for r in range(len(board)):
+            for c in range(len(board)):
+                if board[r][c] == 'wK':
+                    self.whiteKingLocation = (r, c)
+                elif board[r][c] == 'bK':
+                    self.blackKingLocation = (r, c)
+        self.whiteToMove = len(fields) < 2 or fields[1] == 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        self.currentCastlingRight = CastleRights('K' in castling, 'k' in castling, 'Q' in castling, 'q' in castling)
+        self.castleRightsLog = [CastleRights('K' in castling, 'k' in castling, 'Q' in castling, 'q' in castling)]
+        enpassant = fields[3] if len(fields) > 3 else '-'
+        if enpassant != '-':
+            self.enpassantPossible = (len(board) - int(enpassant[1:]), Move.filesToCols[enpassant[0]])
+        else:
+            self.enpassantPossible = ()
+        self.enpassantPossibleLog = [self.enpassantPossible]
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+        self.halfmoveClockLog = [self.halfmoveClock]
+        self.fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+        self.moveLog = []
+        self.pins = []
+        self.checks = []
+        self.checkmate = False
+        self.stalemate = False
+        self.winner = None
+        if self.bitboards is not None:
+            self.bitboards = BitboardEngine.BitboardPosition(self.board) if len(board) == 8 else None
+        if self.boardBackend == MAILBOX:
+            self.mailbox = MailboxEngine.MailboxPosition(board) if len(board) == 8 else None
+            if self.mailbox is not None:
+                self.board = MailboxEngine.MailboxBoard(self.mailbox)
+        self.resetZobrist()
+        self.resetBoardScore()
+
+    def copy(self):
+        """
+        Independent GameState with the same position and settings, for searching in another thread
+        The move log is not copied, undoMove on the copy can't go back past the current position
+        """
+        gs = GameState(self.gameMode, self.moveGeneration, self.boardBackend, self.verifyZobrist)
+        gs.setFen(self.to_fen())
+        return gs
+
+    def to_fen(self):
+        """
+        Returns the current position as a FEN string
+        """
+        ranks = []
+        for row in self.board:
+            rankText = ''
+            empty = 0
+            for piece in row:
+                if piece == '--':
+                    empty += 1
+                    continue
+                if empty:
+                    rankText += str(empty)
+                    empty = 0
+                rankText += piece[1].upper() if piece[0] == 'w' else piece[1].lower()
+            if empty:
+                rankText += str(empty)
+            ranks.append(rankText)
+        castling = ''
+        if self.currentCastlingRight.wks:
+            castling += 'K'
+        if self.currentCastlingRight.wqs:
+            castling += 'Q'
+        if self.currentCastlingRight.bks:
+            castling += 'k'
+        if self.currentCastlingRight.bqs:
+            castling += 'q'
+        if self.enpassantPossible:
+            enpassant = Move.colsToFiles[self.enpassantPossible[1]] + str(len(self.board) - self.enpassantPossible[0])
+        else:
+            enpassant = '-'
+        return "%s %s %s %s %d %d" % ('/'.join(ranks), 'w' if self.whiteToMove else 'b', castling or '-',
+                                      enpassant, self.halfmoveClock, self.fullmoveNumber)
 
     def makeMove(self, move):
 
-        self.board[move.startRow][move.startCol] = '--' # Set row where piece moved from to nothing
-        self.board[move.endRow][move.endCol] = move.pieceMoved # Set new square equal to piece moved
+        if self.mailbox is not None: # self.board is a view of the mailbox, so the move is written there
+            self.mailbox.makeMove(move)
+        else:
+            self.makeMoveOnBoard(move)
         self.moveLog.append(move)
         self.whiteToMove = not self.whiteToMove
         # Update king location if moves
@@ -89,12 +244,6 @@ class GameState:
             self.whiteKingLocation = (move.endRow, move.endCol)
         if move.pieceMoved == 'bK':
             self.blackKingLocation = (move.endRow, move.endCol)
-        # If move is a Pawn Promotion then promote to queen (Need to add selection functionality)
-        if move.isPawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + 'Q'
-        # If move was an en passant move then need special logic for clearing squares
-        if move.isEnpassantMove:
-            self.board[move.startRow][move.endCol] = '--'
         # More logic on en passant 
         if move.pieceMoved[1] == 'p' and abs(move.startRow - move.endRow) == 2:
             self.enpassantPossible = ((move.startRow + move.endRow) // 2, move.startCol)
@@ -103,6 +252,34 @@ class GameState:
 
         self.enpassantPossibleLog.append(self.enpassantPossible)
 
+        self.updateCastleRights(move)
+        self.castleRightsLog.append(CastleRights(
+            self.currentCastlingRight.wks,
+            self.currentCastlingRight.bks,
+            self.currentCastlingRight.wqs,
+            self.currentCastlingRight.bqs))
+        if self.bitboards is not None:
+            self.bitboards.makeMove(move)
+        self.updateZobristKey(move)
+        if self.evaluationTable is not None:
+            self.boardScore += self.evaluationDelta(move)
+        self.halfmoveClock = 0 if move.pieceMoved[1] == 'p' or move.isCapture else self.halfmoveClock + 1
+        self.halfmoveClockLog.append(self.halfmoveClock)
+        if self.whiteToMove: # Black just moved
+            self.fullmoveNumber += 1
+
+    def makeMoveOnBoard(self, move):
+        """
+        Writes a move to the list board
+        """
+        self.board[move.startRow][move.startCol] = '--' # Set row where piece moved from to nothing
+        self.board[move.endRow][move.endCol] = move.pieceMoved # Set new square equal to piece moved
+        # If move is a Pawn Promotion then the pawn becomes the promotion piece, a queen unless another was chosen
+        if move.isPawnPromotion:
+            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + move.promotionPiece
+        # If move was an en passant move then need special logic for clearing squares
+        if move.isEnpassantMove:
+            self.board[move.startRow][move.endCol] = '--'
         if move.isCastleMove: # Unique logic for castle move
             if move.endCol - move.startCol == 2: # If it is a kingside castle move
                 self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1]
@@ -111,12 +288,23 @@ class GameState:
                 self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2]
                 self.board[move.endRow][move.endCol - 2] = '--'
 
-        self.updateCastleRights(move)
-        self.castleRightsLog.append(CastleRights(
-            self.currentCastlingRight.wks,
-            self.currentCastlingRight.bks,
-            self.currentCastlingRight.wqs,
-            self.currentCastlingRight.bqs))
+    def undoMoveOnBoard(self, move):
+        """
+        Takes a move back on the list board
+        """
+        self.board[move.startRow][move.startCol] = move.pieceMoved # Move piece back
+        self.board[move.endRow][move.endCol] = move.pieceCaptured # Move piece that was just captured back
+        if move.isEnpassantMove:
+            # we make the landing square blank as it was
+            self.board[move.endRow][move.endCol] = "--"
+            self.board[move.startRow][move.endCol] = move.pieceCaptured
+        if move.isCastleMove:
+            if move.endCol - move.startCol == 2:
+                self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 1]
+                self.board[move.endRow][move.endCol - 1] = '--'
+            else:
+                self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][move.endCol + 1]
+                self.board[move.endRow][move.endCol + 1] = '--'
 
     def undoMove(self):
         """
@@ -124,8 +312,10 @@ class GameState:
         """
         if len(self.moveLog) != 0:
             move = self.moveLog.pop() # Pop most recently added move out of the log
-            self.board[move.startRow][move.startCol] = move.pieceMoved # Move piece back
-            self.board[move.endRow][move.endCol] = move.pieceCaptured # Move piece that was just captured back
+            if self.mailbox is not None:
+                self.mailbox.undoMove(move)
+            else:
+                self.undoMoveOnBoard(move)
             self.whiteToMove = not self.whiteToMove
             # Update king's position if necessary
             if move.pieceMoved == 'wK':
@@ -133,10 +323,6 @@ class GameState:
             if move.pieceMoved == 'bK':
                 self.blackKingLocation = (move.startRow, move.startCol)
 
-            if move.isEnpassantMove:
-                # we make the landing square blank as it was
-                self.board[move.endRow][move.endCol] = "--"
-                self.board[move.startRow][move.endCol] = move.pieceCaptured
             self.enpassantPossibleLog.pop()
             self.enpassantPossible = self.enpassantPossibleLog[-1]
 
@@ -144,17 +330,116 @@ class GameState:
             newRights = self.castleRightsLog[-1]
             self.currentCastlingRight = CastleRights(newRights.wks, newRights.bks, newRights.wqs, newRights.bqs)
 
-            if move.isCastleMove:
-                if move.endCol - move.startCol == 2:
-                    self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 1]
-                    self.board[move.endRow][move.endCol - 1] = '--'
-                else:
-                    self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][move.endCol + 1]
-                    self.board[move.endRow][move.endCol + 1] = '--'
+            if self.bitboards is not None:
+                self.bitboards.undoMove(move)
+            if self.evaluationTable is not None:
+                self.boardScore -= self.evaluationDelta(move)
+            self.zobristLog.pop()
+            self.zobristKey = self.zobristLog[-1]
+            self.halfmoveClockLog.pop()
+            self.halfmoveClock = self.halfmoveClockLog[-1]
+            if not self.whiteToMove: # Undoing a black move
+                self.fullmoveNumber -= 1
+            if self.verifyZobrist:
+                self.checkZobristKey()
 
             self.checkmate = False
             self.stalemate = False
 
+    def updateZobristKey(self, move):
+        """
+        Updates the Zobrist key for a move that was just made and stores it in the hash log
+        Only the squares the move touched are hashed in or out
+        """
+        key = self.zobristKey
+        startSq = move.startRow * 8 + move.startCol
+        endSq = move.endRow * 8 + move.endCol
+        key ^= ZOBRIST_PIECES[move.pieceMoved][startSq]
+        if move.isEnpassantMove:
+            key ^= ZOBRIST_PIECES[move.pieceCaptured][move.startRow * 8 + move.endCol]
+        elif move.pieceCaptured != '--':
+            key ^= ZOBRIST_PIECES[move.pieceCaptured][endSq]
+        key ^= ZOBRIST_PIECES[self.board[move.endRow][move.endCol]][endSq] # Promoted piece if it was a promotion
+        if move.isCastleMove:
+            rookKeys = ZOBRIST_PIECES[move.pieceMoved[0] + 'R']
+            if move.endCol - move.startCol == 2:
+                key ^= rookKeys[endSq + 1] ^ rookKeys[endSq - 1]
+            else:
+                key ^= rookKeys[endSq - 2] ^ rookKeys[endSq + 1]
+        key ^= castleRightsKey(self.castleRightsLog[-2]) ^ castleRightsKey(self.castleRightsLog[-1])
+        key ^= enpassantKey(self.enpassantPossibleLog[-2]) ^ enpassantKey(self.enpassantPossible)
+        key ^= ZOBRIST_BLACK_TO_MOVE
+        self.zobristKey = key
+        self.zobristLog.append(key)
+        if self.verifyZobrist:
+            self.checkZobristKey()
+
+    def computeZobristKey(self):
+        """
+        Hashes the whole position from scratch
+        """
+        key = 0
+        for r in range(len(self.board)):
+            for c in range(len(self.board[r])):
+                piece = self.board[r][c]
+                if piece != '--':
+                    key ^= ZOBRIST_PIECES[piece][r * 8 + c]
+        if not self.whiteToMove:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        key ^= castleRightsKey(self.currentCastlingRight)
+        key ^= enpassantKey(self.enpassantPossible)
+        return key
+
+    def checkZobristKey(self):
+        expected = self.computeZobristKey()
+        if self.zobristKey != expected:
+            raise RuntimeError("Incremental Zobrist key %016x does not match recomputed key %016x after %d moves"
+                               % (self.zobristKey, expected, len(self.moveLog)))
+
+    def setEvaluationTable(self, evaluationTable):
+        """
+        evaluationTable maps each piece to a list of 64 values indexed by row * 8 + col
+        White values are positive and black values negative, boardScore is then kept as their sum
+        """
+        self.evaluationTable = evaluationTable
+        self.resetBoardScore()
+
+    def resetBoardScore(self):
+        self.boardScore = 0
+        if self.evaluationTable is not None:
+            for r in range(len(self.board)):
+                for c in range(len(self.board[r])):
+                    piece = self.board[r][c]
+                    if piece != '--':
+                        self.boardScore += self.evaluationTable[piece][r * 8 + c]
+
+    def evaluationDelta(self, move):
+        """
+        Change in boardScore caused by move, add it after making the move and subtract it after undoing it
+        """
+        table = self.evaluationTable
+        endSq = move.endRow * 8 + move.endCol
+        placedPiece = move.pieceMoved[0] + move.promotionPiece if move.isPawnPromotion else move.pieceMoved
+        delta = table[placedPiece][endSq] - table[move.pieceMoved][move.startRow * 8 + move.startCol]
+        if move.isEnpassantMove:
+            delta -= table[move.pieceCaptured][move.startRow * 8 + move.endCol]
+        elif move.pieceCaptured != '--':
+            delta -= table[move.pieceCaptured][endSq]
+        if move.isCastleMove:
+            rookTable = table[move.pieceMoved[0] + 'R']
+            if move.endCol - move.startCol == 2:
+                delta += rookTable[endSq - 1] - rookTable[endSq + 1]
+            else:
+                delta += rookTable[endSq + 1] - rookTable[endSq - 2]
+        return delta
+
+    def resetZobrist(self):
+        """
+        Rehashes the position and restarts the hash log, needed after the board is replaced
+        """
+        self.zobristKey = self.computeZobristKey()
+        self.zobristLog = [self.zobristKey]
+
     def updateCastleRights(self, move):
         if move.pieceMoved == 'wK':
             self.currentCastlingRight.wks = False
@@ -197,11 +482,21 @@ class GameState:
         Very slow, first place to make improvements
         """
         moveFunction = {CHESS: self.getChessMoves,
+                        GARDNER: self.getChessMoves,
                         HEXAPAWN: self.getHexapawnMoves,}
         return moveFunction[self.gameMode]()
 
     
     def getChessMoves(self):
+        if self.bitboards is not None:
+            return self.getChessMovesBitboard()
+        if self.mailbox is not None:
+            return self.getChessMovesMailbox()
+        moveFunction = {MAKE_UNDO: self.getChessMovesMakeUndo,
+                        PIN_CHECK: self.getChessMovesPinCheck}
+        return moveFunction[self.moveGeneration]()
+
+    def getChessMovesMakeUndo(self):
         tempEnpassantPossible = self.enpassantPossible
         tempCastleRights = CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.bks,
                                         self.currentCastlingRight.wqs, self.currentCastlingRight.bqs)
@@ -222,8 +517,215 @@ class GameState:
             self.whiteToMove = not self.whiteToMove
             self.undoMove()
         # 5) if they do attack your king, not a valid move
-        if len(moves) == 0 or len(pieces) == 2:
-            if self.inCheck():
+        self.updateGameOver(moves, len(pieces), (len(moves) == 0 or len(pieces) == 2) and self.inCheck())
+        # to generate castle moves
+        self.enpassantPossible = tempEnpassantPossible
+        self.currentCastlingRight = tempCastleRights
+        return moves
+
+    def getChessMovesPinCheck(self):
+        """
+        Generates legal moves directly using the pins and checks on the king
+        Returns the same moves, in the same order, as getChessMovesMakeUndo
+        """
+        inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        moves, pieces = self.getAllPossibleMoves()
+        if not inCheck:
+            if self.whiteToMove:
+                self.getCastleMoves(self.whiteKingLocation[0], self.whiteKingLocation[1], moves)
+            else:
+                self.getCastleMoves(self.blackKingLocation[0], self.blackKingLocation[1], moves)
+        legalMoves = self.filterLegalMoves(moves)
+        self.updateGameOver(legalMoves, len(pieces), inCheck)
+        return legalMoves
+
+    def getCaptureMoves(self):
+        """
+        Legal captures and promotions only, used by the quiescence search
+        The full move list is never built so the checkmate and stalemate flags are left alone
+        """
+        if self.gameMode == HEXAPAWN:
+            return [move for move in self.getValidMoves() if move.isCapture or move.isPawnPromotion]
+        if self.bitboards is not None:
+            return self.packedToMoves(self.bitboards.getLegalMoves(self.whiteToMove, self.enpassantPossible,
+                                                                   self.currentCastlingRight, capturesOnly=True))
+        if self.mailbox is not None:
+            return self.toMoves(self.mailbox.getLegalMoves(self.whiteToMove, self.enpassantPossible,
+                                                           self.currentCastlingRight, capturesOnly=True),
+                                self.mailbox.toList())
+        inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        return self.filterLegalMoves(self.getAllPossibleCaptures())
+
+    def hasLegalMove(self, inCheck=None):
+        """
+        Whether the side to move can move at all, stops at the first piece with a legal move
+        Used by the quiescence search to find stalemates, the checkmate and stalemate flags are left alone
+        inCheck: pass it when already known, out of check a piece off the king's lines can't be pinned
+        so on the list board its moves are legal without looking for pins
+        Castling is never needed, the king could also step to the square it passes
+        """
+        if self.gameMode == HEXAPAWN:
+            return len(self.getValidMoves()) > 0
+        if self.bitboards is not None:
+            return self.bitboards.hasLegalMove(self.whiteToMove, self.enpassantPossible)
+        if self.mailbox is not None:
+            return self.mailbox.hasLegalMove(self.whiteToMove, self.enpassantPossible)
+        moveFunctions = self.getMoveFunctions()
+        ally = 'w' if self.whiteToMove else 'b'
+        kingRow, kingCol = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        if inCheck is None:
+            inCheck = self.inCheck()
+        if not inCheck:
+            for r, row in enumerate(self.board):
+                for c, piece in enumerate(row):
+                    if piece[0] == ally and r != kingRow and c != kingCol and abs(r - kingRow) != abs(c - kingCol):
+                        moves = []
+                        moveFunctions[piece[1]](r, c, moves)
+                        # En passant removes a second pawn, which can still uncover the king
+                        if any(not move.isEnpassantMove for move in moves):
+                            return True
+        inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        for r in range(len(self.board)):
+            for c in range(len(self.board[r])):
+                piece = self.board[r][c]
+                if piece[0] == ally:
+                    moves = []
+                    moveFunctions[piece[1]](r, c, moves)
+                    if self.filterLegalMoves(moves):
+                        return True
+        return False
+
+    def getMoveFunctions(self):
+        """
+        Pseudo-legal move generator of each piece type, called as function(r, c, moves)
+        """
+        return {'p': self.getPawnMoves, 'R': self.getRookMoves, 'B': self.getBishopMoves,
+                'N': self.getKnightMoves, 'Q': self.getQueenMoves, 'K': self.getKingMoves}
+
+    def getPieceMoves(self, pieceType):
+        """
+        Legal moves of the pieces of one type of the side to move, pieceType is a letter like 'N' or 'p'
+        King moves include castling, used by the PGN reader so it doesn't build the whole move list
+        Only the moves of that piece become Move objects, the checkmate and stalemate flags are left alone
+        """
+        if self.gameMode == HEXAPAWN:
+            return [move for move in self.getValidMoves() if move.pieceMoved[1] == pieceType]
+        piece = ('w' if self.whiteToMove else 'b') + pieceType
+        if self.bitboards is not None:
+            pieceIndex = BitboardEngine.PIECE_INDEX[piece]
+            return self.packedToMoves([move for move in self.bitboards.getLegalMoves(
+                self.whiteToMove, self.enpassantPossible, self.currentCastlingRight)
+                if move >> BitboardEngine.PIECE_SHIFT == pieceIndex])
+        if self.mailbox is not None: # The mailbox view is read-only, filterLegalMoves can't try king moves on it
+            board = self.mailbox.toList()
+            return self.toMoves([move for move in self.mailbox.getLegalMoves(
+                self.whiteToMove, self.enpassantPossible, self.currentCastlingRight)
+                if board[move[0] // 8][move[0] % 8] == piece], board)
+        inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        moveFunction = self.getMoveFunctions()[pieceType]
+        moves = []
+        for r, row in enumerate(self.board):
+            for c, square in enumerate(row):
+                if square == piece:
+                    moveFunction(r, c, moves)
+                    if pieceType == 'K' and not inCheck:
+                        self.getCastleMoves(r, c, moves)
+        return self.filterLegalMoves(moves)
+
+    def filterLegalMoves(self, moves):
+        """
+        Keeps the pseudo-legal moves that are legal given self.pins and self.checks
+        Returns the moves in the order they were given
+        """
+        if self.whiteToMove:
+            kingRow, kingCol = self.whiteKingLocation
+        else:
+            kingRow, kingCol = self.blackKingLocation
+        pinDirections = {(pin[0], pin[1]): (pin[2], pin[3]) for pin in self.pins}
+        validSquares = None # Squares a piece other than the king can move to when in check
+        if len(self.checks) == 1:
+            checkRow, checkCol, dirRow, dirCol = self.checks[0]
+            if self.board[checkRow][checkCol][1] == 'N': # Knight checks can only be answered by capturing the knight
+                validSquares = {(checkRow, checkCol)}
+            else: # Otherwise capture the checking piece or block the ray between it and the king
+                validSquares = set()
+                for i in range(1, len(self.board)):
+                    square = (kingRow + dirRow * i, kingCol + dirCol * i)
+                    validSquares.add(square)
+                    if square == (checkRow, checkCol):
+                        break
+
+        legalMoves = []
+        for move in moves:
+            if move.startRow == kingRow and move.startCol == kingCol:
+                # Castle moves were already checked for attacked squares
+                if move.isCastleMove or self.isKingMoveSafe(move):
+                    legalMoves.append(move)
+                continue
+            if len(self.checks) > 1: # Double check, only the king can move
+                continue
+            pin = pinDirections.get((move.startRow, move.startCol))
+            if pin is not None and (move.endRow - move.startRow) * pin[1] != (move.endCol - move.startCol) * pin[0]:
+                continue # Pinned pieces can only move along the pin
+            if validSquares is not None and (move.endRow, move.endCol) not in validSquares:
+                if not (move.isEnpassantMove and (move.startRow, move.endCol) in validSquares):
+                    continue
+            if move.isEnpassantMove and not self.isEnpassantLegal(move):
+                continue
+            legalMoves.append(move)
+        return legalMoves
+
+    def getChessMovesBitboard(self):
+        """
+        Generates legal moves from the bitboards and wraps them in Move objects
+        """
+        moves = self.packedToMoves(self.bitboards.getLegalMoves(self.whiteToMove, self.enpassantPossible,
+                                                                self.currentCastlingRight))
+        pieceCount = self.bitboards.pieceCount()
+        inCheck = (len(moves) == 0 or pieceCount == 2) and self.bitboards.inCheck(self.whiteToMove)
+        self.updateGameOver(moves, pieceCount, inCheck)
+        return moves
+
+    def getChessMovesMailbox(self):
+        """
+        Generates legal moves from the mailbox and wraps them in Move objects
+        """
+        moves = self.toMoves(self.mailbox.getLegalMoves(self.whiteToMove, self.enpassantPossible,
+                                                        self.currentCastlingRight), self.mailbox.toList())
+        pieceCount = self.mailbox.pieceCount()
+        inCheck = (len(moves) == 0 or pieceCount == 2) and self.mailbox.inCheck(self.whiteToMove)
+        self.updateGameOver(moves, pieceCount, inCheck)
+        return moves
+
+    def packedToMoves(self, packedMoves):
+        """
+        Wraps the packed integer moves of the bitboard generator in Move objects
+        """
+        coords = BitboardEngine.SQUARE_COORDS
+        board = self.board
+        flagShift = BitboardEngine.FLAG_SHIFT
+        return [Move(coords[move & 63], coords[(move >> 6) & 63], board,
+                     isEnpassantMove=bool((move >> flagShift) & BitboardEngine.ENPASSANT),
+                     isCastleMove=bool((move >> flagShift) & BitboardEngine.CASTLE))
+                for move in packedMoves]
+
+    def toMoves(self, bitboardMoves, board=None):
+        """
+        Wraps the (startSq, endSq, isEnpassantMove, isCastleMove) tuples of the mailbox generator in Move objects
+        board is an optional list copy of self.board to read the pieces from
+        """
+        coords = BitboardEngine.SQUARE_COORDS
+        board = self.board if board is None else board
+        return [Move(coords[startSq], coords[endSq], board,
+                     isEnpassantMove=isEnpassantMove, isCastleMove=isCastleMove)
+                for startSq, endSq, isEnpassantMove, isCastleMove in bitboardMoves]
+
+    def updateGameOver(self, moves, pieceCount, inCheck):
+        """
+        Sets checkmate and stalemate flags after generating the moves of the side to move
+        """
+        if len(moves) == 0 or pieceCount == 2:
+            if inCheck:
                 self.checkmate = True
                 if self.whiteToMove:
                     self.winner = WHITE
@@ -234,11 +736,82 @@ class GameState:
         else:
             self.checkmate = False
             self.stalemate = False
-        # to generate castle moves
-        self.enpassantPossible = tempEnpassantPossible
-        self.currentCastlingRight = tempCastleRights
-        return moves
-    
+
+    def checkForPinsAndChecks(self):
+        """
+        Looks outwards from the king of the side to move for pinned pieces and checking pieces
+        Pins and checks are stored as (row, col, dirRow, dirCol) with the direction going away from the king
+        Returns: inCheck (bool), pins (list), checks (list)
+        """
+        pins = []
+        checks = []
+        inCheck = False
+        if self.whiteToMove:
+            enemyTeam, allyTeam = 'b', 'w'
+            startRow, startCol = self.whiteKingLocation
+        else:
+            enemyTeam, allyTeam = 'w', 'b'
+            startRow, startCol = self.blackKingLocation
+        size = len(self.board)
+        # First four directions are orthogonal, last four are diagonal
+        for j in range(len(KING_DIRECTIONS)):
+            d = KING_DIRECTIONS[j]
+            possiblePin = ()
+            for i in range(1, size):
+                endRow = startRow + d[0] * i
+                endCol = startCol + d[1] * i
+                if not (0 <= endRow < size and 0 <= endCol < size):
+                    break
+                endPiece = self.board[endRow][endCol]
+                if endPiece[0] == allyTeam and endPiece[1] != 'K':
+                    if possiblePin == (): # First allied piece could be pinned
+                        possiblePin = (endRow, endCol, d[0], d[1])
+                    else: # Second allied piece so no pin or check in this direction
+                        break
+                elif endPiece[0] == enemyTeam:
+                    pieceType = endPiece[1]
+                    # White pawns attack upwards (directions 6, 7 from the king), black pawns downwards (4, 5)
+                    if (j <= 3 and pieceType == 'R') or (j >= 4 and pieceType == 'B') or pieceType == 'Q' or \
+                            (i == 1 and pieceType == 'K') or \
+                            (i == 1 and pieceType == 'p' and ((enemyTeam == 'w' and j >= 6) or (enemyTeam == 'b' and 4 <= j <= 5))):
+                        if possiblePin == (): # No piece blocking so it is a check
+                            inCheck = True
+                            checks.append((endRow, endCol, d[0], d[1]))
+                        else: # Piece blocking so it is a pin
+                            pins.append(possiblePin)
+                    break
+        # Knights jump over pieces so they can check but never pin
+        for j in KNIGHT_JUMPS:
+            endRow = startRow + j[0]
+            endCol = startCol + j[1]
+            if 0 <= endRow < size and 0 <= endCol < size:
+                endPiece = self.board[endRow][endCol]
+                if endPiece[0] == enemyTeam and endPiece[1] == 'N':
+                    inCheck = True
+                    checks.append((endRow, endCol, j[0], j[1]))
+        return inCheck, pins, checks
+
+    def isKingMoveSafe(self, move):
+        """
+        Lifts the king off the board and checks whether its destination square is attacked
+        """
+        self.board[move.startRow][move.startCol] = '--'
+        safe = not self.squareUnderAttack(move.endRow, move.endCol)
+        self.board[move.startRow][move.startCol] = move.pieceMoved
+        return safe
+
+    def isEnpassantLegal(self, move):
+        """
+        En passant removes two pawns from the same row, which can expose the king along that row
+        Rare enough to simply make the move and look for checks
+        """
+        self.makeMove(move)
+        self.whiteToMove = not self.whiteToMove
+        inCheck = self.inCheck()
+        self.whiteToMove = not self.whiteToMove
+        self.undoMove()
+        return not inCheck
+
     def getHexapawnMoves(self):
         moves, pieces = self.getAllPossibleMoves()
         for i in range(len(moves) - 1, -1, -1):
@@ -273,17 +846,104 @@ class GameState:
 
     def squareUnderAttack(self, r, c):
         """
-        Helper method for determining if a square is under attack
-        Used for castling logic
+        Helper method for determining if a square is attacked by the opponent of the side to move
+        Looks outwards from the square for attacking pieces instead of generating the opponent's moves
+        Used for check detection and castling logic
         """
-        self.whiteToMove = not self.whiteToMove
-        oppMoves = self.getAllPossibleMoves()[0]
-        self.whiteToMove = not self.whiteToMove
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c:
+        board = self.board
+        size = len(board)
+        if self.whiteToMove:
+            enemyTeam = 'b'
+            pawnRow = r - 1 # Black pawns attack downwards so they sit one row above the square
+        else:
+            enemyTeam = 'w'
+            pawnRow = r + 1
+        if 0 <= pawnRow < size:
+            if c - 1 >= 0 and board[pawnRow][c - 1] == enemyTeam + 'p':
+                return True
+            if c + 1 < size and board[pawnRow][c + 1] == enemyTeam + 'p':
                 return True
+        for d in KNIGHT_JUMPS:
+            endRow = r + d[0]
+            endCol = c + d[1]
+            if 0 <= endRow < size and 0 <= endCol < size and board[endRow][endCol] == enemyTeam + 'N':
+                return True
+        for d in KING_DIRECTIONS:
+            endRow = r + d[0]
+            endCol = c + d[1]
+            if 0 <= endRow < size and 0 <= endCol < size and board[endRow][endCol] == enemyTeam + 'K':
+                return True
+        for d in ORTHOGONAL_DIRECTIONS:
+            endRow = r + d[0]
+            endCol = c + d[1]
+            while 0 <= endRow < size and 0 <= endCol < size:
+                endPiece = board[endRow][endCol]
+                if endPiece != '--': # First piece along the ray blocks everything behind it
+                    if endPiece[0] == enemyTeam and (endPiece[1] == 'R' or endPiece[1] == 'Q'):
+                        return True
+                    break
+                endRow += d[0]
+                endCol += d[1]
+        for d in DIAGONAL_DIRECTIONS:
+            endRow = r + d[0]
+            endCol = c + d[1]
+            while 0 <= endRow < size and 0 <= endCol < size:
+                endPiece = board[endRow][endCol]
+                if endPiece != '--':
+                    if endPiece[0] == enemyTeam and (endPiece[1] == 'B' or endPiece[1] == 'Q'):
+                        return True
+                    break
+                endRow += d[0]
+                endCol += d[1]
         return False
 
+    def getAttackMap(self):
+        """
+        Marks every square attacked by the opponent of the side to move
+        Returns: 2 dimensional list of booleans the same size as the board
+        """
+        board = self.board
+        size = len(board)
+        enemyTeam = 'b' if self.whiteToMove else 'w'
+        pawnDirection = 1 if enemyTeam == 'b' else -1
+        attacked = [[False] * size for _ in range(size)]
+        for r in range(size):
+            for c in range(size):
+                piece = board[r][c]
+                if piece[0] != enemyTeam:
+                    continue
+                pieceType = piece[1]
+                if pieceType == 'p':
+                    endRow = r + pawnDirection
+                    if 0 <= endRow < size:
+                        if c - 1 >= 0:
+                            attacked[endRow][c - 1] = True
+                        if c + 1 < size:
+                            attacked[endRow][c + 1] = True
+                elif pieceType == 'N' or pieceType == 'K':
+                    for d in (KNIGHT_JUMPS if pieceType == 'N' else KING_DIRECTIONS):
+                        endRow = r + d[0]
+                        endCol = c + d[1]
+                        if 0 <= endRow < size and 0 <= endCol < size:
+                            attacked[endRow][endCol] = True
+                else:
+                    if pieceType == 'R':
+                        directions = ORTHOGONAL_DIRECTIONS
+                    elif pieceType == 'B':
+                        directions = DIAGONAL_DIRECTIONS
+                    else:
+                        directions = KING_DIRECTIONS
+                    for d in directions:
+                        endRow = r + d[0]
+                        endCol = c + d[1]
+                        while 0 <= endRow < size and 0 <= endCol < size:
+                            attacked[endRow][endCol] = True
+                            if board[endRow][endCol] != '--':
+                                break
+                            endRow += d[0]
+                            endCol += d[1]
+        return attacked
+
     def getAllPossibleMoves(self):
         """
         Determines all possible moves before filtering for whether or not your king will be put in check
@@ -312,6 +972,59 @@ class GameState:
                         self.getKingMoves(r, c, moves)
         #print(moves)
         return moves, pieces
+
+    def getAllPossibleCaptures(self):
+        """
+        Pseudo-legal captures, including en passant, and pawn pushes that promote
+        Same idea as getAllPossibleMoves but rays stop looking at empty squares
+        """
+        moves = []
+        board = self.board
+        size = len(board)
+        allyTeam, enemyTeam = ('w', 'b') if self.whiteToMove else ('b', 'w')
+        pawnDirection = -1 if self.whiteToMove else 1
+        promotionRow = 0 if self.whiteToMove else size - 1
+        for r in range(size):
+            for c in range(size):
+                piece = board[r][c]
+                if piece[0] != allyTeam:
+                    continue
+                pieceType = piece[1]
+                if pieceType == 'p':
+                    endRow = r + pawnDirection
+                    if endRow == promotionRow and board[endRow][c] == '--':
+                        moves.append(Move((r, c), (endRow, c), board))
+                    for endCol in (c - 1, c + 1):
+                        if 0 <= endCol < size:
+                            if board[endRow][endCol][0] == enemyTeam:
+                                moves.append(Move((r, c), (endRow, endCol), board))
+                            elif (endRow, endCol) == self.enpassantPossible:
+                                moves.append(Move((r, c), (endRow, endCol), board, isEnpassantMove=True))
+                elif pieceType == 'N' or pieceType == 'K':
+                    for d in (KNIGHT_JUMPS if pieceType == 'N' else KING_DIRECTIONS):
+                        endRow = r + d[0]
+                        endCol = c + d[1]
+                        if 0 <= endRow < size and 0 <= endCol < size and board[endRow][endCol][0] == enemyTeam:
+                            moves.append(Move((r, c), (endRow, endCol), board))
+                else:
+                    if pieceType == 'R':
+                        directions = ORTHOGONAL_DIRECTIONS
+                    elif pieceType == 'B':
+                        directions = DIAGONAL_DIRECTIONS
+                    else:
+                        directions = KING_DIRECTIONS
+                    for d in directions:
+                        endRow = r + d[0]
+                        endCol = c + d[1]
+                        while 0 <= endRow < size and 0 <= endCol < size:
+                            endPiece = board[endRow][endCol]
+                            if endPiece != '--':
+                                if endPiece[0] == enemyTeam:
+                                    moves.append(Move((r, c), (endRow, endCol), board))
+                                break
+                            endRow += d[0]
+                            endCol += d[1]
+        return moves
     
 
     def getPawnMoves(self, r, c, moves):
@@ -322,8 +1035,8 @@ class GameState:
             if self.board[r - 1][c] == "--":  # the square in front of a pawn is empty
                 # startSquare, endSquare, board
                 moves.append(Move((r, c), (r - 1, c), self.board))
-                # check if it possible to advance to squares in the first move
-                if r-2 >= 0:
+                # check if it possible to advance to squares in the first move, only on the full size board
+                if len(self.board) == 8:
                     if r == 6 and self.board[r - 2][c] == "--":
                         moves.append(Move((r, c), (r - 2, c), self.board))
             if c - 1 >= 0:  # don't go outside the board from the left :)
@@ -341,8 +1054,8 @@ class GameState:
             if self.board[r + 1][c] == "--":  # the square in front of a pawn is empty
                 # startSquare, endSquare, board
                 moves.append(Move((r, c), (r + 1, c), self.board))
-                # check if it possible to advance to squares in the first move
-                if r+2 <= len(self.board[0])-1:
+                # check if it possible to advance to squares in the first move, only on the full size board
+                if len(self.board) == 8:
                     if r == 1 and self.board[r + 2][c] == "--":
                         moves.append(Move((r, c), (r + 2, c), self.board))
             if c - 1 >= 0:  # don't go outside the board from the left :)
@@ -366,7 +1079,7 @@ class GameState:
             for i in range(1, len(self.board)):
                 endRow = r + d[0] * i
                 endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8: # Make sure move doesn't go off the board
+                if 0 <= endRow < len(self.board) and 0 <= endCol < len(self.board): # Make sure move doesn't go off the board
                     endPiece = self.board[endRow][endCol]
                     if endPiece == "--": # If square is empty, then its a legal move
                         moves.append(Move((r, c), (endRow, endCol), self.board))
@@ -431,7 +1144,7 @@ class GameState:
         for i in range(8):
             endRow = r + directions[i][0]
             endCol = c + directions[i][1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
+            if 0 <= endRow < len(self.board) and 0 <= endCol < len(self.board):
                 endPiece = self.board[endRow][endCol]
                 if endPiece[0] != allyTeam:
                     moves.append(Move((r, c), (endRow, endCol), self.board))
@@ -463,6 +1176,24 @@ class GameState:
     def toHexapawn(self):
         self.gameMode = HEXAPAWN
         self.board = self.hexapawnBoard
+        self.bitboards = None # Bitboards only cover the 8x8 board
+        self.mailbox = None
+        self.resetZobrist()
+        self.resetBoardScore()
+
+    def toGardner(self):
+        self.gameMode = GARDNER
+        self.board = self.gardnerBoard
+        self.whiteKingLocation = (4, 4)
+        self.blackKingLocation = (0, 4)
+        self.currentCastlingRight = CastleRights(False, False, False, False)
+        self.castleRightsLog = [CastleRights(False, False, False, False)]
+        self.enpassantPossible = ()
+        self.enpassantPossibleLog = [self.enpassantPossible]
+        self.bitboards = None
+        self.mailbox = None
+        self.resetZobrist()
+        self.resetBoardScore()
 
     def toHexapawnNetworkInput(self):
         """
@@ -471,6 +1202,7 @@ class GameState:
         The next 9 values represent the placement of black pawns
         The last 3 values represent which players turn it is
         1 for each piece and 0 for empty spaces
+        PositionEncoder.encodePositions encodes batches of positions on any board size
         """
         networkInput = []
         for r in range(len(self.board)):
@@ -505,36 +1237,55 @@ class Move:
                    'e': 4, 'f': 5, 'g': 6, 'h': 7}
     rowsToRanks = {v: k for k, v in ranksToRows.items()}
     colsToFiles = {v: k for k, v in filesToCols.items()}
+    # Promotion piece in bits 12-14 of moveID, 0 when the move is not a promotion
+    promotionCodes = {'N': 1, 'B': 2, 'R': 3, 'Q': 4}
 
-    def __init__(self, startSq, endSq, board, isEnpassantMove=False, isCastleMove=False):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
+    # Move generation creates thousands of moves per node, slots keep them small and fast to allocate
+    __slots__ = ('startRow', 'startCol', 'endRow', 'endCol', 'pieceMoved', 'pieceCaptured', 'isPawnPromotion',
+                 'promotionPiece', 'isEnpassantMove', 'isCastleMove', 'isCapture', 'moveID')
 
-        # If a pawn makes it the last rank then it promotes
-        self.isPawnPromotion = False
-        if (self.pieceMoved == 'wp' and self.endRow == 0) or (self.pieceMoved == 'bp' and self.endRow == len(board)-1):
-            self.isPawnPromotion = True
+    def __init__(self, startSq, endSq, board, isEnpassantMove=False, isCastleMove=False, promotionPiece='Q'):
+        self.startRow = startRow = startSq[0]
+        self.startCol = startCol = startSq[1]
+        self.endRow = endRow = endSq[0]
+        self.endCol = endCol = endSq[1]
+        self.pieceMoved = pieceMoved = board[startRow][startCol]
 
         # If a move is en passant than piece captured logic must change (it doesn't capture an empty square)
+        if isEnpassantMove:
+            self.pieceCaptured = "wp" if pieceMoved == "bp" else "bp"
+            self.isCapture = True
+        else:
+            self.pieceCaptured = board[endRow][endCol]
+            self.isCapture = self.pieceCaptured != '--'
         self.isEnpassantMove = isEnpassantMove
-        if self.isEnpassantMove:
-            self.pieceCaptured = "wp" if self.pieceMoved == "bp" else "bp"
-
         self.isCastleMove = isCastleMove
-        self.isCapture = self.pieceCaptured != '--'
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+
+        # Packed as start square (6 bits), end square (6 bits) and promotion piece (3 bits), squares are row * 8 + col
+        moveID = startRow * 8 + startCol + ((endRow * 8 + endCol) << 6)
+        # If a pawn makes it the last rank then it promotes
+        if pieceMoved[1] == 'p' and (endRow == 0 if pieceMoved[0] == 'w' else endRow == len(board) - 1):
+            self.isPawnPromotion = True
+            self.promotionPiece = promotionPiece
+            moveID |= self.promotionCodes[promotionPiece] << 12
+        else:
+            self.isPawnPromotion = False
+            self.promotionPiece = None
+        self.moveID = moveID
 
     def __eq__(self, other):
         if isinstance(other, Move):
             return self.moveID == other.moveID
         return False
 
+    def __hash__(self):
+        return self.moveID
+
     def getChessNotation(self):
-        return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
+        notation = self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
+        if self.isPawnPromotion:
+            notation += self.promotionPiece.lower()
+        return notation
 
     def getRankFile(self, r, c):
         return self.colsToFiles[c] + self.rowsToRanks[r]
@@ -566,4 +1317,21 @@ class CastleRights:
         self.wks = wks
         self.bks = bks
         self.wqs = wqs
-        self.bqs = bqs
\ No newline at end of file
+        self.bqs = bqs
+
+
+def castleRightsKey(castleRights):
+    key = 0
+    if castleRights.wks:
+        key ^= ZOBRIST_CASTLING[0]
+    if castleRights.bks:
+        key ^= ZOBRIST_CASTLING[1]
+    if castleRights.wqs:
+        key ^= ZOBRIST_CASTLING[2]
+    if castleRights.bqs:
+        key ^= ZOBRIST_CASTLING[3]
+    return key
+
+
+def enpassantKey(enpassantPossible):
+    return ZOBRIST_ENPASSANT[enpassantPossible[1]] if enpassantPossible else 0
\ No newline at end of file
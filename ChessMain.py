@@ -2,10 +2,15 @@
 This is my main driver file.
 It will be responsible for handling user input and
 displaying the current GameState object.
+python ChessMain.py --uci speaks UCI on stdin and stdout instead, see Uci, without importing pygame
 """
 
-import pygame as p
-import ChessEngine, SmartMoveFinder
+import sys
+import threading
+import time
+import ChessEngine, SmartMoveFinder, ParallelSearch, Pgn
+
+p = None # pygame, imported by main so the engine modules and the UCI mode don't need it
 
 BOARD_WIDTH = BOARD_HEIGHT = 512
 MOVE_LOG_PANEL_WIDTH = 250
@@ -14,6 +19,12 @@ DIMENSION = 8
 SQ_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 15
 IMAGES = {}
+BOARD_BACKEND = ChessEngine.LIST_BOARD # ChessEngine.BITBOARD generates moves from bitboards, ChessEngine.MAILBOX from a flat 10x12 board
+AI_DEPTH = SmartMoveFinder.DEPTH
+AI_MOVETIME = None # Seconds per AI move, searched as deep as the clock allows, None searches to AI_DEPTH
+AI_WORKERS = 1 # More than one searches with a pool of processes, see ParallelSearch
+PGN_FILE = None # Path games are appended to when they end, are reset with r or the window is closed, e.g. "games.pgn"
+AI_PONDER = True # Search the reply the AI expects while the human thinks, see the pondering logic in main
 
 '''
 Initialize a global dictionary of images. This will be called exactly once in the main
@@ -33,12 +44,14 @@ This will handle user input and updating the graphics
 
 
 def main():
+    global p
+    import pygame as p
     p.init()
     screen = p.display.set_mode((BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH, BOARD_HEIGHT))
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
     moveLogFont = p.font.SysFont("Arial", 14, False, False)
-    gs = ChessEngine.GameState()
+    gs = ChessEngine.GameState(boardBackend=BOARD_BACKEND)
     valid_moves = gs.getValidMoves()
     move_made = False   # Flag variable when a move is made
     animate = False
@@ -47,13 +60,33 @@ def main():
     sq_select = ()  # no square is selected, keeps track of the last click of the user (tuple: (col, row))
     player_clicks = []  # keeps track of the player clicks (two tuples: [(6, 4), (4, 4)])
     gameOver = False
+    gameSaved = False   # Each game is written to PGN_FILE once, when it ends or is left
     playerOne = True    # True for human, False for AI (white)
     playerTwo  = False   # True for human, False for AI (black)
+    aiThinking = False
+    aiThread = None
+    aiStopEvent = None
+    aiResult = []   # The worker thread appends the SearchResult it found
+    ponderThread = None
+    ponderStopEvent = None
+    ponderResult = []
+    ponderMove = None   # The human move the ponder search expects
+    ponderStart = 0.0
+    ponderLine = []     # Principal variation of the AI's last search, its second move is the expected reply
     while running:
         humanTurn = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+                if aiThinking:
+                    cancelSearch(aiThread, aiStopEvent)
+                    aiThinking = False
+                if ponderThread is not None:
+                    cancelSearch(ponderThread, ponderStopEvent)
+                    ponderThread = None
+                if not gameSaved:
+                    saveGame(gs, playerOne, playerTwo)
+                    gameSaved = True
             elif e.type == p.MOUSEBUTTONDOWN:
                 if not gameOver and humanTurn:
                     location = p.mouse.get_pos()    # (x, y) location of the mouse
@@ -80,12 +113,29 @@ def main():
 
             elif e.type == p.KEYDOWN:  # z undo the last move
                 if e.key == p.K_z:
+                    if aiThinking:
+                        cancelSearch(aiThread, aiStopEvent)
+                        aiThinking = False
+                    if ponderThread is not None:
+                        cancelSearch(ponderThread, ponderStopEvent)
+                        ponderThread = None
+                    ponderLine = []
                     gs.undoMove()
                     move_made = True
                     animate = False
                     gameOver = False
                 if e.key == p.K_r:
-                    gs = ChessEngine.GameState()
+                    if aiThinking:
+                        cancelSearch(aiThread, aiStopEvent)
+                        aiThinking = False
+                    if ponderThread is not None:
+                        cancelSearch(ponderThread, ponderStopEvent)
+                        ponderThread = None
+                    ponderLine = []
+                    if not gameSaved:
+                        saveGame(gs, playerOne, playerTwo)
+                    gameSaved = False
+                    gs = ChessEngine.GameState(boardBackend=BOARD_BACKEND)
                     valid_moves = gs.getValidMoves()
                     sq_select = ()
                     player_clicks = []
@@ -95,13 +145,25 @@ def main():
 
 
         # AI move finder logic
-        if not gameOver and not humanTurn:
-            AImove = SmartMoveFinder.findBestMove(gs, valid_moves)
-            if AImove is None:
-                AImove = SmartMoveFinder.findRandomMove(valid_moves)
-            gs.makeMove(AImove)
-            move_made = True
-            animate = True
+        # The search runs on a copy of the game state in a worker thread so the window keeps responding
+        if not gameOver and not humanTurn and running:
+            if not aiThinking:
+                aiThinking = True
+                aiStopEvent = threading.Event()
+                aiResult = []
+                aiThread = threading.Thread(target=searchWorker, args=(gs.copy(), aiStopEvent, aiResult), daemon=True)
+                aiThread.start()
+            elif not aiThread.is_alive():
+                aiThinking = False
+                AImove = findMatchingMove(aiResult[0].bestMove if aiResult else None, valid_moves)
+                ponderLine = aiResult[0].principalVariation if aiResult else []
+                if AImove is None or ponderLine[:1] != [AImove]:
+                    ponderLine = []
+                if AImove is None:
+                    AImove = SmartMoveFinder.findRandomMove(valid_moves)
+                gs.makeMove(AImove)
+                move_made = True
+                animate = True
 
 
         if move_made:
@@ -109,10 +171,42 @@ def main():
                 animateMove(gs.moveLog[-1], screen, gs.board, clock)
             valid_moves = gs.getValidMoves()
             move_made = False
+            # Ponder hit: the human played the expected move, the ponder search becomes the AI's search
+            # Otherwise its result is thrown away, the transposition table still keeps what it found
+            if ponderThread is not None:
+                if gs.moveLog and gs.moveLog[-1] == ponderMove and not (gs.checkmate or gs.stalemate):
+                    aiThinking = True
+                    aiThread, aiStopEvent, aiResult = ponderThread, ponderStopEvent, ponderResult
+                    if AI_MOVETIME is not None: # Time spent pondering counts towards the move's budget
+                        remaining = max(0.0, AI_MOVETIME - (time.time() - ponderStart))
+                        stopTimer = threading.Timer(remaining, aiStopEvent.set)
+                        stopTimer.daemon = True
+                        stopTimer.start()
+                else:
+                    cancelSearch(ponderThread, ponderStopEvent)
+                ponderThread = None
+
+        # Pondering, search the position after the expected human reply while the human thinks
+        humanToMove = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
+        if AI_PONDER and not gameOver and humanToMove and running and ponderThread is None and len(ponderLine) >= 2:
+            ponderMove = findMatchingMove(ponderLine[1], valid_moves)
+            ponderLine = []
+            if ponderMove is not None:
+                ponderGs = gs.copy()
+                ponderGs.makeMove(findMatchingMove(ponderMove, ponderGs.getValidMoves()))
+                ponderStopEvent = threading.Event()
+                ponderResult = []
+                ponderStart = time.time()
+                ponderThread = threading.Thread(target=searchWorker, args=(ponderGs, ponderStopEvent, ponderResult, True),
+                                                daemon=True)
+                ponderThread.start()
 
         draw_game_state(screen, gs, valid_moves, sq_select, moveLogFont)
         text = ''
         if gs.checkmate or gs.stalemate:
+            if not gameSaved:
+                saveGame(gs, playerOne, playerTwo)
+                gameSaved = True
             gameOver = True
             if gs.stalemate:
                 text = "Stalemate"
@@ -126,6 +220,60 @@ def main():
 
 
 
+'''
+Runs in the worker thread, searches its own copy of the game state and appends the SearchResult
+With AI_MOVETIME the depth is only bounded by the clock, otherwise the search goes to AI_DEPTH
+A ponder search doesn't know when its clock starts, it runs until it is stopped or reaches its depth
+'''
+def searchWorker(gs, stopEvent, result, ponder=False):
+    if AI_MOVETIME is None:
+        depth, movetime = AI_DEPTH, None
+    elif ponder:
+        depth, movetime = SmartMoveFinder.MAX_DEPTH, None
+    else:
+        depth, movetime = None, AI_MOVETIME
+    if AI_WORKERS > 1:
+        result.append(ParallelSearch.searchPosition(gs, gs.getValidMoves(), depth=depth, movetime=movetime,
+                                                    stopEvent=stopEvent, workers=AI_WORKERS))
+    else:
+        result.append(SmartMoveFinder.searchPosition(gs, gs.getValidMoves(), depth=depth, movetime=movetime,
+                                                     stopEvent=stopEvent))
+
+
+'''
+Stops a running search and waits for it, findBestMove shares one Searcher so only one search can run at a time
+The move it found is thrown away
+'''
+def cancelSearch(thread, stopEvent):
+    stopEvent.set()
+    thread.join()
+
+
+'''
+The worker returns a move of the copied game state, find the same move in the current valid moves
+'''
+def findMatchingMove(move, validMoves):
+    if move is None:
+        return None
+    for validMove in validMoves:
+        if validMove == move:
+            return validMove
+    return None
+
+
+'''
+Appends the game to PGN_FILE, unfinished games get the result *
+Nothing is written without a PGN_FILE or before the first move
+'''
+def saveGame(gs, playerOne, playerTwo):
+    if PGN_FILE is None or not gs.moveLog:
+        return
+    writer = Pgn.PgnWriter(PGN_FILE)
+    writer.writeGameState(gs, headers={"Event": "ChessMain", "White": "Human" if playerOne else "AI",
+                                       "Black": "Human" if playerTwo else "AI"})
+    writer.close()
+
+
 '''
 Highlight the selected square and the possible moves
 '''
@@ -240,4 +388,8 @@ def drawEndGameText(screen, text):
     screen.blit(textObject, textLocation.move(2, 2))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--uci" in sys.argv[1:]:
+        import Uci
+        Uci.main()
+    else:
+        main()
\ No newline at end of file
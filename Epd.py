@@ -0,0 +1,97 @@
+"""
+Streaming reader for EPD (Extended Position Description) files
+Each line holds the first four FEN fields followed by operations such as: bm Nf3; id "test 1";
+Positions are yielded one line at a time so files of any size are read in constant memory
+"""
+import ChessEngine
+
+
+class EpdPosition:
+    def __init__(self, fen, operations):
+        self.fen = fen
+        self.operations = operations # Opcode -> list of operands, e.g. {'bm': ['Nf3'], 'id': ['test 1']}
+
+    def getOperation(self, opcode, default=None):
+        """
+        First operand of an opcode, or default if the opcode is missing
+        """
+        operands = self.operations.get(opcode)
+        return operands[0] if operands else default
+
+    def toGameState(self, **gameStateArgs):
+        return ChessEngine.GameState.from_fen(self.fen, **gameStateArgs)
+
+    def __repr__(self):
+        return "EpdPosition(%r, %r)" % (self.fen, self.operations)
+
+
+def splitOperations(text):
+    """
+    Splits the operation part of an EPD line on semicolons and whitespace, keeping quoted strings together
+    Returns: list of operations, each a list of tokens
+    """
+    operations = []
+    tokens = []
+    token = ''
+    inQuotes = False
+    for char in text:
+        if inQuotes:
+            if char == '"':
+                inQuotes = False
+                tokens.append(token)
+                token = ''
+            else:
+                token += char
+        elif char == '"':
+            inQuotes = True
+        elif char == ';' or char.isspace():
+            if token:
+                tokens.append(token)
+                token = ''
+            if char == ';' and tokens:
+                operations.append(tokens)
+                tokens = []
+        else:
+            token += char
+    if token:
+        tokens.append(token)
+    if tokens:
+        operations.append(tokens)
+    return operations
+
+
+def parseEpdLine(line):
+    """
+    Returns: EpdPosition, or None for blank lines and comments
+    The hmvc and fmvn operations fill the FEN move counters
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError("EPD line needs at least four fields: %r" % line)
+    operations = {}
+    if len(fields) == 5:
+        for tokens in splitOperations(fields[4]):
+            operations[tokens[0]] = tokens[1:]
+    halfmoveClock = operations.get('hmvc', ['0'])[0]
+    fullmoveNumber = operations.get('fmvn', ['1'])[0]
+    fen = ' '.join(fields[:4] + [halfmoveClock, fullmoveNumber])
+    return EpdPosition(fen, operations)
+
+
+def readEpd(source):
+    """
+    Generator over the positions of an EPD file
+    source is a path or an open text file
+    """
+    if isinstance(source, str):
+        with open(source) as epdFile:
+            for position in readEpd(epdFile):
+                yield position
+        return
+    for line in source:
+        position = parseEpdLine(line)
+        if position is not None:
+            yield position
@@ -0,0 +1,346 @@
+"""
+10x12 mailbox representation of a chess position
+The 8x8 board sits inside a flat bytearray of 120 squares, with two sentinel rows above and below it and
+one sentinel column on each side, so knight jumps and sliding rays that leave the board land on OFFBOARD
+instead of needing bounds checks
+Pieces are small integers, the piece type plus BLACK for black pieces
+GameState.board becomes a read-only MailboxBoard view when this backend is used
+"""
+from array import array
+
+EMPTY = 0
+PAWN = 1
+KNIGHT = 2
+BISHOP = 3
+ROOK = 4
+QUEEN = 5
+KING = 6
+BLACK = 8 # Color bit
+OFFBOARD = 0xFF
+TYPE_MASK = 7
+
+PIECE_CODES = {'--': EMPTY}
+for color, colorBit in (('w', 0), ('b', BLACK)):
+    for name, pieceType in (('p', PAWN), ('N', KNIGHT), ('B', BISHOP), ('R', ROOK), ('Q', QUEEN), ('K', KING)):
+        PIECE_CODES[color + name] = colorBit | pieceType
+PIECE_NAMES = [None] * 256
+for name, code in PIECE_CODES.items():
+    PIECE_NAMES[code] = name
+
+# Mailbox index of every row * 8 + col square, and back
+MAILBOX_INDEX = array('b', [21 + r * 10 + c for r in range(8) for c in range(8)])
+BOARD_INDEX = array('b', [-1] * 120)
+for sq in range(64):
+    BOARD_INDEX[MAILBOX_INDEX[sq]] = sq
+
+KNIGHT_OFFSETS = (-21, -19, -12, -8, 8, 12, 19, 21)
+KING_OFFSETS = (-11, -10, -9, -1, 1, 9, 10, 11)
+ROOK_OFFSETS = (-10, -1, 1, 10)
+BISHOP_OFFSETS = (-11, -9, 9, 11)
+PROMOTION_CODE = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN}
+
+
+class MailboxRow:
+    """
+    Read-only view of one row of the mailbox, indexed by column like a row of GameState.board
+    """
+    __slots__ = ('squares', 'start')
+
+    def __init__(self, squares, start):
+        self.squares = squares
+        self.start = start
+
+    def __getitem__(self, c):
+        if not 0 <= c < 8:
+            raise IndexError("column out of range")
+        return PIECE_NAMES[self.squares[self.start + c]]
+
+    def __len__(self):
+        return 8
+
+    def __iter__(self):
+        squares = self.squares
+        return (PIECE_NAMES[squares[i]] for i in range(self.start, self.start + 8))
+
+    def __setitem__(self, c, piece):
+        raise TypeError("The mailbox board view is read-only, make moves through GameState.makeMove")
+
+
+class MailboxBoard:
+    """
+    Read-only 2D view of a MailboxPosition, board[r][c] gives the same piece strings as the list board
+    """
+    def __init__(self, position):
+        self.rows = tuple(MailboxRow(position.squares, 21 + r * 10) for r in range(8))
+
+    def __getitem__(self, r):
+        return self.rows[r]
+
+    def __len__(self):
+        return 8
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __setitem__(self, r, row):
+        raise TypeError("The mailbox board view is read-only, make moves through GameState.makeMove")
+
+
+class MailboxPosition:
+    """
+    Flat board kept by GameState.makeMove and undoMove
+    Generates legal moves as (startSq, endSq, isEnpassantMove, isCastleMove) tuples with squares as row * 8 + col,
+    the same format as BitboardPosition
+    """
+    def __init__(self, board):
+        self.squares = bytearray([OFFBOARD]) * 120
+        self.kingSquares = [0, 0] # Mailbox index of the white and black king
+        for r in range(8):
+            for c in range(8):
+                self.putPiece(MAILBOX_INDEX[r * 8 + c], PIECE_CODES[board[r][c]])
+
+    def putPiece(self, index, code):
+        self.squares[index] = code
+        if code & TYPE_MASK == KING:
+            self.kingSquares[1 if code & BLACK else 0] = index
+
+    def makeMove(self, move):
+        squares = self.squares
+        start = MAILBOX_INDEX[move.startRow * 8 + move.startCol]
+        end = MAILBOX_INDEX[move.endRow * 8 + move.endCol]
+        code = squares[start]
+        squares[start] = EMPTY
+        if move.isPawnPromotion:
+            code = (code & BLACK) | PROMOTION_CODE[move.promotionPiece]
+        self.putPiece(end, code)
+        if move.isEnpassantMove:
+            squares[MAILBOX_INDEX[move.startRow * 8 + move.endCol]] = EMPTY
+        elif move.isCastleMove:
+            self.moveCastleRook(end, end > start, True)
+
+    def undoMove(self, move):
+        squares = self.squares
+        start = MAILBOX_INDEX[move.startRow * 8 + move.startCol]
+        end = MAILBOX_INDEX[move.endRow * 8 + move.endCol]
+        self.putPiece(start, PIECE_CODES[move.pieceMoved])
+        if move.isEnpassantMove:
+            squares[end] = EMPTY
+            squares[MAILBOX_INDEX[move.startRow * 8 + move.endCol]] = PIECE_CODES[move.pieceCaptured]
+        else:
+            squares[end] = PIECE_CODES[move.pieceCaptured]
+            if move.isCastleMove:
+                self.moveCastleRook(end, end > start, False)
+
+    def moveCastleRook(self, kingEnd, kingside, making):
+        """
+        Moves the rook from its corner over the king when making the castle move, and back when undoing it
+        """
+        squares = self.squares
+        if kingside:
+            corner, inner = kingEnd + 1, kingEnd - 1
+        else:
+            corner, inner = kingEnd - 2, kingEnd + 1
+        if not making:
+            corner, inner = inner, corner
+        squares[inner] = squares[corner]
+        squares[corner] = EMPTY
+
+    def isSquareAttacked(self, index, byBlack):
+        """
+        Whether a piece of the given color attacks the mailbox square, looking outwards from the square
+        """
+        squares = self.squares
+        enemy = BLACK if byBlack else 0
+        # Pawns attack towards the other side, so look back along their capture direction
+        pawn = enemy | PAWN
+        if byBlack:
+            if squares[index - 11] == pawn or squares[index - 9] == pawn:
+                return True
+        elif squares[index + 11] == pawn or squares[index + 9] == pawn:
+            return True
+        knight = enemy | KNIGHT
+        for offset in KNIGHT_OFFSETS:
+            if squares[index + offset] == knight:
+                return True
+        king = enemy | KING
+        for offset in KING_OFFSETS:
+            if squares[index + offset] == king:
+                return True
+        queen = enemy | QUEEN
+        for offsets, slider in ((ROOK_OFFSETS, enemy | ROOK), (BISHOP_OFFSETS, enemy | BISHOP)):
+            for offset in offsets:
+                target = index + offset
+                piece = squares[target]
+                while piece == EMPTY:
+                    target += offset
+                    piece = squares[target]
+                if piece == slider or piece == queen:
+                    return True
+        return False
+
+    def inCheck(self, whiteToMove):
+        return self.isSquareAttacked(self.kingSquares[0 if whiteToMove else 1], whiteToMove)
+
+    def toList(self):
+        """
+        8x8 list of piece strings, a snapshot that is cheaper to index than the MailboxBoard view
+        """
+        squares = self.squares
+        return [[PIECE_NAMES[code] for code in squares[start:start + 8]] for start in range(21, 99, 10)]
+
+    def pieceCount(self):
+        return len(self.squares) - self.squares.count(EMPTY) - self.squares.count(OFFBOARD)
+
+    def getPinCandidates(self, kingIndex, ally):
+        """
+        The closest piece of the side to move on each ray out of its king
+        Out of check only these pieces can expose the king by moving, every other move skips the legality test
+        """
+        squares = self.squares
+        candidates = set()
+        for offset in KING_OFFSETS:
+            target = kingIndex + offset
+            piece = squares[target]
+            while piece == EMPTY:
+                target += offset
+                piece = squares[target]
+            if piece != OFFBOARD and piece & BLACK == ally:
+                candidates.add(target)
+        return candidates
+
+    def getPseudoLegalMoves(self, whiteToMove, enpassantPossible, capturesOnly=False):
+        """
+        Moves of the side to move that may still leave its own king attacked, castling is left out
+        Returns: list of (start index, end index, isEnpassantMove, isCastleMove)
+        """
+        squares = self.squares
+        ally = 0 if whiteToMove else BLACK
+        pseudo = []
+        append = pseudo.append
+        if whiteToMove:
+            forward, startRow, promotionRow = -10, 6, 0
+        else:
+            forward, startRow, promotionRow = 10, 1, 7
+        epIndex = MAILBOX_INDEX[enpassantPossible[0] * 8 + enpassantPossible[1]] if enpassantPossible else -1
+
+        for sq in range(64):
+            index = MAILBOX_INDEX[sq]
+            code = squares[index]
+            if code == EMPTY or code & BLACK != ally:
+                continue
+            pieceType = code & TYPE_MASK
+            if pieceType == PAWN:
+                target = index + forward
+                if squares[target] == EMPTY:
+                    if not capturesOnly or sq // 8 + forward // 10 == promotionRow:
+                        append((index, target, False, False))
+                    if sq // 8 == startRow and squares[target + forward] == EMPTY and not capturesOnly:
+                        append((index, target + forward, False, False))
+                for target in (index + forward - 1, index + forward + 1):
+                    piece = squares[target]
+                    if piece != EMPTY and piece != OFFBOARD and piece & BLACK != ally:
+                        append((index, target, False, False))
+                    elif target == epIndex:
+                        append((index, target, True, False))
+            elif pieceType == KNIGHT or pieceType == KING:
+                for offset in (KNIGHT_OFFSETS if pieceType == KNIGHT else KING_OFFSETS):
+                    target = index + offset
+                    piece = squares[target]
+                    if piece == EMPTY:
+                        if not capturesOnly:
+                            append((index, target, False, False))
+                    elif piece != OFFBOARD and piece & BLACK != ally:
+                        append((index, target, False, False))
+            else:
+                if pieceType == BISHOP:
+                    offsets = BISHOP_OFFSETS
+                elif pieceType == ROOK:
+                    offsets = ROOK_OFFSETS
+                else:
+                    offsets = ROOK_OFFSETS + BISHOP_OFFSETS
+                for offset in offsets:
+                    target = index + offset
+                    piece = squares[target]
+                    while piece == EMPTY: # The sentinel border ends every ray
+                        if not capturesOnly:
+                            append((index, target, False, False))
+                        target += offset
+                        piece = squares[target]
+                    if piece != OFFBOARD and piece & BLACK != ally:
+                        append((index, target, False, False))
+        return pseudo
+
+    def isMoveLegal(self, start, end, isEnpassantMove, kingIndex, whiteToMove):
+        """
+        Tries a pseudo-legal move on the flat board and takes it back, only a few bytes change
+        """
+        squares = self.squares
+        capturedIndex = end + 10 if whiteToMove else end - 10
+        moved = squares[start]
+        captured = squares[end]
+        squares[start] = EMPTY
+        squares[end] = moved
+        if isEnpassantMove:
+            squares[capturedIndex] = EMPTY
+        legal = not self.isSquareAttacked(end if start == kingIndex else kingIndex, whiteToMove)
+        squares[start] = moved
+        squares[end] = captured
+        if isEnpassantMove:
+            squares[capturedIndex] = (BLACK if whiteToMove else 0) | PAWN
+        return legal
+
+    def hasLegalMove(self, whiteToMove, enpassantPossible):
+        """
+        Whether the side to move can move at all, stops at the first legal move
+        Castling is never needed, the king could also step to the square it passes
+        """
+        kingIndex = self.kingSquares[0 if whiteToMove else 1]
+        candidates = None if self.isSquareAttacked(kingIndex, whiteToMove) else \
+            self.getPinCandidates(kingIndex, 0 if whiteToMove else BLACK)
+        for start, end, isEnpassantMove, isCastleMove in self.getPseudoLegalMoves(whiteToMove, enpassantPossible):
+            if candidates is not None and start != kingIndex and start not in candidates and not isEnpassantMove:
+                return True
+            if self.isMoveLegal(start, end, isEnpassantMove, kingIndex, whiteToMove):
+                return True
+        return False
+
+    def getLegalMoves(self, whiteToMove, enpassantPossible, castleRights, capturesOnly=False):
+        """
+        Generates pseudo-legal moves and keeps the ones that don't leave the own king attacked
+        Moves that could expose the king are tried on the flat board and taken back
+        capturesOnly keeps captures and promotions, for the quiescence search
+        """
+        squares = self.squares
+        ally = 0 if whiteToMove else BLACK
+        byBlack = whiteToMove # Color of the attackers of our king
+        pseudo = self.getPseudoLegalMoves(whiteToMove, enpassantPossible, capturesOnly)
+
+        # Try the moves that might expose the king on the board and keep them if the own king is safe
+        legal = []
+        kingSquares = self.kingSquares
+        side = 1 if ally else 0
+        kingIndex = kingSquares[side]
+        inCheck = self.isSquareAttacked(kingIndex, byBlack)
+        candidates = None if inCheck else self.getPinCandidates(kingIndex, ally)
+        for start, end, isEnpassantMove, isCastleMove in pseudo:
+            if candidates is not None and start != kingIndex and start not in candidates and not isEnpassantMove:
+                legal.append((BOARD_INDEX[start], BOARD_INDEX[end], False, False))
+                continue
+            if self.isMoveLegal(start, end, isEnpassantMove, kingIndex, whiteToMove):
+                legal.append((BOARD_INDEX[start], BOARD_INDEX[end], isEnpassantMove, False))
+
+        # Castling, the king may not start on, pass or land on an attacked square
+        if whiteToMove:
+            kingside, queenside = castleRights.wks, castleRights.wqs
+        else:
+            kingside, queenside = castleRights.bks, castleRights.bqs
+        king = kingIndex
+        if (kingside or queenside) and not capturesOnly and not inCheck and BOARD_INDEX[king] % 8 == 4:
+            if kingside and squares[king + 1] == EMPTY and squares[king + 2] == EMPTY and \
+                    not self.isSquareAttacked(king + 1, byBlack) and not self.isSquareAttacked(king + 2, byBlack):
+                legal.append((BOARD_INDEX[king], BOARD_INDEX[king + 2], False, True))
+            if queenside and squares[king - 1] == EMPTY and squares[king - 2] == EMPTY and \
+                    squares[king - 3] == EMPTY and \
+                    not self.isSquareAttacked(king - 1, byBlack) and not self.isSquareAttacked(king - 2, byBlack):
+                legal.append((BOARD_INDEX[king], BOARD_INDEX[king - 2], False, True))
+        return legal
@@ -0,0 +1,82 @@
+"""
+Move ordering for the alpha-beta search
+Alpha-beta prunes the most when the best move is searched first, so moves are sorted by:
+1) The best move from the transposition table
+2) Captures and promotions, most valuable victim first and least valuable attacker next (MVV-LVA)
+3) Killer moves, quiet moves that caused a beta cutoff at the same ply in a sibling node
+4) History heuristic, quiet moves that caused cutoffs anywhere in the tree
+Random numbers only break ties between moves with the same score
+"""
+import random
+
+TT_MOVE_SCORE = 10000000
+CAPTURE_SCORE = 1000000
+PROMOTION_SCORE = 900000
+KILLER_SCORES = (800000, 700000) # Most recent killer first
+MAX_PLY = 128
+HISTORY_LIMIT = 600000 # Keeps history scores below the killer scores
+
+
+class MoveOrderer:
+    def __init__(self, pieceScore):
+        # King has a value of 0 so king captures go first, they are only legal when the victim is undefended
+        self.pieceScore = pieceScore
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [0] * (2 * 64 * 64) # [side to move][start square][end square]
+
+    def newSearch(self):
+        """
+        Killers only make sense within one search, history is kept but aged
+        """
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+        self.history = [value // 2 for value in self.history]
+
+    def historyIndex(self, move, whiteToMove):
+        return (0 if whiteToMove else 4096) + (move.startRow * 8 + move.startCol) * 64 + move.endRow * 8 + move.endCol
+
+    def scoreMove(self, move, ply, ttMove, whiteToMove):
+        if move.moveID == ttMove:
+            return TT_MOVE_SCORE
+        if move.isCapture:
+            return CAPTURE_SCORE + 10 * self.pieceScore[move.pieceCaptured[1]] - self.pieceScore[move.pieceMoved[1]]
+        if move.isPawnPromotion:
+            return PROMOTION_SCORE
+        killers = self.killers[ply]
+        if move.moveID == killers[0]:
+            return KILLER_SCORES[0]
+        if move.moveID == killers[1]:
+            return KILLER_SCORES[1]
+        return self.history[self.historyIndex(move, whiteToMove)]
+
+    def orderMoves(self, moves, ply, ttMove, whiteToMove):
+        """
+        Sorts moves in place, best first
+        """
+        ply = min(ply, MAX_PLY - 1)
+        scored = [(self.scoreMove(move, ply, ttMove, whiteToMove), random.random(), move) for move in moves]
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        moves[:] = [item[2] for item in scored]
+
+    def orderCaptures(self, moves):
+        """
+        Sorts captures in place by MVV-LVA only, for the quiescence search
+        """
+        pieceScore = self.pieceScore
+        moves.sort(key=lambda move: (10 * pieceScore[move.pieceCaptured[1]] - pieceScore[move.pieceMoved[1]]
+                                     if move.isCapture else 0), reverse=True)
+
+    def recordCutoff(self, move, ply, depth, whiteToMove):
+        """
+        Called when move caused a beta cutoff, only quiet moves become killers or gain history
+        """
+        if move.isCapture or move.isPawnPromotion:
+            return
+        killers = self.killers[min(ply, MAX_PLY - 1)]
+        if killers[0] != move.moveID:
+            killers[1] = killers[0]
+            killers[0] = move.moveID
+        index = self.historyIndex(move, whiteToMove)
+        self.history[index] += depth * depth
+        if self.history[index] > HISTORY_LIMIT:
+            self.history = [value // 2 for value in self.history]
@@ -0,0 +1,284 @@
+"""
+Parallel root splitting search for SmartMoveFinder
+Every iteration of the iterative deepening splits the root moves over a pool of worker processes:
+the best move of the previous iteration is searched first to get a good alpha bound,
+then the remaining root moves are searched in parallel against the best score found so far
+The bound lives in shared memory so a root move started later is searched with a narrower window
+The pool is created once and kept across moves, workers also keep their transposition tables between tasks
+Positions are sent to the workers as FEN strings
+
+Usage:
+searcher = ParallelSearcher(workers=4)
+result = searcher.search(gs, gs.getValidMoves(), depth=4)
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import time
+
+import ChessEngine
+import SmartMoveFinder
+from MoveOrdering import MoveOrderer
+from TranspositionTable import NO_MOVE
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+POLL_INTERVAL = 0.05 # Seconds between checks of the stop event and the clock while waiting for workers
+
+# Worker process state, set by initWorker
+sharedAlpha = None
+sharedStop = None
+workerSearcher = None
+workerSearchId = None
+workerGameState = None
+
+
+class SharedFlag:
+    """
+    Stop flag in shared memory with the is_set() of a threading.Event, so SmartMoveFinder.checkLimits can read it
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def is_set(self):
+        return self.value.value != 0
+
+
+def initWorker(alpha, stop):
+    global sharedAlpha, sharedStop, workerSearcher
+    sharedAlpha = alpha
+    sharedStop = stop
+    workerSearcher = SmartMoveFinder.Searcher()
+
+
+def searchRootMove(searchId, fen, settings, moveID, depth, deadline, nodeLimit):
+    """
+    Runs in a worker, searches one root move depth - 1 plies deep against the shared alpha bound
+    Returns: (moveID, score from the root side's point of view, nodes, principal variation as moveIDs, completed)
+    """
+    global workerSearchId, workerGameState
+    if searchId != workerSearchId or workerGameState is None or workerGameState.to_fen() != fen:
+        gameMode, moveGeneration, boardBackend = settings
+        workerGameState = ChessEngine.GameState.from_fen(fen, gameMode=gameMode, moveGeneration=moveGeneration,
+                                                         boardBackend=boardBackend)
+        workerGameState.setEvaluationTable(workerSearcher.evaluationTable)
+        if searchId != workerSearchId: # Killers are per search, the transposition table ages its entries
+            workerSearcher.transpositionTable.newSearch()
+            workerSearcher.moveOrderer.newSearch()
+            workerSearchId = searchId
+    gs = workerGameState
+    move = next((m for m in gs.getValidMoves() if m.moveID == moveID), None)
+    if move is None:
+        return moveID, -SmartMoveFinder.CHECKMATE, 0, [], False
+
+    # The child search runs one ply below the root of a search of the given depth
+    searcher = workerSearcher
+    searcher.setLimits(stopEvent=SharedFlag(sharedStop), nodes=nodeLimit)
+    searcher.deadline = deadline
+    searcher.searchDepth = depth
+    searcher.pvMoves = {}
+    searcher.nextMove = None
+
+    alpha = sharedAlpha.value
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    gs.makeMove(move)
+    quiescenceLeaf = depth == 1 and searcher.useQuiescence and gs.gameMode == ChessEngine.CHESS
+    nextMoves = None if quiescenceLeaf else gs.getValidMoves()
+    score = -searcher.findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -SmartMoveFinder.CHECKMATE, -alpha,
+                                               -turnMultiplier)
+    completed = not searcher.stopSearch
+    pv = [moveID]
+    if completed:
+        pv += [m.moveID for _, m in searcher.getPrincipalVariation(gs, depth - 1)]
+        with sharedAlpha.get_lock():
+            if score > sharedAlpha.value:
+                sharedAlpha.value = score
+    gs.undoMove()
+    return moveID, score, searcher.counter, pv, completed
+
+
+class ParallelSearcher:
+    def __init__(self, workers=DEFAULT_WORKERS, book=None, tablebases=None):
+        self.workers = max(1, workers)
+        # Optional OpeningBook and Tablebases, probed in this process before the work is split
+        self.book = book
+        self.tablebases = tablebases
+        # Spawned workers don't inherit the threads of the parent, findBestMove may run in a GUI worker thread
+        context = multiprocessing.get_context("spawn")
+        self.alpha = context.Value('d', 0.0)
+        self.stop = context.Value('b', 0)
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=context, initializer=initWorker,
+                                                           initargs=(self.alpha, self.stop))
+        self.searchId = 0
+        self.counter = 0
+        self.pending = set() # Futures of the root moves being searched, cancelled by close
+        self.moveOrderer = MoveOrderer(SmartMoveFinder.pieceScore) # Only orders the first iteration's root moves
+        self.warmUp()
+
+    def warmUp(self):
+        """
+        Starts every worker process now, so the first search doesn't pay for the imports
+        """
+        futures = [self.pool.submit(os.getpid) for _ in range(self.workers)]
+        concurrent.futures.wait(futures)
+
+    def close(self):
+        # Queued root moves are cancelled by hand, shutdown(cancel_futures=True) needs Python 3.9
+        self.stop.value = 1
+        for future in list(self.pending):
+            future.cancel()
+        self.pool.shutdown(wait=True)
+
+    def findBestMove(self, gs, validMoves, depth=None, movetime=None, nodes=None, stopEvent=None):
+        """
+        Same limits, output and return value as SmartMoveFinder.findBestMove
+        """
+        return self.searchPosition(gs, validMoves, depth, movetime, nodes, stopEvent).bestMove
+
+    def searchPosition(self, gs, validMoves, depth=None, movetime=None, nodes=None, stopEvent=None):
+        """
+        Same limits, output and return value as SmartMoveFinder.searchPosition
+        """
+        result = self.search(gs, validMoves, depth, movetime, nodes, stopEvent)
+        if result.fromBook:
+            print("book move %s" % result.bestMove.getChessNotation())
+        elif result.fromTablebase:
+            print("tablebase move %s score %s" % (result.bestMove.getChessNotation(), result.score))
+        for iteration in result.iterations:
+            print("depth %d nodes %d time %.2f workers %d pv %s" % (iteration["depth"], iteration["nodes"],
+                                                                    iteration["seconds"], self.workers,
+                                                                    " ".join(iteration["pv"])))
+        return result
+
+    def search(self, gs, validMoves, depth=None, movetime=None, nodes=None, stopEvent=None, onIteration=None):
+        """
+        Same limits and onIteration callback as SmartMoveFinder.Searcher.search
+        The node limit is checked between root moves, so the search can go over it by one root move
+        Returns: SmartMoveFinder.SearchResult, without transposition table stats since the tables live in the workers
+        """
+        result = SmartMoveFinder.probeRoot(gs, validMoves, self.book, self.tablebases)
+        if result is not None:
+            return result
+        if depth is None and movetime is None and nodes is None:
+            depth = SmartMoveFinder.DEPTH
+        maxDepth = depth if depth is not None else SmartMoveFinder.MAX_DEPTH
+        startTime = time.time()
+        if not validMoves:
+            return SmartMoveFinder.SearchResult(None, None, [], 0, 0, 0.0, [], None)
+        deadline = startTime + movetime if movetime is not None else None
+        self.searchId += 1
+        self.counter = 0
+        self.stop.value = 0
+        fen = gs.to_fen()
+        settings = (gs.gameMode, gs.moveGeneration, gs.boardBackend)
+        movesByID = {move.moveID: move for move in validMoves}
+        rootOrder = list(validMoves)
+        self.moveOrderer.orderMoves(rootOrder, 0, NO_MOVE, gs.whiteToMove)
+        rootOrder = [move.moveID for move in rootOrder]
+
+        iterations = []
+        bestMove = None
+        bestScore = None
+        principalVariation = []
+        for searchDepth in range(1, maxDepth + 1):
+            self.alpha.value = -SmartMoveFinder.CHECKMATE
+            scores = {}
+            pvs = {}
+            # Best move of the last iteration alone first, its score is the bound for the others
+            completed = self.searchMoves([rootOrder[0]], fen, settings, searchDepth, deadline, nodes, stopEvent,
+                                         scores, pvs)
+            if completed:
+                completed = self.searchMoves(rootOrder[1:], fen, settings, searchDepth, deadline, nodes, stopEvent,
+                                             scores, pvs)
+            if not completed:
+                if bestMove is None and scores: # Not even depth 1 finished, the partial result is better than nothing
+                    bestMove = movesByID[max(scores, key=scores.get)]
+                    principalVariation = [bestMove]
+                break
+            # Stable sort keeps the previous order between moves that failed low with the same bound
+            rootOrder.sort(key=lambda moveID: scores[moveID], reverse=True)
+            bestMove = movesByID[rootOrder[0]]
+            bestScore = scores[rootOrder[0]]
+            elapsed = time.time() - startTime
+            principalVariation = self.replayMoves(gs, pvs[rootOrder[0]])
+            iterations.append({"depth": searchDepth, "nodes": self.counter, "seconds": elapsed, "score": bestScore,
+                               "pv": [move.getChessNotation() for move in principalVariation]})
+            if onIteration is not None:
+                onIteration(iterations[-1])
+            if deadline is not None and elapsed * 2 > movetime: # The next iteration would most likely not finish
+                break
+            if nodes is not None and self.counter >= nodes:
+                break
+        return SmartMoveFinder.SearchResult(bestMove, bestScore, principalVariation, self.counter,
+                                            iterations[-1]["depth"] if iterations else 0, time.time() - startTime,
+                                            iterations, None)
+
+    def searchMoves(self, moveIDs, fen, settings, depth, deadline, nodeLimit, stopEvent, scores, pvs):
+        """
+        Searches root moves on the pool and collects the scores of the ones that finished
+        Returns: True if every move was searched completely
+        """
+        remaining = None if nodeLimit is None else max(1, nodeLimit - self.counter)
+        pending = {self.pool.submit(searchRootMove, self.searchId, fen, settings, moveID, depth, deadline, remaining)
+                   for moveID in moveIDs}
+        self.pending = pending
+        completed = True
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=POLL_INTERVAL,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            self.pending = pending
+            for future in done:
+                if future.cancelled(): # close was called from another thread
+                    completed = False
+                    continue
+                moveID, score, nodes, pv, finished = future.result()
+                self.counter += nodes
+                if finished:
+                    scores[moveID] = score
+                    pvs[moveID] = pv
+                else:
+                    completed = False
+            if (stopEvent is not None and stopEvent.is_set()) or (deadline is not None and time.time() >= deadline) or \
+                    (nodeLimit is not None and self.counter >= nodeLimit):
+                completed = False
+            if not completed:
+                self.stop.value = 1 # Workers notice it at their next limit check and unwind
+        return completed
+
+    def replayMoves(self, gs, moveIDs):
+        """
+        Turns the moveIDs of a principal variation back into moves by playing them from gs
+        """
+        moves = []
+        for moveID in moveIDs:
+            move = next((m for m in gs.getValidMoves() if m.moveID == moveID), None)
+            if move is None:
+                break
+            moves.append(move)
+            gs.makeMove(move)
+        for _ in moves:
+            gs.undoMove()
+        return moves
+
+
+searcher = None
+
+
+def getSearcher(workers=DEFAULT_WORKERS):
+    """
+    Shared searcher, the pool is only recreated when the worker count changes
+    """
+    global searcher
+    if searcher is None or searcher.workers != workers:
+        if searcher is not None:
+            searcher.close()
+        searcher = ParallelSearcher(workers, SmartMoveFinder.defaultSearcher.book,
+                                    SmartMoveFinder.defaultSearcher.tablebases)
+    return searcher
+
+
+def findBestMove(gs, validMoves, depth=None, movetime=None, nodes=None, stopEvent=None, workers=DEFAULT_WORKERS):
+    return getSearcher(workers).findBestMove(gs, validMoves, depth, movetime, nodes, stopEvent)
+
+
+def searchPosition(gs, validMoves, depth=None, movetime=None, nodes=None, stopEvent=None, workers=DEFAULT_WORKERS):
+    return getSearcher(workers).searchPosition(gs, validMoves, depth, movetime, nodes, stopEvent)
@@ -0,0 +1,147 @@
+"""
+Perft (performance test) for the ChessEngine move generator
+Counts the leaf nodes of the legal move tree to a fixed depth and compares them with published counts
+Runs headless, only ChessEngine is imported
+
+Usage:
+python Perft.py --suite --depth 3
+python Perft.py --fen "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1" --depth 2 --divide
+"""
+import argparse
+import sys
+import time
+
+import ChessEngine
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Reference counts from the chess programming wiki
+# The engine only promotes to queens, so depths where underpromotions appear are left out
+REFERENCE_POSITIONS = [
+    ("startpos", START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862}),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6}),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+]
+
+BACKENDS = {"list": ChessEngine.LIST_BOARD, "bitboard": ChessEngine.BITBOARD, "mailbox": ChessEngine.MAILBOX}
+GENERATORS = {"pin": ChessEngine.PIN_CHECK, "makeundo": ChessEngine.MAKE_UNDO}
+
+
+def perft(gs, depth, cache=None):
+    """
+    Number of leaf nodes depth plies below the current position
+    cache is an optional dict of (zobristKey, depth) -> count, transposed subtrees are then only counted once
+    The bitboard backend counts on its packed moves without building Move objects or touching gs,
+    except with a cache, which needs the Zobrist keys of the GameState
+    """
+    if depth == 0:
+        return 1
+    if gs.bitboards is not None and cache is None:
+        return gs.bitboards.perft(gs.whiteToMove, gs.enpassantPossible, gs.currentCastlingRight, depth)
+    if cache is not None:
+        cached = cache.get((gs.zobristKey, depth))
+        if cached is not None:
+            return cached
+    moves = gs.getValidMoves()
+    if depth == 1: # Bulk counting, the leaves don't need to be made
+        nodes = len(moves)
+    else:
+        nodes = 0
+        for move in moves:
+            gs.makeMove(move)
+            nodes += perft(gs, depth - 1, cache)
+            gs.undoMove()
+    if cache is not None:
+        cache[(gs.zobristKey, depth)] = nodes
+    return nodes
+
+
+def divide(gs, depth, cache=None):
+    """
+    Perft split by root move
+    Returns: list of (move, nodes) pairs
+    """
+    results = []
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        results.append((move, perft(gs, depth - 1, cache)))
+        gs.undoMove()
+    return results
+
+
+def runPerft(fen, depth, showDivide=False, useCache=False, out=sys.stdout, **gameStateArgs):
+    """
+    Runs perft on a FEN position and reports nodes and nodes per second
+    Returns: dict with nodes, seconds and nps
+    """
+    gs = ChessEngine.GameState.from_fen(fen, **gameStateArgs)
+    cache = {} if useCache else None
+    startTime = time.perf_counter()
+    if showDivide:
+        results = divide(gs, depth, cache)
+        nodes = sum(count for _, count in results)
+    else:
+        results = None
+        nodes = perft(gs, depth, cache)
+    seconds = time.perf_counter() - startTime
+    nps = nodes / seconds if seconds > 0 else 0.0
+    if out is not None:
+        if results is not None:
+            for move, count in results:
+                out.write("%s: %d\n" % (move.getChessNotation(), count))
+        out.write("depth %d nodes %d time %.3fs nps %d\n" % (depth, nodes, seconds, nps))
+    return {"nodes": nodes, "seconds": seconds, "nps": nps}
+
+
+def runSuite(maxDepth, useCache=False, out=sys.stdout, **gameStateArgs):
+    """
+    Checks every reference position up to maxDepth
+    Returns: True if all counts match
+    """
+    allPassed = True
+    totalNodes = 0
+    totalSeconds = 0.0
+    for name, fen, expectedCounts in REFERENCE_POSITIONS:
+        for depth in sorted(expectedCounts):
+            if depth > maxDepth:
+                break
+            result = runPerft(fen, depth, useCache=useCache, out=None, **gameStateArgs)
+            passed = result["nodes"] == expectedCounts[depth]
+            allPassed = allPassed and passed
+            totalNodes += result["nodes"]
+            totalSeconds += result["seconds"]
+            if out is not None:
+                out.write("%-10s depth %d nodes %10d expected %10d %s %.3fs\n"
+                          % (name, depth, result["nodes"], expectedCounts[depth], "ok  " if passed else "FAIL",
+                             result["seconds"]))
+    if out is not None and totalSeconds > 0:
+        out.write("total nodes %d time %.3fs nps %d\n" % (totalNodes, totalSeconds, totalNodes / totalSeconds))
+    return allPassed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft for the ChessEngine move generator")
+    parser.add_argument("--fen", default=START_FEN)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the node count of every root move")
+    parser.add_argument("--cache", action="store_true", help="cache subtree counts by Zobrist key")
+    parser.add_argument("--suite", action="store_true", help="check all reference positions up to --depth")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="list")
+    parser.add_argument("--generator", choices=sorted(GENERATORS), default="pin")
+    args = parser.parse_args(argv)
+    gameStateArgs = {"boardBackend": BACKENDS[args.backend], "moveGeneration": GENERATORS[args.generator]}
+    if args.suite:
+        return 0 if runSuite(args.depth, args.cache, **gameStateArgs) else 1
+    runPerft(args.fen, args.depth, args.divide, args.cache, **gameStateArgs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
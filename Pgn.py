@@ -0,0 +1,351 @@
+"""
+PGN (Portable Game Notation) writing and reading
+The writer turns moves into standard algebraic notation (SAN) with disambiguation, promotion pieces, check and mate,
+and appends every game to the end of the file so an archive can grow during play
+The reader is a generator over the games of a file, it keeps only the game being read in memory
+Replaying a game matches each SAN move against the legal moves of the piece type it names, not the whole move list,
+so a malformed or illegal move raises ValueError instead of corrupting the replayed GameState
+
+Usage:
+writer = PgnWriter("games.pgn")
+writer.writeGameState(gs, result="1-0", headers={"White": "me", "Black": "engine"})
+for game, gs in replayPgn("games.pgn"):
+    print(game.headers.get("Result"), gs.to_fen())
+"""
+import time
+
+import ChessEngine
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+# Seven tag roster, written first and in this order
+STANDARD_TAGS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+LINE_LENGTH = 80
+
+
+def moveToSan(gs, move, validMoves):
+    """
+    SAN of move in the position of gs, validMoves are the legal moves there and are used for disambiguation
+    gs is left in the same position
+    """
+    if move.isCastleMove:
+        san = "O-O" if move.endCol > move.startCol else "O-O-O"
+    else:
+        pieceType = move.pieceMoved[1]
+        endSquare = move.getRankFile(move.endRow, move.endCol)
+        if pieceType == 'p':
+            san = (move.colsToFiles[move.startCol] + "x" if move.isCapture else "") + endSquare
+            if move.isPawnPromotion:
+                san += "=" + move.promotionPiece
+        else:
+            rivals = [m for m in validMoves if m.pieceMoved == move.pieceMoved and m.endRow == move.endRow and
+                      m.endCol == move.endCol and (m.startRow, m.startCol) != (move.startRow, move.startCol)]
+            disambiguation = ""
+            if rivals:
+                if all(m.startCol != move.startCol for m in rivals):
+                    disambiguation = move.colsToFiles[move.startCol]
+                elif all(m.startRow != move.startRow for m in rivals):
+                    disambiguation = move.rowsToRanks[move.startRow]
+                else:
+                    disambiguation = move.getRankFile(move.startRow, move.startCol)
+            san = pieceType + disambiguation + ("x" if move.isCapture else "") + endSquare
+    gs.makeMove(move)
+    if gs.inCheck():
+        gs.getValidMoves() # Only needed to tell check from mate
+        san += "#" if gs.checkmate else "+"
+    gs.undoMove()
+    return san
+
+
+def findMove(validMoves, move):
+    """
+    The move of validMoves that matches move, a Move of another GameState or a UCI string like e7e8q
+    """
+    if isinstance(move, str):
+        return next((m for m in validMoves if m.getChessNotation() == move), None)
+    return next((m for m in validMoves if m.moveID == move.moveID), None)
+
+
+def findLegalMove(gs, validMoves, move):
+    """
+    Like findMove, but move generation only makes queen promotions,
+    so an underpromotion is built from the matching queen promotion
+    Returns: the move, None if it isn't legal
+    """
+    legalMove = findMove(validMoves, move)
+    text = move if isinstance(move, str) else move.getChessNotation()
+    if legalMove is None and len(text) == 5 and text[4] in "nbr":
+        queenPromotion = findMove(validMoves, text[:4] + "q")
+        if queenPromotion is not None:
+            legalMove = ChessEngine.Move((queenPromotion.startRow, queenPromotion.startCol),
+                                         (queenPromotion.endRow, queenPromotion.endCol), gs.board,
+                                         promotionPiece=text[4].upper())
+    return legalMove
+
+
+def movesToSan(moves, startFen=START_FEN, **gameStateArgs):
+    """
+    Replays moves from startFen
+    Returns: list of SAN strings
+    """
+    gs = ChessEngine.GameState.from_fen(startFen, **gameStateArgs)
+    sanMoves = []
+    for move in moves:
+        validMoves = gs.getValidMoves()
+        legalMove = findLegalMove(gs, validMoves, move)
+        if legalMove is None:
+            raise ValueError("Illegal move %s in %s" % (move, gs.to_fen()))
+        sanMoves.append(moveToSan(gs, legalMove, validMoves))
+        gs.makeMove(legalMove)
+    return sanMoves
+
+
+def formatGame(sanMoves, result="*", headers=None, startFen=START_FEN):
+    """
+    PGN text of one game, movetext wrapped at LINE_LENGTH characters
+    """
+    headers = dict(headers or {})
+    headers["Result"] = result
+    for tag, default in zip(STANDARD_TAGS, ("?", "?", time.strftime("%Y.%m.%d"), "?", "?", "?")):
+        headers.setdefault(tag, default)
+    if startFen != START_FEN:
+        headers["SetUp"] = "1"
+        headers["FEN"] = startFen
+    lines = ['[%s "%s"]' % (tag, headers[tag].replace('\\', '\\\\').replace('"', '\\"'))
+             for tag in STANDARD_TAGS + tuple(tag for tag in headers if tag not in STANDARD_TAGS)]
+    lines.append("")
+    fields = startFen.split()
+    whiteToMove = len(fields) < 2 or fields[1] == 'w'
+    moveNumber = int(fields[5]) if len(fields) > 5 else 1
+    tokens = []
+    for san in sanMoves:
+        if whiteToMove:
+            tokens.append("%d." % moveNumber)
+        elif not tokens: # Game starts with black to move
+            tokens.append("%d..." % moveNumber)
+        tokens.append(san)
+        if not whiteToMove:
+            moveNumber += 1
+        whiteToMove = not whiteToMove
+    tokens.append(result)
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+class PgnWriter:
+    """
+    Appends games to a PGN file, each game is flushed as soon as it is written
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a")
+
+    def close(self):
+        self.file.close()
+
+    def writeGame(self, moves, result="*", headers=None, startFen=START_FEN, **gameStateArgs):
+        """
+        moves: Move objects or UCI strings, played from startFen
+        """
+        self.file.write(formatGame(movesToSan(moves, startFen, **gameStateArgs), result, headers, startFen))
+        self.file.flush()
+
+    def writeGameState(self, gs, result=None, headers=None):
+        """
+        Writes the moves in the log of gs, which is taken back to its first position and replayed to get there
+        Without a result it is read from the checkmate and stalemate flags, or "*" when the game isn't over
+        """
+        if result is None:
+            if gs.checkmate:
+                result = "0-1" if gs.whiteToMove else "1-0"
+            elif gs.stalemate:
+                result = "1/2-1/2"
+            else:
+                result = "*"
+        moves = list(gs.moveLog)
+        for _ in moves:
+            gs.undoMove()
+        startFen = gs.to_fen()
+        sanMoves = []
+        for move in moves:
+            sanMoves.append(moveToSan(gs, move, gs.getValidMoves()))
+            gs.makeMove(move)
+        gs.getValidMoves() # Restores the game over flags of the final position
+        self.file.write(formatGame(sanMoves, result, headers, startFen))
+        self.file.flush()
+
+
+class PgnGame:
+    def __init__(self, headers, moves, result):
+        self.headers = headers # Tag -> value
+        self.moves = moves     # SAN strings, without check marks and annotations
+        self.result = result
+
+    def startFen(self):
+        return self.headers.get("FEN", START_FEN)
+
+    def __repr__(self):
+        return "PgnGame(%r, %d moves, %r)" % (self.headers, len(self.moves), self.result)
+
+
+def parseHeader(line):
+    """
+    Returns: (tag, value) of a [Tag "value"] line
+    """
+    tag, _, value = line.strip()[1:-1].partition(' ')
+    value = value.strip()
+    if value.startswith('"') and value.endswith('"'):
+        value = value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return tag, value
+
+
+def readPgn(source):
+    """
+    Generator over the games of a PGN file
+    source is a path or an open text file, comments, variations and annotations are skipped
+    """
+    if isinstance(source, str):
+        with open(source) as pgnFile:
+            yield from readPgn(pgnFile)
+        return
+    headers = {}
+    moves = []
+    commentDepth = 0   # Inside {...}
+    variationDepth = 0 # Inside (...), variations can nest
+    inMovetext = False
+    for line in source:
+        if commentDepth == 0 and variationDepth == 0:
+            stripped = line.strip()
+            if stripped.startswith('%'): # Escaped line
+                continue
+            if stripped.startswith('['):
+                if inMovetext: # Game without a result token
+                    yield PgnGame(headers, moves, headers.get("Result", "*"))
+                    headers, moves, inMovetext = {}, [], False
+                tag, value = parseHeader(stripped)
+                headers[tag] = value
+                continue
+        token = ""
+        lineComment = False
+        for char in line + " ":
+            if commentDepth:
+                if char == '}':
+                    commentDepth = 0
+                continue
+            if char == '{':
+                commentDepth = 1
+            elif char == ';': # Rest of the line is a comment, inside variations too
+                lineComment = True
+            elif char == '(':
+                variationDepth += 1
+            elif char == ')':
+                variationDepth -= 1
+            elif variationDepth == 0 and not char.isspace():
+                token += char
+                continue
+            if token:
+                inMovetext = True
+                result = addToken(token, moves)
+                token = ""
+                if result is not None:
+                    yield PgnGame(headers, moves, result)
+                    headers, moves, inMovetext = {}, [], False
+            if lineComment:
+                break
+    if inMovetext or moves:
+        yield PgnGame(headers, moves, headers.get("Result", "*"))
+
+
+def addToken(token, moves):
+    """
+    Adds a movetext token to moves
+    Returns: the result when the token ends the game, None otherwise
+    """
+    if token in RESULTS:
+        return token
+    if token[0] == '$': # Numeric annotation glyph
+        return None
+    token = token.rstrip('+#!?')
+    token = token.lstrip('0123456789.') if token[0].isdigit() and token[:2] not in ("0-", "O-") else token
+    if token:
+        moves.append(token)
+    return None
+
+
+def sanToMove(gs, san):
+    """
+    Move object for a SAN move in the position of gs
+    The move is matched against the legal moves of the piece type it names, gs.getPieceMoves,
+    so malformed or illegal SAN raises ValueError without building the whole move list
+    Move generation only makes queen promotions, an underpromotion is built from the matching queen promotion
+    """
+    text = san.rstrip('+#!?')
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        kingside = len(text) == 3
+        moves = [move for move in gs.getPieceMoves('K')
+                 if move.isCastleMove and (move.endCol > move.startCol) == kingside]
+    else:
+        promotionPiece = None
+        if '=' in text:
+            text, _, promotionPiece = text.partition('=')
+        elif text and text[-1] in "NBRQ" and text[0].islower(): # e8Q
+            text, promotionPiece = text[:-1], text[-1]
+        if not text or promotionPiece not in (None, 'N', 'B', 'R', 'Q'):
+            raise ValueError("Can't read SAN move %r" % san)
+        pieceType = text[0] if text[0] in "NBRQK" else 'p'
+        body = (text[1:] if pieceType != 'p' else text).replace('x', '')
+        if len(body) < 2 or len(body) > 4 or body[-2] not in ChessEngine.Move.filesToCols or \
+                body[-1] not in ChessEngine.Move.ranksToRows:
+            raise ValueError("Can't read SAN move %r" % san)
+        endCol = ChessEngine.Move.filesToCols[body[-2]]
+        endRow = ChessEngine.Move.ranksToRows[body[-1]]
+        hintCol = hintRow = None # Disambiguation file, rank or both
+        for char in body[:-2]:
+            if char in ChessEngine.Move.filesToCols:
+                hintCol = ChessEngine.Move.filesToCols[char]
+            elif char in ChessEngine.Move.ranksToRows:
+                hintRow = ChessEngine.Move.ranksToRows[char]
+            else:
+                raise ValueError("Can't read SAN move %r" % san)
+        if pieceType == 'p':
+            if ('x' in text) != (hintCol is not None) or hintCol == endCol:
+                raise ValueError("Pawn capture %r needs the neighbouring file it comes from" % san)
+            if hintCol is None: # Pushes stay on their file
+                hintCol = endCol
+        moves = [move for move in gs.getPieceMoves(pieceType) if move.endRow == endRow and
+                 move.endCol == endCol and not move.isCastleMove and
+                 (hintCol is None or move.startCol == hintCol) and (hintRow is None or move.startRow == hintRow)]
+        if moves and moves[0].isPawnPromotion != (promotionPiece is not None):
+            moves = []
+        elif promotionPiece not in (None, 'Q'):
+            moves = [ChessEngine.Move((move.startRow, move.startCol), (move.endRow, move.endCol), gs.board,
+                                      promotionPiece=promotionPiece) for move in moves]
+    if len(moves) != 1:
+        raise ValueError("SAN move %r matches %d legal moves in %s" % (san, len(moves), gs.to_fen()))
+    return moves[0]
+
+
+def replayGame(game, **gameStateArgs):
+    """
+    Plays the moves of a PgnGame from its start position
+    Returns: GameState after the last move, its moveLog holds the game
+    """
+    gs = ChessEngine.GameState.from_fen(game.startFen(), **gameStateArgs)
+    for san in game.moves:
+        gs.makeMove(sanToMove(gs, san))
+    return gs
+
+
+def replayPgn(source, **gameStateArgs):
+    """
+    Generator of (PgnGame, GameState after its last move) for every game of a PGN file
+    """
+    for game in readPgn(source):
+        yield game, replayGame(game, **gameStateArgs)
@@ -0,0 +1,72 @@
+"""
+Batched NumPy encoder for GameStates, the general form of GameState.toHexapawnNetworkInput
+A batch of positions on boards of one size becomes a single array of shape (positions, PLANE_COUNT, size, size):
+12 piece planes (white pawn, knight, bishop, rook, queen, king, then the same for black) with a 1 where the piece stands,
+a side to move plane (all 1 when white is to move), 4 castling planes (all 1 when the right is still there)
+and an en passant plane with a 1 on the en passant square
+Boards are read as one byte string for the whole batch, so the only Python work per position is joining its board
+
+Usage:
+planes = encodePositions(states)
+buffer = numpy.empty((256, PLANE_COUNT, 8, 8), dtype=numpy.float32)
+planes = encodePositions(states, out=buffer) # Filled in place, planes is buffer[:len(states)]
+"""
+import numpy as np
+
+PIECE_PLANES = ('wp', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bp', 'bN', 'bB', 'bR', 'bQ', 'bK')
+SIDE_TO_MOVE_PLANE = len(PIECE_PLANES)
+CASTLING_PLANES = SIDE_TO_MOVE_PLANE + 1 # wks, wqs, bks, bqs
+ENPASSANT_PLANE = CASTLING_PLANES + 4
+PLANE_COUNT = ENPASSANT_PLANE + 1
+
+# Plane of each piece string indexed by its two character codes, -1 for empty squares
+PIECE_LOOKUP = np.full((256, 256), -1, dtype=np.int8)
+for plane, piece in enumerate(PIECE_PLANES):
+    PIECE_LOOKUP[ord(piece[0]), ord(piece[1])] = plane
+
+
+def encodePositions(states, out=None, dtype=np.float32):
+    """
+    Encodes a sequence of GameStates that all have the same board size
+    out: optional preallocated array of shape (at least len(states), PLANE_COUNT, size, size), filled in place
+    Returns: the encoded array, out[:len(states)] when out is given
+    """
+    count = len(states)
+    if count == 0:
+        raise ValueError("Nothing to encode")
+    size = len(states[0].board)
+    if any(len(gs.board) != size for gs in states):
+        raise ValueError("All positions in a batch must be on %dx%d boards" % (size, size))
+    shape = (count, PLANE_COUNT, size, size)
+    if out is None:
+        out = np.zeros(shape, dtype=dtype)
+    else:
+        if out.ndim != 4 or out.shape[0] < count or out.shape[1:] != shape[1:]:
+            raise ValueError("Output buffer of shape %s can't hold %s" % (out.shape, shape))
+        out = out[:count]
+        out.fill(0)
+
+    # Two bytes per square, color and piece type
+    text = "".join(["".join(map("".join, gs.board)) for gs in states]).encode("ascii")
+    chars = np.frombuffer(text, dtype=np.uint8).reshape(count, size * size, 2)
+    planes = PIECE_LOOKUP[chars[:, :, 0], chars[:, :, 1]]
+    stateIndex, square = np.nonzero(planes >= 0)
+    out[stateIndex, planes[stateIndex, square], square // size, square % size] = 1
+
+    features = np.array([(gs.whiteToMove, gs.currentCastlingRight.wks, gs.currentCastlingRight.wqs,
+                          gs.currentCastlingRight.bks, gs.currentCastlingRight.bqs) for gs in states], dtype=bool)
+    out[:, SIDE_TO_MOVE_PLANE:ENPASSANT_PLANE] = features[:, :, None, None]
+    enpassant = [(i, gs.enpassantPossible[0], gs.enpassantPossible[1])
+                 for i, gs in enumerate(states) if gs.enpassantPossible]
+    if enpassant:
+        stateIndex, rows, cols = np.array(enpassant).T
+        out[stateIndex, ENPASSANT_PLANE, rows, cols] = 1
+    return out
+
+
+def encodePosition(gs, dtype=np.float32):
+    """
+    Encodes a single GameState
+    Returns: array of shape (PLANE_COUNT, size, size)
+    """
+    return encodePositions([gs], dtype=dtype)[0]
@@ -0,0 +1,213 @@
+"""
+Headless benchmark for SmartMoveFinder
+Searches a fixed set of middlegame and endgame positions to a fixed depth or node limit and records
+nodes, nodes per second, time to reach each depth, effective branching factor and best move
+Results are written to JSON and can be compared against a stored baseline to catch slowdowns
+
+Usage:
+python SearchBenchmark.py --depth 3 --output bench.json
+python SearchBenchmark.py --depth 3 --baseline bench.json
+python SearchBenchmark.py --depth 4 --workers 4
+python SearchBenchmark.py --depth 3 --trace traces
+With --workers every position is also searched by ParallelSearch and the speedup over one core is reported
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import ChessEngine
+import Epd
+import ParallelSearch
+import Perft
+import SearchInstrumentation
+import SmartMoveFinder
+
+BENCHMARK_POSITIONS = [
+    ("italian", "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3"),
+    ("queens_gambit", "rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4"),
+    ("sicilian", "r1bqkb1r/pp2pppp/2np1n2/8/3NP3/2N5/PPP2PPP/R1BQKB1R w KQkq - 2 6"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("back_rank", "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1"),
+    ("rook_endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("pawn_endgame", "8/8/8/4k3/8/8/4P3/4K3 w - - 0 1"),
+]
+SEED = 12345 # Move ordering breaks ties randomly, a fixed seed keeps node counts repeatable
+SLOWDOWN_TOLERANCE = 0.10
+
+
+def benchmarkPosition(name, fen, depth=None, nodes=None, workers=1, traceDir=None, **gameStateArgs):
+    """
+    Searches one position from a cold transposition table and move orderer
+    With more than one worker the search runs on the ParallelSearch pool, whose tables are only aged between positions
+    With a traceDir the single core search is instrumented and its trace written to <name>.json and <name>.csv there
+    Returns: dict of results for the position
+    """
+    gs = ChessEngine.GameState.from_fen(fen, **gameStateArgs)
+    validMoves = gs.getValidMoves()
+    instrumentation = SearchInstrumentation.SearchInstrumentation() if traceDir is not None else None
+    if workers > 1:
+        searcher = ParallelSearch.getSearcher(workers)
+    else:
+        searcher = SmartMoveFinder.Searcher(instrumentation=instrumentation)
+    random.seed(SEED)
+    startTime = time.perf_counter()
+    searchResult = searcher.search(gs, validMoves, depth=depth, nodes=nodes)
+    seconds = time.perf_counter() - startTime
+    bestMove = searchResult.bestMove
+    iterations = searchResult.iterations
+    searchedNodes = searchResult.nodes
+    if instrumentation is not None and workers == 1:
+        os.makedirs(traceDir, exist_ok=True)
+        instrumentation.writeJson(os.path.join(traceDir, name + ".json"))
+        instrumentation.writeCsv(os.path.join(traceDir, name + ".csv"))
+    # Nodes of the last iteration over nodes of the one before it
+    branchingFactor = None
+    if len(iterations) >= 2:
+        lastNodes = iterations[-1]["nodes"] - iterations[-2]["nodes"]
+        previousNodes = iterations[-2]["nodes"] - (iterations[-3]["nodes"] if len(iterations) >= 3 else 0)
+        if previousNodes > 0:
+            branchingFactor = lastNodes / previousNodes
+    return {"name": name,
+            "fen": fen,
+            "bestMove": bestMove.getChessNotation() if bestMove is not None else None,
+            "depthReached": iterations[-1]["depth"] if iterations else 0,
+            "score": iterations[-1]["score"] if iterations else None,
+            "nodes": searchedNodes,
+            "seconds": seconds,
+            "nps": searchedNodes / seconds if seconds > 0 else 0.0,
+            "timeToDepth": {str(iteration["depth"]): iteration["seconds"] for iteration in iterations},
+            "branchingFactor": branchingFactor}
+
+
+def runBenchmark(depth=None, nodes=None, positions=None, out=sys.stdout, workers=1, traceDir=None, **gameStateArgs):
+    positions = positions if positions is not None else BENCHMARK_POSITIONS
+    results = []
+    for name, fen in positions:
+        result = benchmarkPosition(name, fen, depth, nodes, workers, traceDir, **gameStateArgs)
+        results.append(result)
+        if out is not None:
+            out.write("%-14s depth %2d nodes %8d time %7.3fs nps %7d ebf %5s best %s\n"
+                      % (name, result["depthReached"], result["nodes"], result["seconds"], result["nps"],
+                         "%.2f" % result["branchingFactor"] if result["branchingFactor"] is not None else "-",
+                         result["bestMove"]))
+    totalNodes = sum(result["nodes"] for result in results)
+    totalSeconds = sum(result["seconds"] for result in results)
+    summary = {"nodes": totalNodes, "seconds": totalSeconds,
+               "nps": totalNodes / totalSeconds if totalSeconds > 0 else 0.0}
+    if out is not None:
+        out.write("total nodes %d time %.3fs nps %d\n" % (totalNodes, totalSeconds, summary["nps"]))
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "limits": {"depth": depth, "nodes": nodes},
+            "workers": workers,
+            "settings": {key: str(value) for key, value in gameStateArgs.items()},
+            "positions": results,
+            "total": summary}
+
+
+def compareWithBaseline(current, baseline, tolerance=SLOWDOWN_TOLERANCE, out=sys.stdout):
+    """
+    Flags positions that got slower than the baseline by more than tolerance
+    Changed best moves or node counts are reported separately since they mean the search behaves differently
+    Returns: list of slowdown messages
+    """
+    baselinePositions = {result["name"]: result for result in baseline["positions"]}
+    slowdowns = []
+    for result in current["positions"]:
+        old = baselinePositions.get(result["name"])
+        if old is None:
+            continue
+        notes = []
+        if old["seconds"] > 0 and result["seconds"] > old["seconds"] * (1 + tolerance):
+            slowdowns.append("%s: %.3fs -> %.3fs" % (result["name"], old["seconds"], result["seconds"]))
+            notes.append("SLOWER")
+        if result["nodes"] != old["nodes"]:
+            notes.append("nodes %d -> %d" % (old["nodes"], result["nodes"]))
+        if result["bestMove"] != old["bestMove"]:
+            notes.append("best move %s -> %s" % (old["bestMove"], result["bestMove"]))
+        if out is not None:
+            out.write("%-14s time %7.3fs -> %7.3fs (%+.1f%%) %s\n"
+                      % (result["name"], old["seconds"], result["seconds"],
+                         (result["seconds"] / old["seconds"] - 1) * 100 if old["seconds"] > 0 else 0.0,
+                         " ".join(notes)))
+    oldTotal = baseline["total"]["seconds"]
+    newTotal = current["total"]["seconds"]
+    if oldTotal > 0 and newTotal > oldTotal * (1 + tolerance):
+        slowdowns.append("total: %.3fs -> %.3fs" % (oldTotal, newTotal))
+    if out is not None:
+        out.write("total time %.3fs -> %.3fs, %s\n"
+                  % (oldTotal, newTotal, "%d slowdowns" % len(slowdowns) if slowdowns else "no slowdowns"))
+    return slowdowns
+
+
+def compareSpeedup(single, parallel, out=sys.stdout):
+    """
+    Wall clock speedup of the parallel run over the single core run, per position and in total
+    Returns: dict of position name -> speedup, with the total under "total"
+    """
+    singlePositions = {result["name"]: result for result in single["positions"]}
+    speedups = {}
+    for result in parallel["positions"]:
+        old = singlePositions.get(result["name"])
+        if old is None or result["seconds"] <= 0:
+            continue
+        speedups[result["name"]] = old["seconds"] / result["seconds"]
+        if out is not None:
+            out.write("%-14s time %7.3fs -> %7.3fs speedup %5.2fx nodes %d -> %d\n"
+                      % (result["name"], old["seconds"], result["seconds"], speedups[result["name"]],
+                         old["nodes"], result["nodes"]))
+    if parallel["total"]["seconds"] > 0:
+        speedups["total"] = single["total"]["seconds"] / parallel["total"]["seconds"]
+        if out is not None:
+            out.write("total speedup %.2fx with %d workers\n" % (speedups["total"], parallel["workers"]))
+    return speedups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search benchmark for SmartMoveFinder")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare results against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=SLOWDOWN_TOLERANCE)
+    parser.add_argument("--epd", help="benchmark the positions of this EPD file instead of the built-in set")
+    parser.add_argument("--backend", choices=sorted(Perft.BACKENDS), default="list")
+    parser.add_argument("--trace", help="write a JSON and CSV search trace per position to this directory, "
+                                         "instrumented timings are slower than the plain run")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="also run the parallel search with this many worker processes and report the speedup")
+    args = parser.parse_args(argv)
+    if args.depth is None and args.nodes is None:
+        args.depth = 3
+    positions = None
+    if args.epd:
+        positions = [(position.getOperation('id', "position%d" % (index + 1)), position.fen)
+                     for index, position in enumerate(Epd.readEpd(args.epd))]
+    results = runBenchmark(args.depth, args.nodes, positions, traceDir=args.trace,
+                           boardBackend=Perft.BACKENDS[args.backend])
+    if args.workers > 1:
+        sys.stdout.write("parallel search with %d workers\n" % args.workers)
+        parallel = runBenchmark(args.depth, args.nodes, positions, workers=args.workers,
+                                boardBackend=Perft.BACKENDS[args.backend])
+        results["parallel"] = parallel
+        results["speedup"] = compareSpeedup(results, parallel)
+        ParallelSearch.getSearcher(args.workers).close()
+    if args.output:
+        with open(args.output, "w") as outFile:
+            json.dump(results, outFile, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        if compareWithBaseline(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Optional instrumentation for SmartMoveFinder.Searcher
+Collects, per search:
+time spent in each phase (move generation, legality filtering, evaluation, make and undo)
+nodes per ply, quiescence nodes, and at which move index beta cutoffs happen (index 0 means the ordering was right)
+Phase timers are installed on the GameState instance only while an instrumented search runs and removed after,
+a Searcher without instrumentation pays one "is not None" check per node
+
+Usage:
+instrumentation = SearchInstrumentation()
+searcher = SmartMoveFinder.Searcher(instrumentation=instrumentation)
+result = searcher.search(gs, gs.getValidMoves(), depth=4)
+instrumentation.writeJson("trace.json")
+"""
+import csv
+import json
+import time
+
+# GameState methods timed by phase, legality filtering runs inside move generation so its time is counted in both
+TIMED_METHODS = (("getValidMoves", "moveGeneration"),
+                 ("getCaptureMoves", "moveGeneration"),
+                 ("filterLegalMoves", "legalityFiltering"),
+                 ("makeMove", "makeUndo"),
+                 ("undoMove", "makeUndo"))
+PHASES = ("moveGeneration", "legalityFiltering", "evaluation", "makeUndo")
+CUTOFF_BUCKETS = 8 # Cutoffs at move index 7 and later share the last bucket
+
+
+class SearchInstrumentation:
+    def __init__(self, timePhases=True):
+        self.timePhases = timePhases
+        self.reset()
+
+    def reset(self):
+        self.phaseSeconds = {phase: 0.0 for phase in PHASES}
+        self.phaseCalls = {phase: 0 for phase in PHASES}
+        self.phaseActive = {phase: 0 for phase in PHASES} # Timed calls of each phase currently on the stack
+        self.nodesPerPly = []
+        self.quiescenceNodes = 0
+        self.cutoffsPerPly = []
+        self.cutoffsByMoveIndex = [0] * CUTOFF_BUCKETS
+        self.iterations = []
+        self.summary = {}
+
+    def timed(self, function, phase):
+        """
+        Wraps function so its calls and wall clock time are added to phase
+        Time of calls nested in another call of the same phase is only counted once,
+        like getValidMoves inside getCaptureMoves or makeMove inside an en passant legality test
+        """
+        instrumentation = self
+        perfCounter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            phaseActive = instrumentation.phaseActive
+            phaseActive[phase] += 1
+            startTime = perfCounter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                phaseActive[phase] -= 1
+                if phaseActive[phase] == 0:
+                    instrumentation.phaseSeconds[phase] += perfCounter() - startTime
+                instrumentation.phaseCalls[phase] += 1
+        return wrapper
+
+    def attach(self, gs):
+        """
+        Installs the phase timers as instance attributes, they shadow the GameState methods until detach
+        """
+        if not self.timePhases:
+            return
+        for name, phase in TIMED_METHODS:
+            setattr(gs, name, self.timed(getattr(gs, name), phase))
+
+    def detach(self, gs):
+        for name, _ in TIMED_METHODS:
+            gs.__dict__.pop(name, None)
+
+    def startSearch(self, gs):
+        self.reset()
+        self.attach(gs)
+
+    def endSearch(self, gs, result):
+        self.detach(gs)
+        self.summary = {"bestMove": result.bestMove.getChessNotation() if result.bestMove is not None else None,
+                        "score": result.score,
+                        "depth": result.depth,
+                        "nodes": result.nodes,
+                        "elapsed": result.elapsed}
+
+    def countNode(self, ply):
+        nodesPerPly = self.nodesPerPly
+        while len(nodesPerPly) <= ply:
+            nodesPerPly.append(0)
+            self.cutoffsPerPly.append(0)
+        nodesPerPly[ply] += 1
+
+    def countQuiescenceNode(self):
+        self.quiescenceNodes += 1
+
+    def recordCutoff(self, ply, moveIndex):
+        self.cutoffsPerPly[ply] += 1
+        self.cutoffsByMoveIndex[min(moveIndex, CUTOFF_BUCKETS - 1)] += 1
+
+    def recordIteration(self, iteration):
+        self.iterations.append(dict(iteration))
+
+    def toDict(self):
+        cutoffs = sum(self.cutoffsByMoveIndex)
+        return {"search": self.summary,
+                "phases": {phase: {"seconds": self.phaseSeconds[phase], "calls": self.phaseCalls[phase]}
+                           for phase in PHASES},
+                "nodesPerPly": list(self.nodesPerPly),
+                "quiescenceNodes": self.quiescenceNodes,
+                "cutoffsPerPly": list(self.cutoffsPerPly),
+                "cutoffsByMoveIndex": list(self.cutoffsByMoveIndex),
+                "firstMoveCutoffRate": self.cutoffsByMoveIndex[0] / cutoffs if cutoffs else 0.0,
+                "iterations": self.iterations}
+
+    def writeJson(self, path):
+        with open(path, "w") as outFile:
+            json.dump(self.toDict(), outFile, indent=2)
+
+    def writeCsv(self, path):
+        """
+        One metric,key,value row per number, easy to load into a spreadsheet or pandas
+        """
+        trace = self.toDict()
+        with open(path, "w", newline="") as outFile:
+            writer = csv.writer(outFile)
+            writer.writerow(("metric", "key", "value"))
+            for key, value in trace["search"].items():
+                writer.writerow(("search", key, value))
+            for phase, values in trace["phases"].items():
+                writer.writerow(("phaseSeconds", phase, values["seconds"]))
+                writer.writerow(("phaseCalls", phase, values["calls"]))
+            for ply, nodes in enumerate(trace["nodesPerPly"]):
+                writer.writerow(("nodesPerPly", ply, nodes))
+            writer.writerow(("quiescenceNodes", "", trace["quiescenceNodes"]))
+            for ply, cutoffs in enumerate(trace["cutoffsPerPly"]):
+                writer.writerow(("cutoffsPerPly", ply, cutoffs))
+            for index, cutoffs in enumerate(trace["cutoffsByMoveIndex"]):
+                writer.writerow(("cutoffsByMoveIndex", index, cutoffs))
+            writer.writerow(("firstMoveCutoffRate", "", trace["firstMoveCutoffRate"]))
+            for iteration in trace["iterations"]:
+                for key in ("nodes", "seconds", "score"):
+                    writer.writerow(("iteration" + key[0].upper() + key[1:], iteration["depth"], iteration[key]))
@@ -0,0 +1,381 @@
+"""
+Headless engine against engine matches
+Two engine configurations play game pairs from a list of openings, each opening once with either color,
+spread over a pool of worker processes
+Every finished game is appended to a JSON lines file as soon as it comes in, and the running score is turned into
+an Elo estimate and a sequential probability ratio test (SPRT)
+The SPRT tells whether the first engine is at least elo1 or at most elo0 stronger than the second,
+the default bounds [-10, 0] make it a non-regression test: can the faster variant be kept without losing strength?
+
+An engine is a comma separated list of settings:
+name=fast,depth=3,movetime=0.5,nodes=20000,eval=fullscan,quiescence=0,backend=bitboard,generator=makeundo,hash=16
+
+Usage:
+python SelfPlay.py --engine name=new,depth=3,backend=bitboard --engine name=old,depth=3 --games 1000 --workers 4
+python SelfPlay.py --engine name=new,movetime=0.2 --engine name=old,movetime=0.2 --openings openings.epd --out games.jsonl
+"""
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import ChessEngine
+import Epd
+import Perft
+import Pgn
+import SmartMoveFinder
+
+DEFAULT_OPENINGS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",  # Italian
+    "rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4",  # Queen's gambit declined
+    "rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq c6 0 2",    # Sicilian
+    "rnbqkbnr/pppp1ppp/4p3/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2",     # French
+    "rnbqkbnr/pp1ppppp/2p5/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2",     # Caro-Kann
+]
+ELO0 = -10.0
+ELO1 = 0.0
+ALPHA = 0.05
+BETA = 0.05
+
+
+# Evaluation table the GameState keeps up to date, without one makeMove skips the updates and leaves scan the board
+EVALUATIONS = {"incremental": SmartMoveFinder.evaluationTable, "fullscan": None}
+
+
+class EngineConfig:
+    """
+    Search limits and engine variant of one side of the match
+    """
+    def __init__(self, name, depth=None, movetime=None, nodes=None, evaluation="incremental", quiescence=True,
+                 backend="list", generator="pin", hashSizeMB=SmartMoveFinder.HASH_SIZE_MB):
+        if evaluation not in EVALUATIONS:
+            raise ValueError("Unknown evaluation %r, expected one of %s" % (evaluation, ", ".join(sorted(EVALUATIONS))))
+        if backend not in Perft.BACKENDS:
+            raise ValueError("Unknown backend %r" % backend)
+        if generator not in Perft.GENERATORS:
+            raise ValueError("Unknown generator %r" % generator)
+        self.name = name
+        self.depth = depth if depth is not None or movetime is not None or nodes is not None else SmartMoveFinder.DEPTH
+        self.movetime = movetime
+        self.nodes = nodes
+        self.evaluation = evaluation
+        self.quiescence = quiescence
+        self.backend = backend
+        self.generator = generator
+        self.hashSizeMB = hashSizeMB
+
+    @classmethod
+    def fromString(cls, text):
+        """
+        Parses "name=fast,depth=3,..." as given on the command line
+        """
+        settings = {}
+        for item in text.split(','):
+            key, separator, value = item.partition('=')
+            if not separator:
+                raise ValueError("Engine setting %r is not key=value" % item)
+            settings[key.strip()] = value.strip()
+        converters = {"name": ("name", str), "depth": ("depth", int), "movetime": ("movetime", float),
+                      "nodes": ("nodes", int), "eval": ("evaluation", str),
+                      "quiescence": ("quiescence", lambda value: value.lower() in ("1", "true", "yes", "on")),
+                      "backend": ("backend", str), "generator": ("generator", str), "hash": ("hashSizeMB", int)}
+        args = {}
+        for key, value in settings.items():
+            if key not in converters:
+                raise ValueError("Unknown engine setting %r, expected one of %s" % (key, ", ".join(sorted(converters))))
+            name, convert = converters[key]
+            args[name] = convert(value)
+        if "name" not in args:
+            raise ValueError("Engine %r needs a name" % text)
+        return cls(**args)
+
+    def toDict(self):
+        return {"name": self.name, "depth": self.depth, "movetime": self.movetime, "nodes": self.nodes,
+                "eval": self.evaluation, "quiescence": self.quiescence, "backend": self.backend,
+                "generator": self.generator, "hash": self.hashSizeMB}
+
+
+class Adjudication:
+    """
+    When a game is stopped before it ends on the board
+    resignScore/resignMoves: a side resigns after scoring itself at or below -resignScore for resignMoves moves
+    in a row while the opponent agrees with at least resignScore
+    drawScore/drawMoves/drawPly: draw once both sides scored within drawScore for drawMoves plies after drawPly
+    maxPlies: draw when the game gets this long
+    Threefold repetition and the fifty move rule are always draws
+    """
+    def __init__(self, resignScore=8.0, resignMoves=4, drawScore=0.1, drawMoves=10, drawPly=80, maxPlies=400):
+        self.resignScore = resignScore
+        self.resignMoves = resignMoves
+        self.drawScore = drawScore
+        self.drawMoves = drawMoves
+        self.drawPly = drawPly
+        self.maxPlies = maxPlies
+
+
+class Player:
+    """
+    One side of a game in a worker, with its own GameState so each side can use its own board backend
+    """
+    def __init__(self, config, fen):
+        self.config = config
+        self.gs = ChessEngine.GameState.from_fen(fen, boardBackend=Perft.BACKENDS[config.backend],
+                                                 moveGeneration=Perft.GENERATORS[config.generator])
+        self.searcher = SmartMoveFinder.Searcher(config.hashSizeMB, useQuiescence=config.quiescence,
+                                                 evaluationTable=EVALUATIONS[config.evaluation])
+        self.nodes = 0
+        self.seconds = 0.0
+        self.moves = 0
+
+    def search(self, validMoves):
+        config = self.config
+        startTime = time.perf_counter()
+        result = self.searcher.search(self.gs, validMoves, config.depth, config.movetime, config.nodes)
+        self.seconds += time.perf_counter() - startTime
+        self.nodes += result.nodes
+        self.moves += 1
+        return result
+
+    def toDict(self):
+        return {"moves": self.moves, "nodes": self.nodes, "seconds": self.seconds}
+
+
+def playGame(gameIndex, fen, white, black, adjudication, seed):
+    """
+    Plays one game in a worker process
+    Returns: dict with the result ("1-0", "0-1" or "1/2-1/2"), how it ended and the moves played
+    """
+    random.seed(seed) # Move ordering breaks ties randomly
+    players = {True: Player(white, fen), False: Player(black, fen)}
+    gs = players[True].gs
+    moves = []
+    lastScores = {True: None, False: None}
+    resignCounts = {True: 0, False: 0}
+    drawCount = 0
+    result = reason = None
+    while result is None:
+        player = players[gs.whiteToMove]
+        validMoves = player.gs.getValidMoves()
+        if player.gs.checkmate:
+            result, reason = ("0-1" if gs.whiteToMove else "1-0"), "checkmate"
+            break
+        if player.gs.stalemate:
+            result, reason = "1/2-1/2", "stalemate"
+            break
+        if gs.halfmoveClock >= 100:
+            result, reason = "1/2-1/2", "fifty moves"
+            break
+        if gs.zobristLog.count(gs.zobristKey) >= 3:
+            result, reason = "1/2-1/2", "repetition"
+            break
+        if len(moves) >= adjudication.maxPlies:
+            result, reason = "1/2-1/2", "max plies"
+            break
+
+        searchResult = player.search(validMoves)
+        move = searchResult.bestMove if searchResult.bestMove is not None else random.choice(validMoves)
+        side = gs.whiteToMove
+        score = searchResult.score
+        if score is not None:
+            lastScores[side] = score
+            resignCounts[side] = resignCounts[side] + 1 if score <= -adjudication.resignScore else 0
+            drawCount = drawCount + 1 if abs(score) <= adjudication.drawScore else 0
+        for other in players.values():
+            other.gs.makeMove(move)
+        moves.append(move.getChessNotation())
+
+        opponentScore = lastScores[not side]
+        if resignCounts[side] >= adjudication.resignMoves and opponentScore is not None and \
+                opponentScore >= adjudication.resignScore:
+            result, reason = ("0-1" if side else "1-0"), "resignation"
+        elif len(moves) >= adjudication.drawPly and drawCount >= adjudication.drawMoves:
+            result, reason = "1/2-1/2", "draw adjudication"
+    return {"game": gameIndex, "opening": fen, "white": white.name, "black": black.name, "result": result,
+            "reason": reason, "plies": len(moves), "moves": moves,
+            "stats": {"white": players[True].toDict(), "black": players[False].toDict()}}
+
+
+def eloFromScore(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+
+def scoreFromElo(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def scoreStats(wins, draws, losses):
+    """
+    Returns: (mean score per game, variance of one game's score)
+    """
+    games = wins + draws + losses
+    score = (wins + draws / 2.0) / games
+    variance = (wins * (1.0 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    return score, variance
+
+
+def eloEstimate(wins, draws, losses):
+    """
+    Returns: (Elo difference, half width of its 95% confidence interval), None before the first game
+    """
+    games = wins + draws + losses
+    if games == 0:
+        return None
+    score, variance = scoreStats(wins, draws, losses)
+    margin = 1.96 * math.sqrt(variance / games)
+    return eloFromScore(score), (eloFromScore(score + margin) - eloFromScore(score - margin)) / 2.0
+
+
+def sprt(wins, draws, losses, elo0=ELO0, elo1=ELO1, alpha=ALPHA, beta=BETA):
+    """
+    Generalized SPRT on the trinomial game results with the normal approximation of the log likelihood ratio
+    H0: the Elo difference is elo0, H1: it is elo1
+    Returns: dict with llr, the lower and upper bounds and the decision ("H0", "H1" or None to keep playing)
+    """
+    lower = math.log(beta / (1.0 - alpha))
+    upper = math.log((1.0 - beta) / alpha)
+    games = wins + draws + losses
+    llr = 0.0
+    if games > 0:
+        score, variance = scoreStats(wins, draws, losses)
+        if variance > 0:
+            score0 = scoreFromElo(elo0)
+            score1 = scoreFromElo(elo1)
+            llr = games * (score1 - score0) * (2.0 * score - score0 - score1) / (2.0 * variance)
+    decision = "H1" if llr >= upper else "H0" if llr <= lower else None
+    return {"llr": llr, "lower": lower, "upper": upper, "elo0": elo0, "elo1": elo1, "decision": decision}
+
+
+class MatchScore:
+    """
+    Running results from the first engine's point of view
+    """
+    def __init__(self, engine, opponent):
+        self.engine = engine
+        self.opponent = opponent
+        self.wins = self.draws = self.losses = 0
+        self.reasons = {}
+        self.stats = {name: {"moves": 0, "nodes": 0, "seconds": 0.0} for name in (engine, opponent)}
+
+    def add(self, game):
+        if game["result"] == "1/2-1/2":
+            self.draws += 1
+        elif (game["result"] == "1-0") == (game["white"] == self.engine):
+            self.wins += 1
+        else:
+            self.losses += 1
+        self.reasons[game["reason"]] = self.reasons.get(game["reason"], 0) + 1
+        for color in ("white", "black"):
+            totals = self.stats[game[color]]
+            for key, value in game["stats"][color].items():
+                totals[key] += value
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def summary(self, elo0=ELO0, elo1=ELO1, alpha=ALPHA, beta=BETA):
+        estimate = eloEstimate(self.wins, self.draws, self.losses)
+        return {"engine": self.engine, "opponent": self.opponent, "games": self.games(),
+                "wins": self.wins, "draws": self.draws, "losses": self.losses,
+                "elo": estimate[0] if estimate else None, "eloMargin": estimate[1] if estimate else None,
+                "sprt": sprt(self.wins, self.draws, self.losses, elo0, elo1, alpha, beta),
+                "reasons": dict(self.reasons),
+                "speed": {name: {"nps": totals["nodes"] / totals["seconds"] if totals["seconds"] > 0 else 0.0,
+                                 "secondsPerMove": totals["seconds"] / totals["moves"] if totals["moves"] else 0.0}
+                          for name, totals in self.stats.items()}}
+
+
+def readOpenings(path):
+    return [position.fen for position in Epd.readEpd(path)]
+
+
+def runMatch(engine, opponent, games, openings, workers, out, adjudication=None, elo0=ELO0, elo1=ELO1,
+             alpha=ALPHA, beta=BETA, stopOnSprt=True, seed=0, log=sys.stdout, pgn=None):
+    """
+    Plays games between two EngineConfigs, game 2k and 2k + 1 play the same opening with the colors swapped
+    out: open text file, one JSON line is written and flushed per finished game
+    pgn: optional Pgn.PgnWriter, every finished game is also appended to it
+    With stopOnSprt the match ends as soon as the SPRT accepts either hypothesis
+    Returns: MatchScore.summary()
+    """
+    adjudication = adjudication if adjudication is not None else Adjudication()
+    score = MatchScore(engine.name, opponent.name)
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for gameIndex in range(games):
+            fen = openings[(gameIndex // 2) % len(openings)]
+            white, black = (engine, opponent) if gameIndex % 2 == 0 else (opponent, engine)
+            pending.add(pool.submit(playGame, gameIndex, fen, white, black, adjudication, seed + gameIndex))
+        try:
+            for future in concurrent.futures.as_completed(pending):
+                game = future.result()
+                out.write(json.dumps(game) + "\n")
+                out.flush()
+                if pgn is not None:
+                    pgn.writeGame(game["moves"], game["result"],
+                                  {"Event": "SelfPlay %s vs %s" % (engine.name, opponent.name),
+                                   "Round": str(game["game"] + 1), "White": game["white"], "Black": game["black"],
+                                   "Termination": game["reason"]}, game["opening"])
+                score.add(game)
+                summary = score.summary(elo0, elo1, alpha, beta)
+                if log is not None:
+                    log.write("game %d/%d %s +%d -%d =%d elo %s llr %.2f (%.2f, %.2f)\n"
+                              % (score.games(), games, engine.name, score.wins, score.losses, score.draws,
+                                 "%+.1f +- %.1f" % (summary["elo"], summary["eloMargin"]),
+                                 summary["sprt"]["llr"], summary["sprt"]["lower"], summary["sprt"]["upper"]))
+                if stopOnSprt and summary["sprt"]["decision"] is not None:
+                    break
+        finally:
+            # Games that haven't started are dropped, running ones finish but are not counted
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+    return score.summary(elo0, elo1, alpha, beta)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless engine against engine matches with SPRT")
+    parser.add_argument("--engine", action="append", required=True,
+                        help="engine settings, given twice: the engine under test first, then the reference")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--openings", help="EPD or FEN file of start positions, the built-in openings otherwise")
+    parser.add_argument("--out", default="games.jsonl", help="append one JSON line per game to this file")
+    parser.add_argument("--summary", help="write the final summary to this JSON file")
+    parser.add_argument("--pgn", help="also append every game to this PGN file")
+    parser.add_argument("--elo0", type=float, default=ELO0)
+    parser.add_argument("--elo1", type=float, default=ELO1)
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--beta", type=float, default=BETA)
+    parser.add_argument("--no-sprt-stop", action="store_true", help="play all games even after the SPRT decided")
+    parser.add_argument("--max-plies", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if len(args.engine) != 2:
+        parser.error("give exactly two --engine options")
+    engine, opponent = [EngineConfig.fromString(text) for text in args.engine]
+    if engine.name == opponent.name:
+        parser.error("the engines need different names")
+    openings = readOpenings(args.openings) if args.openings else DEFAULT_OPENINGS
+    pgn = Pgn.PgnWriter(args.pgn) if args.pgn else None
+    with open(args.out, "a") as out:
+        summary = runMatch(engine, opponent, args.games, openings, args.workers, out,
+                           Adjudication(maxPlies=args.max_plies), args.elo0, args.elo1, args.alpha, args.beta,
+                           not args.no_sprt_stop, args.seed, pgn=pgn)
+    if pgn is not None:
+        pgn.close()
+    summary["engines"] = [engine.toDict(), opponent.toDict()]
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, "w") as summaryFile:
+            json.dump(summary, summaryFile, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,24 @@
+import os
 import random
+import time
+
+import ChessEngine
+from MoveOrdering import MoveOrderer
+from OpeningBook import OpeningBook
+from Tablebase import Tablebases, WIN, LOSS
+from TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
 
 pieceScore = {"K": 0, "Q": 10, "R": 5, "B": 3, "N": 3, "p": 1}
 CHECKMATE = 1000
 STALEMATE = 0
 DEPTH = 2
+MAX_DEPTH = 64
+HASH_SIZE_MB = 16
+NODE_CHECK_INTERVAL = 1024 # How many nodes are searched between clock checks, the node budget is checked at every node
+USE_QUIESCENCE = True
+DELTA_MARGIN = 2 # Captures that can't lift the score above alpha even with this bonus are skipped
+OPENING_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin") # Polyglot book, used if present
+TABLEBASES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases") # Small board tables, see Tablebase
 
 knightScores = [[1, 1, 1, 1, 1, 1, 1, 1],
                 [1, 2, 2, 2, 2, 2, 2, 1],
@@ -67,45 +82,333 @@ blackPawnScores = [[0, 0, 0, 0, 0, 0, 0, 0],
 
 piecePositionScores = {"N": knightScores, "Q": queenScores, "R": rookScores, "B": bishopScores, "bp": blackPawnScores, "wp": whitePawnScores}
 
+VERIFY_INCREMENTAL_EVAL = False # Compare the incremental score with a scan of the board through its table at every leaf
+EVALUATION_SCALE = 10 # Incremental scores are whole tenths of a pawn so they never drift
+
+
+def buildEvaluationTable():
+    """
+    Folds pieceScore and piecePositionScores into one value per piece per square (row * 8 + col)
+    Same terms as scoreBoardFullScan, scaled by EVALUATION_SCALE and signed by color
+    """
+    table = {}
+    for color, sign in (('w', 1), ('b', -1)):
+        for pieceType in pieceScore:
+            piece = color + pieceType
+            values = [0] * 64
+            for row in range(8):
+                for col in range(8):
+                    positionScore = 0
+                    if pieceType == 'p':
+                        positionScore = piecePositionScores[piece][row][col]
+                    elif pieceType != 'K':
+                        positionScore = piecePositionScores[pieceType][row][col]
+                    values[row * 8 + col] = sign * (pieceScore[pieceType] * EVALUATION_SCALE + positionScore)
+            table[piece] = values
+    return table
+
+
+evaluationTable = buildEvaluationTable()
+
 
 def findRandomMove(validMoves):
     return validMoves[random.randint(0, len(validMoves) - 1)]
 
-def findBestMove(gs, validMoves):
-    global nextMove,counter
-    nextMove = None
-    random.shuffle(validMoves)
-    counter = 0
-
-    findMoveNegaMaxAlphaBeta(gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE, 1 if gs.whiteToMove else -1)
-    print(counter)
-
-    return nextMove
-
-def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier):
-    global nextMove, counter
-    counter += 1
-    if depth == 0:
-        return turnMultiplier * scoreBoard(gs)
-
-    # Move Ordering - Implement Later
-
-    maxScore = -CHECKMATE
-    for move in validMoves:
-        gs.makeMove(move)
-        nextMoves = gs.getValidMoves()
-        score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth-1, -beta, -alpha, -turnMultiplier)
-        if score > maxScore:
-            maxScore = score
-            if depth == DEPTH:
-                nextMove = move
-                print(move, score)
-        gs.undoMove()
-        if maxScore > alpha:    # Pruning Happens
-            alpha = maxScore
-        if alpha >= beta:
-            break
-    return maxScore
+
+class SearchResult:
+    """
+    Outcome of one search
+    bestMove: best move of the last completed iteration, None if there were no moves
+    score: score of bestMove in pawns, from the point of view of the side to move
+    principalVariation: list of moves starting with bestMove
+    iterations: one dict per completed iteration with depth, nodes, seconds, score and pv
+    trace: SearchInstrumentation.toDict() when the Searcher was instrumented
+    fromBook: True when bestMove came from the opening book, score is then None
+    fromTablebase: True when bestMove came from the tablebases, score is then CHECKMATE, -CHECKMATE or STALEMATE
+    """
+    def __init__(self, bestMove, score, principalVariation, nodes, depth, elapsed, iterations, ttStats, trace=None,
+                 fromBook=False, fromTablebase=False):
+        self.bestMove = bestMove
+        self.score = score
+        self.principalVariation = principalVariation
+        self.nodes = nodes
+        self.depth = depth
+        self.elapsed = elapsed
+        self.iterations = iterations
+        self.ttStats = ttStats
+        self.trace = trace
+        self.fromBook = fromBook
+        self.fromTablebase = fromTablebase
+
+    def toDict(self):
+        return {"bestMove": self.bestMove.getChessNotation() if self.bestMove is not None else None,
+                "score": self.score,
+                "pv": [move.getChessNotation() for move in self.principalVariation],
+                "nodes": self.nodes,
+                "depth": self.depth,
+                "elapsed": self.elapsed,
+                "iterations": self.iterations,
+                "tt": self.ttStats,
+                "trace": self.trace,
+                "fromBook": self.fromBook,
+                "fromTablebase": self.fromTablebase}
+
+
+class Searcher:
+    """
+    Owns everything one search needs: limits, node counter, transposition table and move ordering tables
+    Separate Searchers can search at the same time, in threads or for different games
+    The tables are kept between searches so a Searcher should follow a single game
+    instrumentation: optional SearchInstrumentation that records phase times, nodes per ply and cutoffs
+    book: optional OpeningBook, positions found in it are answered with a book move without searching
+    tablebases: optional Tablebases, solved positions are answered with a perfect move without searching
+    defaultDepth: depth searched when search is called without any limit
+    useQuiescence: search captures after the depth runs out, in chess mode
+    deltaMargin: bonus a capture gets before delta pruning skips it in the quiescence search
+    evaluationTable: piece-square table, see buildEvaluationTable, kept up to date by the GameState during the search
+    and used to score the leaves, None scores every leaf with a full scan of the module tables instead
+    The module constants are only the defaults, each Searcher keeps its own settings
+    """
+    def __init__(self, hashSizeMB=HASH_SIZE_MB, instrumentation=None, book=None, tablebases=None, defaultDepth=DEPTH,
+                 useQuiescence=USE_QUIESCENCE, deltaMargin=DELTA_MARGIN, evaluationTable=evaluationTable):
+        self.transpositionTable = TranspositionTable(hashSizeMB)
+        self.moveOrderer = MoveOrderer(pieceScore)
+        self.instrumentation = instrumentation
+        self.book = book
+        self.tablebases = tablebases
+        self.defaultDepth = defaultDepth
+        self.useQuiescence = useQuiescence
+        self.deltaMargin = deltaMargin
+        self.evaluationTable = evaluationTable
+        self.evaluate = scoreBoard if instrumentation is None else instrumentation.timed(scoreBoard, "evaluation")
+        self.setLimits()
+        self.searchDepth = 0
+        self.nextMove = None
+        self.pvMoves = {}
+
+    def setLimits(self, movetime=None, nodes=None, stopEvent=None):
+        """
+        Starts the clock and the node counter for a new search
+        stopEvent: optional threading.Event, setting it from another thread cancels the search
+        """
+        self.deadline = time.time() + movetime if movetime is not None else None
+        self.nodeLimit = nodes
+        self.nodeStop = nodes if nodes is not None else float("inf") # One comparison per node, even without a budget
+        self.stopEvent = stopEvent
+        self.stopSearch = False
+        self.counter = 0
+
+    def search(self, gs, validMoves, depth=None, movetime=None, nodes=None, stopEvent=None, onIteration=None):
+        """
+        Iterative deepening driver, searches depth 1, 2, 3... until one of the limits is reached
+        depth: deepest iteration to search
+        movetime: wall clock budget in seconds
+        nodes: budget of searched nodes
+        onIteration: optional function called with the dict of every completed iteration, for progress reports
+        Without any limit the search goes to defaultDepth
+        Returns: SearchResult of the last completed iteration
+        """
+        result = probeRoot(gs, validMoves, self.book, self.tablebases)
+        if result is not None:
+            result.ttStats = self.transpositionTable.getStats()
+            return result
+        if gs.evaluationTable is not self.evaluationTable:
+            gs.setEvaluationTable(self.evaluationTable)
+        if depth is None and movetime is None and nodes is None:
+            depth = self.defaultDepth
+        maxDepth = depth if depth is not None else MAX_DEPTH
+        startTime = time.time()
+        self.setLimits(movetime, nodes, stopEvent)
+        self.pvMoves = {}
+        self.transpositionTable.newSearch()
+        self.moveOrderer.newSearch()
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.startSearch(gs)
+
+        try:
+            iterations = []
+            bestMove = None
+            bestScore = None
+            principalVariation = []
+            for self.searchDepth in range(1, maxDepth + 1):
+                self.nextMove = None
+                score = self.findMoveNegaMaxAlphaBeta(gs, validMoves, self.searchDepth, -CHECKMATE, CHECKMATE,
+                                                      1 if gs.whiteToMove else -1)
+                if self.stopSearch:
+                    if bestMove is None: # Not even depth 1 finished, the partial result is better than nothing
+                        bestMove = self.nextMove
+                        principalVariation = [bestMove] if bestMove is not None else []
+                    break
+                bestMove = self.nextMove
+                bestScore = score
+                # Principal variation of this iteration is searched first in the next one
+                pvLine = self.getPrincipalVariation(gs, self.searchDepth)
+                self.pvMoves = {key: move.moveID for key, move in pvLine}
+                principalVariation = [move for _, move in pvLine]
+                elapsed = time.time() - startTime
+                iterations.append({"depth": self.searchDepth, "nodes": self.counter, "seconds": elapsed,
+                                   "score": score, "pv": [move.getChessNotation() for move in principalVariation]})
+                if instrumentation is not None:
+                    instrumentation.recordIteration(iterations[-1])
+                if onIteration is not None:
+                    onIteration(iterations[-1])
+                if movetime is not None and elapsed * 2 > movetime: # The next iteration would most likely not finish
+                    break
+        finally: # An exception or a cancelled thread must not leave the phase timers on the GameState
+            if instrumentation is not None:
+                instrumentation.detach(gs)
+        result = SearchResult(bestMove, bestScore, principalVariation, self.counter,
+                              iterations[-1]["depth"] if iterations else 0, time.time() - startTime, iterations,
+                              self.transpositionTable.getStats())
+        if instrumentation is not None:
+            instrumentation.endSearch(gs, result)
+            result.trace = instrumentation.toDict()
+        return result
+
+    def checkLimits(self):
+        if (self.deadline is not None and time.time() >= self.deadline) or \
+                (self.nodeLimit is not None and self.counter >= self.nodeLimit) or \
+                (self.stopEvent is not None and self.stopEvent.is_set()):
+            self.stopSearch = True
+
+    def getPrincipalVariation(self, gs, maxLength):
+        """
+        Follows the best moves stored in the transposition table from the current position
+        Returns: list of (zobristKey, move) pairs, the key is the position the move is played from
+        """
+        transpositionTable = self.transpositionTable
+        line = []
+        seen = set()
+        while len(line) < maxLength and gs.zobristKey not in seen:
+            seen.add(gs.zobristKey)
+            entry = transpositionTable.probe(gs.zobristKey)
+            if entry < 0:
+                break
+            ttMove = transpositionTable.moves[entry]
+            move = next((m for m in gs.getValidMoves() if m.moveID == ttMove), None)
+            if move is None:
+                break
+            line.append((gs.zobristKey, move))
+            gs.makeMove(move)
+        for _ in line:
+            gs.undoMove()
+        return line
+
+    def findMoveNegaMaxAlphaBeta(self, gs, validMoves, depth, alpha, beta, turnMultiplier):
+        self.counter += 1
+        if self.counter >= self.nodeStop:
+            self.stopSearch = True
+        elif self.counter % NODE_CHECK_INTERVAL == 0:
+            self.checkLimits()
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.countNode(self.searchDepth - depth)
+        if depth == 0:
+            if self.useQuiescence and gs.gameMode == ChessEngine.CHESS:
+                return self.quiescenceSearch(gs, alpha, beta, turnMultiplier)
+            return turnMultiplier * self.evaluate(gs)
+
+        # Transposition table, scores are stored from the point of view of the side to move
+        transpositionTable = self.transpositionTable
+        alphaOriginal = alpha
+        ttMove = NO_MOVE
+        entry = transpositionTable.probe(gs.zobristKey)
+        if entry >= 0:
+            if depth != self.searchDepth and transpositionTable.depths[entry] >= depth:
+                score = transpositionTable.scores[entry]
+                bound = transpositionTable.bounds[entry]
+                if bound == EXACT or (bound == LOWER_BOUND and score >= beta) or (bound == UPPER_BOUND and score <= alpha):
+                    transpositionTable.cutoffs += 1
+                    return score
+            ttMove = transpositionTable.moves[entry]
+        ttMove = self.pvMoves.get(gs.zobristKey, ttMove) # Previous iteration's principal variation goes first
+
+        # Move Ordering, stored best move, then captures, killers and history
+        ply = self.searchDepth - depth
+        self.moveOrderer.orderMoves(validMoves, ply, ttMove, gs.whiteToMove)
+
+        maxScore = -CHECKMATE
+        bestMove = None
+        for moveIndex, move in enumerate(validMoves):
+            gs.makeMove(move)
+            # Quiescence search generates its own moves, so leaves don't need the full move list
+            nextMoves = gs.getValidMoves() if depth > 1 or not self.useQuiescence or gs.gameMode != ChessEngine.CHESS else None
+            score = -self.findMoveNegaMaxAlphaBeta(gs, nextMoves, depth-1, -beta, -alpha, -turnMultiplier)
+            gs.undoMove()
+            if self.stopSearch: # Unfinished scores are meaningless, unwind without storing anything
+                return 0
+            if score > maxScore:
+                maxScore = score
+                bestMove = move
+                if depth == self.searchDepth:
+                    self.nextMove = move
+            if maxScore > alpha:    # Pruning Happens
+                alpha = maxScore
+            if alpha >= beta:
+                self.moveOrderer.recordCutoff(move, ply, depth, gs.whiteToMove)
+                if instrumentation is not None:
+                    instrumentation.recordCutoff(ply, moveIndex)
+                break
+
+        if maxScore <= alphaOriginal:
+            bound = UPPER_BOUND
+        elif maxScore >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        transpositionTable.store(gs.zobristKey, depth, maxScore, bound, bestMove.moveID if bestMove is not None else NO_MOVE)
+        return maxScore
+
+    def quiescenceSearch(self, gs, alpha, beta, turnMultiplier):
+        """
+        Keeps searching captures after the depth runs out so leaves are only scored in quiet positions
+        The side to move may always stand pat instead of capturing, except when in check
+        """
+        self.counter += 1
+        if self.counter >= self.nodeStop:
+            self.stopSearch = True
+        elif self.counter % NODE_CHECK_INTERVAL == 0:
+            self.checkLimits()
+        if self.instrumentation is not None:
+            self.instrumentation.countQuiescenceNode()
+
+        inCheck = gs.inCheck()
+        if inCheck: # Every evasion has to be searched, this also finds checkmates
+            moves = gs.getValidMoves()
+            if len(moves) == 0:
+                return turnMultiplier * self.evaluate(gs)
+            standPat = maxScore = -CHECKMATE
+        else:
+            # Leaves come without a move list, so a stalemate has to be found here before standing pat
+            standPat = maxScore = turnMultiplier * self.evaluate(gs)
+            if standPat >= beta:
+                return standPat if gs.hasLegalMove(inCheck) else STALEMATE
+            if standPat > alpha:
+                alpha = standPat
+            moves = gs.getCaptureMoves()
+            if len(moves) == 0 and not gs.hasLegalMove(inCheck):
+                return STALEMATE
+        self.moveOrderer.orderCaptures(moves)
+
+        deltaMargin = self.deltaMargin
+        for move in moves:
+            # Delta pruning, skip captures that can't raise alpha even if the captured piece is won for free
+            if not inCheck and not move.isPawnPromotion and \
+                    standPat + pieceScore[move.pieceCaptured[1]] + deltaMargin <= alpha:
+                continue
+            gs.makeMove(move)
+            score = -self.quiescenceSearch(gs, -beta, -alpha, -turnMultiplier)
+            gs.undoMove()
+            if self.stopSearch:
+                return 0
+            if score > maxScore:
+                maxScore = score
+            if maxScore > alpha:
+                alpha = maxScore
+            if alpha >= beta:
+                break
+        return maxScore
 
 
 '''
@@ -121,6 +424,33 @@ def scoreBoard(gs):
     elif gs.stalemate:
         return STALEMATE
 
+    if gs.evaluationTable is None:
+        return scoreBoardFullScan(gs)
+    score = gs.boardScore / EVALUATION_SCALE # Whatever table the GameState keeps, see Searcher's evaluationTable
+    if VERIFY_INCREMENTAL_EVAL:
+        fullScore = scoreBoardTableScan(gs)
+        if abs(score - fullScore) > 1e-6:
+            raise RuntimeError("Incremental evaluation %s does not match full scan %s after %s"
+                               % (score, fullScore, gs.moveLog))
+    return score
+
+def scoreBoardTableScan(gs):
+    '''
+    Sum of the evaluation table of gs over the whole board, what the incremental boardScore should be
+    '''
+    table = gs.evaluationTable
+    score = 0
+    for row in range(len(gs.board)):
+        for col in range(len(gs.board[row])):
+            square = gs.board[row][col]
+            if square != "--":
+                score += table[square][row * 8 + col]
+    return score / EVALUATION_SCALE
+
+def scoreBoardFullScan(gs):
+    '''
+    Material and piece position score from a scan of the whole board
+    '''
     score = 0
     for row in range(len(gs.board)):
         for col in range(len(gs.board[row])):
@@ -138,3 +468,71 @@ def scoreBoard(gs):
                     score -= pieceScore[square[1]] + (piecePositionScore * 0.1)
 
     return score
+
+
+def probeRoot(gs, validMoves, book=None, tablebases=None):
+    """
+    Looks the root position up in the tablebases and then in the opening book
+    Returns: SearchResult with the move found, None when the position has to be searched
+    """
+    if tablebases is not None:
+        found = tablebases.findMove(gs, validMoves)
+        if found is not None:
+            move, result, distance = found
+            score = CHECKMATE if result == WIN else -CHECKMATE if result == LOSS else STALEMATE
+            return SearchResult(move, score, [move], 0, 0, 0.0, [], None, fromTablebase=True)
+    if book is not None:
+        move = book.findMove(gs, validMoves)
+        if move is not None:
+            return SearchResult(move, None, [move], 0, 0, 0.0, [], None, fromBook=True)
+    return None
+
+
+def loadOpeningBook(path=OPENING_BOOK):
+    """
+    Returns: OpeningBook for path, None when there is no book file
+    """
+    if not os.path.isfile(path):
+        return None
+    return OpeningBook(path)
+
+
+def loadTablebases(directory=TABLEBASES):
+    """
+    Returns: Tablebases with the tables in directory, None when there is no such directory
+    """
+    if not os.path.isdir(directory):
+        return None
+    return Tablebases(directory)
+
+
+defaultSearcher = Searcher(book=loadOpeningBook(), tablebases=loadTablebases())
+
+
+def printIteration(iteration):
+    print("depth %d nodes %d time %.2f pv %s" % (iteration["depth"], iteration["nodes"], iteration["seconds"],
+                                                 " ".join(iteration["pv"])))
+
+
+def searchPosition(gs, validMoves, depth=None, movetime=None, nodes=None, stopEvent=None):
+    """
+    Searches with the shared defaultSearcher and prints its progress, as used by ChessMain
+    Only one searchPosition or findBestMove call can run at a time, create a Searcher for concurrent searches
+    Returns: SearchResult
+    """
+    result = defaultSearcher.search(gs, validMoves, depth, movetime, nodes, stopEvent, printIteration)
+    if result.fromBook:
+        print("book move %s" % result.bestMove.getChessNotation())
+    elif result.fromTablebase:
+        print("tablebase move %s score %s" % (result.bestMove.getChessNotation(), result.score))
+    else:
+        stats = result.ttStats
+        print("TT hits %.1f%% cutoffs %.1f%% full %d/1000" % (stats["hitRate"] * 100, stats["cutoffRate"] * 100, stats["hashfull"]))
+    return result
+
+
+def findBestMove(gs, validMoves, depth=None, movetime=None, nodes=None, stopEvent=None):
+    """
+    Returns the best move of the last completed iteration of searchPosition
+    """
+    return searchPosition(gs, validMoves, depth, movetime, nodes, stopEvent).bestMove
@@ -0,0 +1,419 @@
+"""
+Retrograde solved tablebases for the small boards
+Hexapawn is solved for every position reachable from the start, Gardner (5x5 chess) for the endgames in GARDNER_ENDGAMES
+Positions are generated forward with the normal GameState move generator, so the tables follow the engine's own
+game over rules, then solved backwards from the finished games:
+a position is won if one move reaches a position lost for the opponent,
+lost if every move reaches a position won for the opponent, and drawn if neither ever happens
+
+Every table is a file of 16 bit entries, win/draw/loss in the low 2 bits and the distance to the end of the game
+in plies in the rest, both from the point of view of the side to move
+The entry of a position is found with a perfect hash of its board, no keys are stored:
+hexapawn numbers the board as a base 3 number (empty, white pawn, black pawn per square),
+endgames rank the squares of their pieces with the squares already taken left out
+Tables are memory mapped, so probing only reads the pages it touches
+
+Usage:
+python Tablebase.py --out tablebases hexapawn gardner
+tablebases = Tablebases("tablebases")
+move = tablebases.findMove(gs, gs.getValidMoves())
+"""
+import argparse
+import array
+import heapq
+import mmap
+import os
+import struct
+import sys
+import time
+
+import ChessEngine
+
+MAGIC = b"MCTB"
+HEADER_STRUCT = struct.Struct("<4sBBB8sI") # magic, board size, index kind, piece count, pieces as FEN letters, entries
+ENTRY_STRUCT = struct.Struct("<H")
+PAWN_INDEX = 0  # Base 3 number of the board, hexapawn
+PIECE_INDEX = 1 # Ranked squares of a fixed set of pieces, endgames
+TABLE_EXTENSION = ".tb"
+
+# Results, 0 marks positions that are unreachable or illegal
+UNKNOWN = 0
+LOSS = 1
+DRAW = 2
+WIN = 3
+MAX_DISTANCE = (1 << 14) - 1
+
+PAWN_DIGITS = {'--': 0, 'wp': 1, 'bp': 2}
+FEN_LETTERS = {'wK': 'K', 'wQ': 'Q', 'wR': 'R', 'wB': 'B', 'wN': 'N', 'wp': 'P',
+               'bK': 'k', 'bQ': 'q', 'bR': 'r', 'bB': 'b', 'bN': 'n', 'bp': 'p'}
+FEN_PIECES = {letter: piece for piece, letter in FEN_LETTERS.items()}
+GARDNER_SIZE = 5
+# King and queen or king and rook against a bare king, for both colors
+GARDNER_ENDGAMES = (('wK', 'bK', 'wQ'), ('wK', 'bK', 'bQ'), ('wK', 'bK', 'wR'), ('wK', 'bK', 'bR'))
+
+
+def pawnIndex(gs, size):
+    """
+    Index of a hexapawn position, None if there is anything but pawns on the board
+    """
+    index = 0
+    for row in gs.board:
+        for piece in row:
+            digit = PAWN_DIGITS.get(piece)
+            if digit is None:
+                return None
+            index = index * 3 + digit
+    return index * 2 + (0 if gs.whiteToMove else 1)
+
+
+def pieceIndex(gs, size, pieces):
+    """
+    Index of an endgame position with exactly the given pieces, None if the material is different
+    Each square is ranked among the squares the earlier pieces left free
+    """
+    squares = {piece: [] for piece in pieces}
+    found = 0
+    for r in range(size):
+        row = gs.board[r]
+        for c in range(size):
+            piece = row[c]
+            if piece != '--':
+                pieceSquares = squares.get(piece)
+                if pieceSquares is None:
+                    return None
+                pieceSquares.append(r * size + c)
+                found += 1
+    if found != len(pieces):
+        return None
+    index = 0
+    taken = []
+    freeSquares = size * size
+    for piece in pieces: # Equal pieces take their squares in board order
+        square = squares[piece].pop(0)
+        index = index * freeSquares + square - sum(1 for t in taken if t < square)
+        taken.append(square)
+        freeSquares -= 1
+    return index * 2 + (0 if gs.whiteToMove else 1)
+
+
+def entryCount(size, indexKind, pieces):
+    if indexKind == PAWN_INDEX:
+        return 3 ** (size * size) * 2
+    count = 2
+    for i in range(len(pieces)):
+        count *= size * size - i
+    return count
+
+
+def tableName(size, indexKind, pieces):
+    if indexKind == PAWN_INDEX:
+        return "hexapawn" + TABLE_EXTENSION
+    white = "".join(piece[1] for piece in pieces if piece[0] == 'w')
+    black = "".join(piece[1] for piece in pieces if piece[0] == 'b')
+    return "gardner-%sv%s%s" % (white, black, TABLE_EXTENSION)
+
+
+class TableLayout:
+    """
+    Board size, index kind and pieces of a table, enough to index positions while the table is generated
+    """
+    def __init__(self, size, indexKind, pieces=()):
+        self.size = size
+        self.indexKind = indexKind
+        self.pieces = tuple(pieces)
+        self.entryCount = entryCount(size, indexKind, pieces)
+
+    def index(self, gs):
+        if self.indexKind == PAWN_INDEX:
+            return pawnIndex(gs, self.size)
+        return pieceIndex(gs, self.size, self.pieces)
+
+
+class Tablebase(TableLayout):
+    """
+    One memory mapped table file
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as tableFile:
+            self.data = mmap.mmap(tableFile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, indexKind, pieceCount, pieceLetters, storedCount = HEADER_STRUCT.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a tablebase file" % path)
+        TableLayout.__init__(self, size, indexKind,
+                             [FEN_PIECES[letter] for letter in pieceLetters[:pieceCount].decode("ascii")])
+        if storedCount != self.entryCount or len(self.data) != HEADER_STRUCT.size + storedCount * ENTRY_STRUCT.size:
+            raise ValueError("%s is truncated or has the wrong layout" % path)
+
+    def close(self):
+        self.data.close()
+
+    def probe(self, gs):
+        """
+        Returns: (result, distance) for the side to move, None when the position is not in this table
+        """
+        index = self.index(gs)
+        if index is None:
+            return None
+        entry = ENTRY_STRUCT.unpack_from(self.data, HEADER_STRUCT.size + index * ENTRY_STRUCT.size)[0]
+        if entry & 3 == UNKNOWN:
+            return None
+        return entry & 3, entry >> 2
+
+
+class Tablebases:
+    """
+    Every table file in a directory, a position is looked up in the table for its board and material
+    """
+    def __init__(self, directory):
+        self.pawnTables = {}  # board size -> Tablebase
+        self.pieceTables = {} # (board size, sorted pieces) -> Tablebase
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(TABLE_EXTENSION):
+                self.add(Tablebase(os.path.join(directory, name)))
+
+    def add(self, table):
+        if table.indexKind == PAWN_INDEX:
+            self.pawnTables[table.size] = table
+        else:
+            self.pieceTables[(table.size, tuple(sorted(table.pieces)))] = table
+
+    def close(self):
+        for table in list(self.pawnTables.values()) + list(self.pieceTables.values()):
+            table.close()
+
+    def getTable(self, gs):
+        size = len(gs.board)
+        if gs.gameMode == ChessEngine.HEXAPAWN:
+            return self.pawnTables.get(size)
+        if gs.gameMode != ChessEngine.GARDNER: # Tables only follow the Gardner rules
+            return None
+        pieces = tuple(sorted(piece for row in gs.board for piece in row if piece != '--'))
+        return self.pieceTables.get((size, pieces))
+
+    def probe(self, gs):
+        """
+        Returns: (result, distance) for the side to move, None when no table covers the position
+        """
+        table = self.getTable(gs)
+        return table.probe(gs) if table is not None else None
+
+    def probeAfterMove(self, gs):
+        """
+        Like probe but also scores finished games, for the position right after a move
+        """
+        gs.getValidMoves()
+        if gs.checkmate:
+            return LOSS, 0
+        if gs.stalemate:
+            return DRAW, 0
+        return self.probe(gs)
+
+    def findMove(self, gs, validMoves):
+        """
+        Perfect move from the tables: the fastest win, a draw, or else the slowest loss
+        Returns: (move, result, distance) with result and distance of the root position, None if any move isn't covered
+        """
+        if self.getTable(gs) is None or not validMoves:
+            return None
+        best = None
+        for move in validMoves:
+            gs.makeMove(move)
+            probed = self.probeAfterMove(gs)
+            gs.undoMove()
+            if probed is None:
+                return None
+            result, distance = probed
+            # Opponent's loss is our win, sooner is better, our loss is better later
+            if result == LOSS:
+                candidate = (2, -distance, move, WIN, distance + 1)
+            elif result == DRAW:
+                candidate = (1, 0, move, DRAW, 0)
+            else:
+                candidate = (0, distance, move, LOSS, distance + 1)
+            if best is None or candidate[:2] > best[:2]:
+                best = candidate
+        return best[2:]
+
+
+def solve(gs, positions, table, externalProbe):
+    """
+    Retrograde analysis of the positions of one table
+    positions: dict of index -> FEN of every position in the table
+    externalProbe: function returning (result, distance) for a finished game or a position outside this table
+    Returns: array of entries
+    """
+    entries = array.array('H', [UNKNOWN]) * table.entryCount
+    predecessors = {index: [] for index in positions}
+    remaining = {}
+    heap = [] # (distance, result, kind, index), kind 0 is a table position and 1 a move leaving the table from index
+    for index, fen in positions.items():
+        gs.setFen(fen)
+        moves = gs.getValidMoves()
+        if gs.checkmate or gs.stalemate:
+            result = LOSS if gs.checkmate else DRAW
+            entries[index] = result
+            if result == LOSS:
+                heapq.heappush(heap, (0, LOSS, 0, index))
+            continue
+        remaining[index] = len(moves)
+        for move in moves:
+            gs.makeMove(move)
+            childIndex = table.index(gs)
+            if childIndex is not None:
+                predecessors[childIndex].append(index)
+            else:
+                result, distance = externalProbe(gs)
+                if result != DRAW: # A draw just never resolves its parent
+                    heapq.heappush(heap, (distance, result, 1, index))
+            gs.undoMove()
+
+    # Positions are resolved in order of distance, so the first win found is the fastest
+    # and the last losing move resolved is the slowest
+    while heap:
+        distance, result, kind, index = heapq.heappop(heap)
+        parents = predecessors[index] if kind == 0 else (index,)
+        if distance + 1 > MAX_DISTANCE:
+            raise ValueError("Distance %d does not fit in a table entry" % (distance + 1))
+        for parent in parents:
+            if entries[parent] != UNKNOWN:
+                continue
+            if result == LOSS:
+                entries[parent] = WIN | (distance + 1) << 2
+                heapq.heappush(heap, (distance + 1, WIN, 0, parent))
+            else:
+                remaining[parent] -= 1
+                if remaining[parent] == 0:
+                    entries[parent] = LOSS | (distance + 1) << 2
+                    heapq.heappush(heap, (distance + 1, LOSS, 0, parent))
+    for index in positions:
+        if entries[index] == UNKNOWN:
+            entries[index] = DRAW
+    return entries
+
+
+def writeTable(path, table, entries):
+    pieceLetters = "".join(FEN_LETTERS[piece] for piece in table.pieces).encode("ascii")
+    with open(path, "wb") as tableFile:
+        tableFile.write(HEADER_STRUCT.pack(MAGIC, table.size, table.indexKind, len(table.pieces), pieceLetters,
+                                           table.entryCount))
+        if sys.byteorder != "little":
+            entries.byteswap()
+        entries.tofile(tableFile)
+
+
+def finishedGame(gs):
+    """
+    externalProbe for tables that can only be left by ending the game
+    """
+    gs.getValidMoves()
+    if gs.checkmate:
+        return LOSS, 0
+    if gs.stalemate:
+        return DRAW, 0
+    raise ValueError("Position %s is not covered by the table being generated" % gs.to_fen())
+
+
+def generateHexapawn(directory):
+    """
+    Solves every position reachable from the hexapawn start position
+    """
+    gs = ChessEngine.GameState(gameMode=ChessEngine.HEXAPAWN)
+    gs.toHexapawn()
+    table = TableLayout(len(gs.board), PAWN_INDEX)
+    positions = {table.index(gs): gs.to_fen()}
+    frontier = [gs.to_fen()]
+    while frontier:
+        fen = frontier.pop()
+        gs.setFen(fen)
+        moves = gs.getValidMoves()
+        if gs.checkmate or gs.stalemate:
+            continue
+        for move in moves:
+            gs.makeMove(move)
+            index = table.index(gs)
+            if index is not None and index not in positions: # Positions with a queen are finished games
+                positions[index] = gs.to_fen()
+                frontier.append(positions[index])
+            gs.undoMove()
+    entries = solve(gs, positions, table, finishedGame)
+    path = os.path.join(directory, tableName(table.size, table.indexKind, table.pieces))
+    writeTable(path, table, entries)
+    return path, len(positions)
+
+
+def gardnerFen(size, pieces, squares, whiteToMove):
+    board = [['--'] * size for _ in range(size)]
+    for piece, square in zip(pieces, squares):
+        board[square // size][square % size] = piece
+    ranks = []
+    for row in board:
+        rankText = ''
+        empty = 0
+        for piece in row:
+            if piece == '--':
+                empty += 1
+                continue
+            if empty:
+                rankText += str(empty)
+                empty = 0
+            rankText += FEN_LETTERS[piece]
+        if empty:
+            rankText += str(empty)
+        ranks.append(rankText)
+    return "%s %s - - 0 1" % ('/'.join(ranks), 'w' if whiteToMove else 'b')
+
+
+def placements(squareCount, pieceCount, taken=()):
+    if pieceCount == 0:
+        yield taken
+        return
+    for square in range(squareCount):
+        if square not in taken:
+            yield from placements(squareCount, pieceCount - 1, taken + (square,))
+
+
+def generateGardnerEndgame(directory, pieces):
+    """
+    Solves every legal placement of pieces on the Gardner board, with either side to move
+    Positions where the side that just moved is in check can't happen and are left out
+    """
+    gs = ChessEngine.GameState(gameMode=ChessEngine.GARDNER)
+    gs.toGardner()
+    table = TableLayout(GARDNER_SIZE, PIECE_INDEX, pieces)
+    positions = {}
+    for squares in placements(GARDNER_SIZE * GARDNER_SIZE, len(pieces)):
+        for whiteToMove in (True, False):
+            fen = gardnerFen(GARDNER_SIZE, pieces, squares, whiteToMove)
+            gs.setFen(fen)
+            gs.whiteToMove = not whiteToMove
+            if gs.inCheck():
+                continue
+            gs.whiteToMove = whiteToMove
+            positions[table.index(gs)] = fen
+    entries = solve(gs, positions, table, finishedGame)
+    path = os.path.join(directory, tableName(table.size, table.indexKind, table.pieces))
+    writeTable(path, table, entries)
+    return path, len(positions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate retrograde solved tablebases for the small boards")
+    parser.add_argument("variants", nargs="+", choices=("hexapawn", "gardner"))
+    parser.add_argument("--out", default="tablebases", help="directory for the table files")
+    args = parser.parse_args(argv)
+    os.makedirs(args.out, exist_ok=True)
+    jobs = []
+    if "hexapawn" in args.variants:
+        jobs.append((generateHexapawn, ()))
+    if "gardner" in args.variants:
+        jobs += [(generateGardnerEndgame, (pieces,)) for pieces in GARDNER_ENDGAMES]
+    for generate, extraArgs in jobs:
+        startTime = time.perf_counter()
+        path, positionCount = generate(args.out, *extraArgs)
+        print("%s positions %d time %.1fs" % (path, positionCount, time.perf_counter() - startTime))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Fixed size transposition table for the negamax search
+Entries are kept in parallel typed arrays instead of Python objects so the memory used is known up front
+The table is split in buckets of two slots:
+slot 0 is depth-preferred, it keeps the deepest result unless that result is from an older search
+slot 1 is always replaced, so recent shallow results are still available
+"""
+from array import array
+
+EXACT = 0
+LOWER_BOUND = 1 # Score failed high, the real score is at least this
+UPPER_BOUND = 2 # Score failed low, the real score is at most this
+NO_MOVE = -1
+# key (8) + score (8) + move (4) + depth (1) + bound (1) + generation (1)
+ENTRY_BYTES = 23
+EMPTY_DEPTH = -1
+
+
+class TranspositionTable:
+    def __init__(self, sizeMB=16):
+        self.generation = 0
+        self.resize(sizeMB)
+
+    def resize(self, sizeMB):
+        """
+        Allocates the table, every entry is lost
+        """
+        self.sizeMB = sizeMB
+        self.bucketCount = max(1, int(sizeMB * 1024 * 1024) // (2 * ENTRY_BYTES))
+        entries = self.bucketCount * 2
+        self.keys = array('Q', [0]) * entries
+        self.scores = array('d', [0.0]) * entries
+        self.moves = array('i', [NO_MOVE]) * entries
+        self.depths = array('b', [EMPTY_DEPTH]) * entries
+        self.bounds = array('B', [EXACT]) * entries
+        self.generations = array('B', [0]) * entries
+        self.resetStats()
+
+    def clear(self):
+        self.resize(self.sizeMB)
+
+    def newSearch(self):
+        """
+        Called once per findBestMove so entries from earlier searches age out of the depth-preferred slot
+        """
+        self.generation = (self.generation + 1) & 0xFF
+        self.resetStats()
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """
+        Returns the index of the entry for key or -1 if the position is not stored
+        """
+        self.probes += 1
+        index = (key % self.bucketCount) * 2
+        if self.keys[index] == key and self.depths[index] != EMPTY_DEPTH:
+            self.hits += 1
+            return index
+        index += 1
+        if self.keys[index] == key and self.depths[index] != EMPTY_DEPTH:
+            self.hits += 1
+            return index
+        return -1
+
+    def store(self, key, depth, score, bound, move):
+        index = (key % self.bucketCount) * 2
+        if not (self.keys[index] == key or self.depths[index] == EMPTY_DEPTH or
+                self.generations[index] != self.generation or depth >= self.depths[index]):
+            index += 1 # Depth-preferred slot holds a deeper current result, use the always-replace slot
+        self.keys[index] = key
+        self.depths[index] = min(depth, 127)
+        self.scores[index] = score
+        self.bounds[index] = bound
+        self.moves[index] = move
+        self.generations[index] = self.generation
+        self.stores += 1
+
+    def hashfull(self):
+        """
+        Permille of the first 1000 entries used by the current search, as reported by UCI engines
+        """
+        sample = min(1000, len(self.keys))
+        used = sum(1 for i in range(sample)
+                   if self.depths[i] != EMPTY_DEPTH and self.generations[i] == self.generation)
+        return used * 1000 // sample
+
+    def getStats(self):
+        return {"sizeMB": self.sizeMB,
+                "probes": self.probes,
+                "hits": self.hits,
+                "cutoffs": self.cutoffs,
+                "stores": self.stores,
+                "hitRate": self.hits / self.probes if self.probes else 0.0,
+                "cutoffRate": self.cutoffs / self.probes if self.probes else 0.0,
+                "hashfull": self.hashfull()}
@@ -0,0 +1,305 @@
+"""
+UCI (Universal Chess Interface) front-end, plays through stdin and stdout without a window
+Tournament managers and GUIs like cutechess-cli, Arena or Banksia can run it as an engine,
+it only imports the engine modules so it also works on servers without a display or pygame
+The search runs in its own thread, so stop, isready and quit are answered while it thinks
+
+Supported commands:
+uci, isready, ucinewgame, quit
+setoption name Hash value <MB>, setoption name Threads value <workers>
+position startpos|fen <fen> [moves <uci moves>]
+go [depth <plies>] [movetime <ms>] [nodes <count>] [wtime <ms>] [btime <ms>] [winc <ms>] [binc <ms>] [movestogo <moves>]
+go infinite, stop
+go ponder searches without a clock, ponderhit starts the clock with the time budget go ponder was sent with
+
+Usage:
+python Uci.py
+"""
+import sys
+import threading
+
+import ChessEngine
+import Pgn
+import SmartMoveFinder
+
+ENGINE_NAME = "Chess"
+ENGINE_AUTHOR = "Simon Villa Escobar"
+MIN_HASH_MB = 1
+MAX_HASH_MB = 1024
+MAX_THREADS = 64
+MOVES_TO_GO = 30 # Moves the remaining time is split over when the GUI doesn't send movestogo
+MOVE_OVERHEAD = 0.05 # Seconds kept back per move for the GUI and the pipes
+
+
+def uciToMove(gs, validMoves, text):
+    """
+    The move of validMoves written as text in UCI notation, like e2e4 or e7e8q
+    Underpromotions are built from the matching queen promotion
+    Returns: the move, None if it isn't legal
+    """
+    return Pgn.findLegalMove(gs, validMoves, text)
+
+
+def formatScore(score, pvLength):
+    """
+    Score in pawns from the side to move as a UCI score, cp in centipawns or mate in moves
+    The search doesn't keep the distance to mate, the length of the principal variation stands in for it
+    """
+    if abs(score) >= SmartMoveFinder.CHECKMATE:
+        if score > 0:
+            return "mate %d" % max(1, (pvLength + 1) // 2)
+        return "mate -%d" % max(1, pvLength // 2)
+    return "cp %d" % round(score * 100)
+
+
+def parseGoArguments(tokens):
+    """
+    Returns: dict of the go arguments, times stay in milliseconds
+    """
+    arguments = {}
+    index = 0
+    while index < len(tokens):
+        name = tokens[index]
+        if name in ("infinite", "ponder"):
+            arguments[name] = True
+        elif name in ("depth", "movetime", "nodes", "wtime", "btime", "winc", "binc", "movestogo", "mate") and \
+                index + 1 < len(tokens):
+            index += 1
+            arguments[name] = int(tokens[index])
+        elif name == "searchmoves":
+            arguments[name] = tokens[index + 1:]
+            break
+        index += 1
+    return arguments
+
+
+def allocateTime(arguments, whiteToMove):
+    """
+    Seconds to spend on this move from the clock arguments of go, None when there is no clock
+    The remaining time is split over the moves to go, plus most of the increment
+    """
+    remaining = arguments.get("wtime" if whiteToMove else "btime")
+    if remaining is None:
+        return None
+    increment = arguments.get("winc" if whiteToMove else "binc", 0)
+    movesToGo = arguments.get("movestogo") or MOVES_TO_GO
+    budget = remaining / movesToGo + increment * 0.8
+    budget = min(budget, remaining - MOVE_OVERHEAD * 1000)
+    return max(budget / 1000, 0.01)
+
+
+class UciEngine:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.outputLock = threading.Lock() # The search thread and the command loop both write
+        self.gs = ChessEngine.GameState()
+        self.hashSizeMB = SmartMoveFinder.HASH_SIZE_MB
+        self.threads = 1
+        self.searcher = SmartMoveFinder.defaultSearcher
+        self.parallelSearcher = None # ParallelSearch is only imported and started when Threads goes above 1
+        self.searchThread = None
+        self.stopEvent = None
+        self.releaseEvent = None # Lets an infinite or ponder search that already finished send its bestmove
+        self.ponderMovetime = None # Budget of the running ponder search, started by ponderhit
+        self.stopTimer = None
+
+    def send(self, line):
+        with self.outputLock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def run(self, source=sys.stdin):
+        """
+        Reads commands until quit or the end of the input
+        """
+        for line in source:
+            if not self.handleCommand(line):
+                break
+        self.quit()
+
+    def handleCommand(self, line):
+        """
+        Returns: False after quit
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == "quit":
+            return False
+        handler = {"uci": self.uci, "isready": self.isReady, "ucinewgame": self.newGame, "setoption": self.setOption,
+                   "position": self.position, "go": self.go, "stop": self.stop, "ponderhit": self.ponderHit}.get(command)
+        if handler is None:
+            self.send("info string unknown command %s" % command)
+        else:
+            try:
+                handler(arguments)
+            except (ValueError, IndexError, KeyError) as error: # Malformed input must not take the engine down
+                self.send("info string bad command %r: %s" % (line.strip(), error))
+        return True
+
+    def uci(self, arguments):
+        self.send("id name %s" % ENGINE_NAME)
+        self.send("id author %s" % ENGINE_AUTHOR)
+        self.send("option name Hash type spin default %d min %d max %d" % (SmartMoveFinder.HASH_SIZE_MB, MIN_HASH_MB,
+                                                                          MAX_HASH_MB))
+        self.send("option name Threads type spin default 1 min 1 max %d" % MAX_THREADS)
+        self.send("option name Ponder type check default false")
+        self.send("uciok")
+
+    def isReady(self, arguments):
+        self.send("readyok")
+
+    def newGame(self, arguments):
+        self.stop()
+        self.searcher.transpositionTable.clear()
+        self.gs = ChessEngine.GameState()
+
+    def setOption(self, arguments):
+        # setoption name <name, may contain spaces> value <value>
+        if "name" not in arguments:
+            raise ValueError("setoption without a name")
+        nameStart = arguments.index("name") + 1
+        valueStart = arguments.index("value") if "value" in arguments else len(arguments)
+        name = " ".join(arguments[nameStart:valueStart]).lower()
+        value = " ".join(arguments[valueStart + 1:])
+        self.stop()
+        if name == "hash":
+            self.hashSizeMB = min(max(int(value), MIN_HASH_MB), MAX_HASH_MB)
+            self.searcher.transpositionTable.resize(self.hashSizeMB)
+        elif name == "threads":
+            self.threads = min(max(int(value), 1), MAX_THREADS)
+        elif name == "ponder": # Only tells the engine the GUI may send go ponder, nothing to set up
+            pass
+        else:
+            raise ValueError("unknown option %s" % name)
+
+    def position(self, arguments):
+        self.stop()
+        if "moves" in arguments:
+            movesStart = arguments.index("moves")
+            moves = arguments[movesStart + 1:]
+            arguments = arguments[:movesStart]
+        else:
+            moves = []
+        if arguments[:1] == ["startpos"]:
+            gs = ChessEngine.GameState()
+        elif arguments[:1] == ["fen"]:
+            gs = ChessEngine.GameState.from_fen(" ".join(arguments[1:]))
+        else:
+            raise ValueError("position needs startpos or fen")
+        for text in moves:
+            move = uciToMove(gs, gs.getValidMoves(), text)
+            if move is None:
+                raise ValueError("illegal move %s in position %s" % (text, gs.to_fen()))
+            gs.makeMove(move)
+        self.gs = gs
+
+    def go(self, arguments):
+        self.stop()
+        arguments = parseGoArguments(arguments)
+        gs = self.gs.copy()
+        validMoves = gs.getValidMoves()
+        if "searchmoves" in arguments:
+            validMoves = [move for move in validMoves if move.getChessNotation() in arguments["searchmoves"]]
+        infinite = arguments.get("infinite", False)
+        ponder = arguments.get("ponder", False)
+        depth = arguments.get("depth")
+        movetime = arguments["movetime"] / 1000 if "movetime" in arguments else allocateTime(arguments, gs.whiteToMove)
+        nodes = arguments.get("nodes")
+        if "mate" in arguments and depth is None:
+            depth = arguments["mate"] * 2
+        if infinite:
+            depth, movetime, nodes = SmartMoveFinder.MAX_DEPTH, None, None
+        # A ponder search runs on the opponent's time, its clock only starts at ponderhit
+        self.ponderMovetime = movetime if ponder else None
+        if ponder:
+            movetime = None
+            if depth is None and nodes is None:
+                depth = SmartMoveFinder.MAX_DEPTH
+        self.stopEvent = threading.Event()
+        self.releaseEvent = threading.Event()
+        self.searchThread = threading.Thread(target=self.searchWorker,
+                                             args=(gs, validMoves, depth, movetime, nodes, infinite or ponder,
+                                                   self.stopEvent, self.releaseEvent),
+                                             daemon=True)
+        self.searchThread.start()
+
+    def ponderHit(self, arguments):
+        """
+        The opponent played the expected move, the ponder search goes on as a normal search on our clock
+        """
+        if self.searchThread is None:
+            return
+        if self.ponderMovetime is not None:
+            self.stopTimer = threading.Timer(self.ponderMovetime, self.stopEvent.set)
+            self.stopTimer.daemon = True
+            self.stopTimer.start()
+        self.ponderMovetime = None
+        self.releaseEvent.set() # If the search already reached its depth or node limit, bestmove goes out now
+
+    def searchWorker(self, gs, validMoves, depth, movetime, nodes, waitForRelease, stopEvent, releaseEvent):
+        """
+        Runs in the search thread, reports every iteration and ends with bestmove
+        waitForRelease: infinite and ponder searches hold bestmove back until stop or ponderhit
+        """
+        def onIteration(iteration):
+            nps = int(iteration["nodes"] / iteration["seconds"]) if iteration["seconds"] > 0 else 0
+            self.send("info depth %d score %s nodes %d nps %d time %d pv %s" % (
+                iteration["depth"], formatScore(iteration["score"], len(iteration["pv"])), iteration["nodes"], nps,
+                iteration["seconds"] * 1000, " ".join(iteration["pv"])))
+
+        if not validMoves:
+            result = None
+        elif self.threads > 1:
+            result = self.getParallelSearcher().search(gs, validMoves, depth, movetime, nodes, stopEvent, onIteration)
+        else:
+            result = self.searcher.search(gs, validMoves, depth, movetime, nodes, stopEvent, onIteration)
+        if result is not None and (result.fromBook or result.fromTablebase):
+            self.send("info string %s move" % ("book" if result.fromBook else "tablebase"))
+        if waitForRelease: # UCI doesn't allow bestmove before stop or ponderhit in these searches
+            releaseEvent.wait()
+        if result is None or result.bestMove is None:
+            self.send("bestmove 0000")
+        elif len(result.principalVariation) > 1:
+            self.send("bestmove %s ponder %s" % (result.bestMove.getChessNotation(),
+                                                 result.principalVariation[1].getChessNotation()))
+        else:
+            self.send("bestmove %s" % result.bestMove.getChessNotation())
+
+    def getParallelSearcher(self):
+        if self.parallelSearcher is None or self.parallelSearcher.workers != self.threads:
+            import ParallelSearch
+            if self.parallelSearcher is not None:
+                self.parallelSearcher.close()
+            self.parallelSearcher = ParallelSearch.ParallelSearcher(self.threads, self.searcher.book,
+                                                                    self.searcher.tablebases)
+        return self.parallelSearcher
+
+    def stop(self, arguments=None):
+        """
+        Stops the running search and waits for its bestmove
+        """
+        if self.stopTimer is not None:
+            self.stopTimer.cancel()
+            self.stopTimer = None
+        if self.searchThread is not None:
+            self.stopEvent.set()
+            self.releaseEvent.set()
+            self.searchThread.join()
+            self.searchThread = None
+        self.ponderMovetime = None
+
+    def quit(self):
+        self.stop()
+        if self.parallelSearcher is not None:
+            self.parallelSearcher.close()
+            self.parallelSearcher = None
+
+
+def main():
+    UciEngine().run()
+
+
+if __name__ == "__main__":
+    main()
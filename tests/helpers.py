@@ -0,0 +1,33 @@
+"""
+Shared helpers for the tests, positions come from the perft reference list so they cover castling,
+en passant and promotions
+"""
+import random
+
+import ChessEngine
+import Perft
+
+FENS = [fen for name, fen, counts in Perft.REFERENCE_POSITIONS]
+BACKEND_GENERATORS = [(backend, generator) for backend in Perft.BACKENDS for generator in Perft.GENERATORS]
+
+
+def gameStateArgs(backend, generator):
+    return {"boardBackend": Perft.BACKENDS[backend], "moveGeneration": Perft.GENERATORS[generator]}
+
+
+def randomGame(gs, seed, plies=80):
+    """
+    Plays random legal moves on gs until the game ends or plies moves were made
+    Generator, yields gs after every move
+    """
+    rng = random.Random(seed)
+    for _ in range(plies):
+        validMoves = gs.getValidMoves()
+        if not validMoves:
+            return
+        gs.makeMove(rng.choice(validMoves))
+        yield gs
+
+
+def newGameState(fen=Perft.START_FEN, **gameStateArgs):
+    return ChessEngine.GameState.from_fen(fen, **gameStateArgs)
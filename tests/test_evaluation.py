@@ -0,0 +1,63 @@
+"""
+Incremental material and piece-square score against a scan of the whole board
+"""
+import pytest
+
+import SmartMoveFinder
+from tests.helpers import BACKEND_GENERATORS, FENS, gameStateArgs, newGameState, randomGame
+
+
+def incrementalScore(gs):
+    return gs.boardScore / SmartMoveFinder.EVALUATION_SCALE
+
+
+@pytest.mark.parametrize("backend,generator", BACKEND_GENERATORS)
+@pytest.mark.parametrize("fen", FENS)
+def testIncrementalScoreMatchesFullScan(backend, generator, fen):
+    gs = newGameState(fen, **gameStateArgs(backend, generator))
+    gs.setEvaluationTable(SmartMoveFinder.evaluationTable)
+    startScore = gs.boardScore
+    assert incrementalScore(gs) == pytest.approx(SmartMoveFinder.scoreBoardFullScan(gs))
+    for seed in range(3):
+        for _ in randomGame(gs, seed, plies=60):
+            assert incrementalScore(gs) == pytest.approx(SmartMoveFinder.scoreBoardFullScan(gs))
+        while gs.moveLog:
+            gs.undoMove()
+            assert incrementalScore(gs) == pytest.approx(SmartMoveFinder.scoreBoardFullScan(gs))
+        assert gs.boardScore == startScore # Whole tenths, undo gets back exactly
+
+
+def testPromotionScore():
+    gs = newGameState("8/P6k/8/8/8/8/8/K7 w - - 0 1")
+    gs.setEvaluationTable(SmartMoveFinder.evaluationTable)
+    promotion = next(move for move in gs.getValidMoves() if move.isPawnPromotion)
+    gs.makeMove(promotion)
+    assert incrementalScore(gs) == pytest.approx(SmartMoveFinder.scoreBoardFullScan(gs))
+
+
+def testScoreBoardWithoutTableScansTheBoard():
+    gs = newGameState(FENS[1])
+    for _ in randomGame(gs, 1, plies=20):
+        pass
+    assert gs.evaluationTable is None
+    assert SmartMoveFinder.scoreBoard(gs) == pytest.approx(SmartMoveFinder.scoreBoardFullScan(gs))
+
+
+def materialTable():
+    return {color + pieceType: [sign * value * SmartMoveFinder.EVALUATION_SCALE] * 64
+            for color, sign in (('w', 1), ('b', -1)) for pieceType, value in SmartMoveFinder.pieceScore.items()}
+
+
+def testSearcherScoresWithItsOwnTable(monkeypatch):
+    table = materialTable()
+    monkeypatch.setattr(SmartMoveFinder, "VERIFY_INCREMENTAL_EVAL", True) # Every leaf is checked against the table
+    gs = newGameState(FENS[1])
+    searcher = SmartMoveFinder.Searcher(evaluationTable=table)
+    searcher.search(gs, gs.getValidMoves(), depth=2)
+    assert gs.evaluationTable is table
+    for _ in randomGame(gs, 2, plies=30):
+        assert SmartMoveFinder.scoreBoard(gs) == pytest.approx(SmartMoveFinder.scoreBoardTableScan(gs))
+        if not gs.checkmate and not gs.stalemate:
+            material = sum(SmartMoveFinder.pieceScore[piece[1]] * (1 if piece[0] == 'w' else -1)
+                           for row in gs.board for piece in row if piece != '--')
+            assert SmartMoveFinder.scoreBoard(gs) == pytest.approx(material)
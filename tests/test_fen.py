@@ -0,0 +1,62 @@
+"""
+FEN export and import round trips, and the EPD reader built on them
+"""
+import io
+
+import pytest
+
+import ChessEngine
+import Epd
+from tests.helpers import BACKEND_GENERATORS, FENS, gameStateArgs, newGameState, randomGame
+
+
+@pytest.mark.parametrize("fen", FENS)
+def testReferenceFensRoundTrip(fen):
+    assert newGameState(fen).to_fen() == fen
+
+
+@pytest.mark.parametrize("backend,generator", BACKEND_GENERATORS)
+@pytest.mark.parametrize("fen", FENS)
+def testRandomGamePositionsRoundTrip(backend, generator, fen):
+    args = gameStateArgs(backend, generator)
+    gs = newGameState(fen, **args)
+    for _ in randomGame(gs, 0, plies=60):
+        exported = gs.to_fen()
+        loaded = newGameState(exported, **args)
+        assert loaded.to_fen() == exported
+        assert loaded.zobristKey == gs.zobristKey
+        assert sorted(move.moveID for move in loaded.getValidMoves()) == \
+            sorted(move.moveID for move in gs.getValidMoves())
+
+
+def testMoveCountersFollowTheGame():
+    gs = newGameState()
+    for text in ["g1f3", "g8f6", "e2e4"]:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getChessNotation() == text))
+    assert gs.to_fen() == "rnbqkb1r/pppppppp/5n2/8/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq e3 0 2"
+    gs.undoMove()
+    assert gs.to_fen() == "rnbqkb1r/pppppppp/5n2/8/8/5N2/PPPPPPPP/RNBQKB1R w KQkq - 2 2"
+
+
+def testShortFenDefaults():
+    gs = newGameState("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR")
+    assert gs.to_fen() == "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1"
+
+
+@pytest.mark.parametrize("fen", ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w KQkq - 0 1",
+                                 "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1"])
+def testInvalidFenRaises(fen):
+    with pytest.raises(ValueError):
+        ChessEngine.GameState.from_fen(fen)
+
+
+def testEpdPositionsLoad():
+    source = io.StringIO('# comment\n\n'
+                         'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - bm e5f7; id "kiwi";\n'
+                         '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - hmvc 3; fmvn 40;\n')
+    positions = list(Epd.readEpd(source))
+    assert [position.fen for position in positions] == [FENS[1], "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 3 40"]
+    assert positions[0].getOperation("id") == "kiwi"
+    assert positions[0].getOperation("bm") == "e5f7"
+    for position in positions:
+        assert newGameState(position.fen).to_fen() == position.fen
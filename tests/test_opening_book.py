@@ -0,0 +1,77 @@
+"""
+Polyglot keys against the reference values of the Polyglot format description, and lookups in a small book
+"""
+import random
+
+import pytest
+
+import OpeningBook
+from tests.helpers import newGameState
+
+# Moves from the start position and the key of the position after them
+REFERENCE_KEYS = [
+    ([], 0x463b96181691fc9c),
+    (["e2e4"], 0x823c9b50fd114196),
+    (["e2e4", "d7d5"], 0x0756b94461c50fb0),
+    (["e2e4", "d7d5", "e4e5"], 0x662fafb965db29d4),
+    (["e2e4", "d7d5", "e4e5", "f7f5"], 0x22a48b5a8e47ff78),
+    (["e2e4", "d7d5", "e4e5", "f7f5", "e1e2"], 0x652a607ca3f242c1),
+    (["e2e4", "d7d5", "e4e5", "f7f5", "e1e2", "e8f7"], 0x00fdd303c946bdd9),
+    (["a2a4", "b7b5", "h2h4", "b5b4", "c2c4"], 0x3c8123ea7b067637),
+    (["a2a4", "b7b5", "h2h4", "b5b4", "c2c4", "b4c3", "a1a3"], 0x5c3f9b829b279560),
+]
+
+
+def play(gs, moves):
+    for text in moves:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getChessNotation() == text))
+    return gs
+
+
+def rawMove(text):
+    # Polyglot numbers ranks from white's side: to file, to rank, from file, from rank, three bits each
+    files, ranks = "abcdefgh", "12345678"
+    return (files.index(text[2]) | ranks.index(text[3]) << 3 | files.index(text[0]) << 6 |
+            ranks.index(text[1]) << 9)
+
+
+def writeBook(path, entries):
+    with open(path, "wb") as bookFile:
+        for key, text, weight in sorted(entries):
+            bookFile.write(OpeningBook.ENTRY_STRUCT.pack(key, rawMove(text), weight, 0))
+
+
+@pytest.mark.parametrize("moves,key", REFERENCE_KEYS)
+def testReferenceKeys(moves, key):
+    assert OpeningBook.polyglotKey(play(newGameState(), moves)) == key
+
+
+@pytest.mark.parametrize("moves,key", REFERENCE_KEYS)
+def testReferenceKeysFromFen(moves, key):
+    # The en passant file only counts when it can be captured, whatever the FEN says
+    assert OpeningBook.polyglotKey(newGameState(play(newGameState(), moves).to_fen())) == key
+
+
+def testBookLookup(tmp_path):
+    start = newGameState()
+    castling = newGameState("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    path = str(tmp_path / "book.bin")
+    writeBook(path, [(OpeningBook.polyglotKey(start), "e2e4", 3),
+                     (OpeningBook.polyglotKey(start), "d2d4", 1),
+                     (OpeningBook.polyglotKey(start), "e2e5", 9), # Illegal, skipped
+                     (OpeningBook.polyglotKey(castling), "e1h1", 1),
+                     (1, "a2a3", 1), (2 ** 64 - 1, "a2a3", 1)])
+    book = OpeningBook.OpeningBook(path)
+    try:
+        bookMoves = book.getBookMoves(start, start.getValidMoves())
+        assert sorted((move.getChessNotation(), weight) for move, weight in bookMoves) == [("d2d4", 1), ("e2e4", 3)]
+        picks = {book.findMove(start, start.getValidMoves(), random.Random(seed)).getChessNotation()
+                 for seed in range(50)}
+        assert picks == {"d2d4", "e2e4"}
+        # Polyglot writes castling as the king taking its own rook
+        castle = book.findMove(castling, castling.getValidMoves())
+        assert castle.isCastleMove and castle.getChessNotation() == "e1g1"
+        outOfBook = play(newGameState(), ["e2e4"])
+        assert book.findMove(outOfBook, outOfBook.getValidMoves()) is None
+    finally:
+        book.close()
@@ -0,0 +1,72 @@
+"""
+Perft counts of every board backend with every move generator, and the backends against each other
+"""
+import random
+
+import pytest
+
+import Perft
+from tests.helpers import BACKEND_GENERATORS, FENS, gameStateArgs, newGameState
+
+MAX_DEPTH = 3
+CACHED_DEPTH = 2 # The cached perft goes through Move objects and makeMove, slower on every backend
+
+
+def referenceCases(maxDepth):
+    return [(name, fen, depth, counts[depth]) for name, fen, counts in Perft.REFERENCE_POSITIONS
+            for depth in sorted(counts) if depth <= maxDepth]
+
+
+@pytest.mark.parametrize("backend,generator", BACKEND_GENERATORS)
+@pytest.mark.parametrize("name,fen,depth,expected", referenceCases(MAX_DEPTH))
+def testPerftReferenceCounts(backend, generator, name, fen, depth, expected):
+    gs = newGameState(fen, **gameStateArgs(backend, generator))
+    assert Perft.perft(gs, depth) == expected
+    assert gs.to_fen() == newGameState(fen).to_fen()
+
+
+@pytest.mark.parametrize("backend", sorted(Perft.BACKENDS))
+@pytest.mark.parametrize("name,fen,depth,expected", referenceCases(CACHED_DEPTH))
+def testCachedPerftThroughGameState(backend, name, fen, depth, expected):
+    # With a cache the bitboard backend counts through getValidMoves and makeMove instead of its packed moves
+    gs = newGameState(fen, **gameStateArgs(backend, "pin"))
+    assert Perft.perft(gs, depth, cache={}) == expected
+
+
+@pytest.mark.parametrize("fen", FENS)
+def testBackendsAgreeOnRandomGames(fen):
+    games = {combination: newGameState(fen, **gameStateArgs(*combination)) for combination in BACKEND_GENERATORS}
+    reference = games[("list", "pin")]
+    rng = random.Random(fen)
+    for _ in range(60):
+        movesByGame = {combination: gs.getValidMoves() for combination, gs in games.items()}
+        expected = sorted(move.moveID for move in movesByGame[("list", "pin")])
+        for combination, gs in games.items():
+            assert sorted(move.moveID for move in movesByGame[combination]) == expected, combination
+            assert (gs.checkmate, gs.stalemate, gs.inCheck()) == \
+                (reference.checkmate, reference.stalemate, reference.inCheck()), combination
+        if not expected:
+            break
+        moveID = rng.choice(expected)
+        for combination, gs in games.items():
+            gs.makeMove(next(move for move in movesByGame[combination] if move.moveID == moveID))
+            assert gs.to_fen() == reference.to_fen(), combination
+            assert gs.zobristKey == reference.zobristKey, combination
+    for gs in games.values():
+        while gs.moveLog:
+            gs.undoMove()
+        assert gs.to_fen() == newGameState(fen).to_fen()
+
+
+@pytest.mark.parametrize("backend", sorted(Perft.BACKENDS))
+@pytest.mark.parametrize("fen", FENS)
+def testPieceMovesSplitTheLegalMoves(backend, fen):
+    gs = newGameState(fen, **gameStateArgs(backend, "pin"))
+    rng = random.Random(fen)
+    for _ in range(60):
+        validMoves = gs.getValidMoves()
+        pieceMoves = [move for pieceType in "pNBRQK" for move in gs.getPieceMoves(pieceType)]
+        assert sorted(move.moveID for move in pieceMoves) == sorted(move.moveID for move in validMoves)
+        if not validMoves:
+            break
+        gs.makeMove(rng.choice(validMoves))
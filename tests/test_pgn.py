@@ -0,0 +1,107 @@
+"""
+SAN and PGN round trips through the writer, the reader and the replay
+"""
+import io
+
+import pytest
+
+import Pgn
+from tests.helpers import FENS, newGameState, randomGame
+
+
+def playedGame(fen, seed, plies=80):
+    gs = newGameState(fen)
+    for _ in randomGame(gs, seed, plies):
+        pass
+    return gs
+
+
+@pytest.mark.parametrize("fen", FENS)
+@pytest.mark.parametrize("seed", range(3))
+def testWrittenGamesReplay(tmp_path, fen, seed):
+    gs = playedGame(fen, seed)
+    path = str(tmp_path / "games.pgn")
+    writer = Pgn.PgnWriter(path)
+    writer.writeGameState(gs, headers={"Event": "round trip %d" % seed})
+    writer.close()
+    assert gs.moveLog and len(gs.moveLog) <= 80 # writeGameState leaves the game where it was
+    games = list(Pgn.readPgn(path))
+    assert len(games) == 1
+    assert games[0].headers["Event"] == "round trip %d" % seed
+    assert games[0].startFen() == fen
+    replayed = Pgn.replayGame(games[0])
+    assert replayed.to_fen() == gs.to_fen()
+    assert [move.moveID for move in replayed.moveLog] == [move.moveID for move in gs.moveLog]
+
+
+def testSeveralGamesInOneFile():
+    games = [playedGame(fen, 1, plies=30) for fen in FENS]
+    text = "".join(Pgn.formatGame(Pgn.movesToSan(gs.moveLog, fen), "*", startFen=fen) for gs, fen in zip(games, FENS))
+    read = list(Pgn.readPgn(io.StringIO(text)))
+    assert [Pgn.replayGame(game).to_fen() for game in read] == [gs.to_fen() for gs in games]
+
+
+def testReaderSkipsCommentsAndVariations():
+    text = ('[Event "test"]\n[Result "1-0"]\n\n'
+            '1. e4 {best by test} e5 (1... c5 2. Nf3) 2. Nf3 $1 Nc6 ; rest of the line\n'
+            '3. Bb5 a6 1-0\n')
+    game = next(Pgn.readPgn(io.StringIO(text)))
+    assert game.moves == ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"]
+    assert game.result == "1-0"
+
+
+def testSemicolonCommentInsideVariation():
+    text = ('[Event "test"]\n\n'
+            '1. e4 e5 (1... c5 ; the Sicilian (or not\n'
+            '2. Nf3) 2. Nf3 (2. f4 ; gambit)\n'
+            ') Nc6 *\n')
+    game = next(Pgn.readPgn(io.StringIO(text)))
+    assert game.moves == ["e4", "e5", "Nf3", "Nc6"]
+    assert game.result == "*"
+
+
+@pytest.mark.parametrize("fen,san,uci", [
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "O-O", "e1g1"),
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "O-O-O", "e1c1"),
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "Rxa8+", "a1a8"),
+    ("7k/P7/8/8/8/8/8/K7 w - - 0 1", "a8=Q+", "a7a8q"),
+    ("7k/P7/8/8/8/8/8/K7 w - - 0 1", "a8=N", "a7a8n"),
+    ("k7/8/8/8/8/8/4K3/R6R w - - 0 1", "Rad1", "a1d1"),
+    ("1k6/8/8/8/R7/8/8/R3K3 w - - 0 1", "R4a2", "a4a2"),
+    ("1k6/8/8/8/R7/8/8/R3K3 w - - 0 1", "R1a3", "a1a3"),
+    ("8/7k/8/8/8/Q7/8/Q1Q1K3 w - - 0 1", "Qa1b2", "a1b2"),
+    ("rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3", "exd6", "e5d6"),
+])
+def testSanMoves(fen, san, uci):
+    gs = newGameState(fen)
+    move = Pgn.sanToMove(gs, san)
+    assert move.getChessNotation() == uci
+    assert Pgn.movesToSan([uci], fen) == [san]
+
+
+@pytest.mark.parametrize("fen,san", [
+    (FENS[0], "e5"),                                 # Not reachable
+    (FENS[0], "Ke2"),                                # Blocked
+    ("k7/8/8/8/8/8/4K3/R6R w - - 0 1", "Rd1"),       # Ambiguous
+    ("r3k2r/8/8/8/8/8/8/R3KR2 b kq - 0 1", "O-O"),   # Castling through an attacked square
+    ("rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3", "exe6"),
+])
+def testIllegalSanRaises(fen, san):
+    with pytest.raises(ValueError):
+        Pgn.sanToMove(newGameState(fen), san)
+
+
+def testChessMainSavesOnlyWhenAsked(tmp_path, monkeypatch):
+    import ChessMain # pygame is only imported by its main
+    path = tmp_path / "games.pgn"
+    gs = playedGame(FENS[0], 0, plies=10)
+    monkeypatch.setattr(ChessMain, "PGN_FILE", None)
+    ChessMain.saveGame(gs, True, False)
+    assert not path.exists()
+    monkeypatch.setattr(ChessMain, "PGN_FILE", str(path))
+    ChessMain.saveGame(newGameState(), True, False) # Nothing played yet
+    assert not path.exists()
+    ChessMain.saveGame(gs, True, False) # Left before the end, like a reset or a closed window
+    games = list(Pgn.readPgn(str(path)))
+    assert [game.result for game in games] == ["*"]
+    assert Pgn.replayGame(games[0]).to_fen() == gs.to_fen()
@@ -0,0 +1,39 @@
+"""
+Search results on small positions where the right answer is known
+"""
+import pytest
+
+import Perft
+import SmartMoveFinder
+from tests.helpers import newGameState
+
+STALEMATE_TRAP = "7k/8/6K1/8/8/8/8/5Q2 w - - 0 1" # 1.Qf7 leaves black without a move
+
+
+def play(gs, text):
+    gs.makeMove(next(move for move in gs.getValidMoves() if move.getChessNotation() == text))
+    return gs
+
+
+@pytest.mark.parametrize("backend", sorted(Perft.BACKENDS))
+@pytest.mark.parametrize("useQuiescence", [True, False])
+def testStalemateAtTheHorizonIsADraw(backend, useQuiescence):
+    # Depth 1 leaves come without a move list, the quiescence search has to find the stalemate itself
+    gs = newGameState(STALEMATE_TRAP, boardBackend=Perft.BACKENDS[backend])
+    searcher = SmartMoveFinder.Searcher(useQuiescence=useQuiescence)
+    result = searcher.search(gs, gs.getValidMoves(), depth=1)
+    assert result.bestMove.getChessNotation() != "f1f7"
+    play(gs, "f1f7")
+    searcher.setLimits()
+    searcher.searchDepth = 1
+    nextMoves = None if useQuiescence else gs.getValidMoves()
+    score = searcher.findMoveNegaMaxAlphaBeta(gs, nextMoves, 0, -SmartMoveFinder.CHECKMATE, SmartMoveFinder.CHECKMATE, -1)
+    assert score == SmartMoveFinder.STALEMATE
+
+
+@pytest.mark.parametrize("backend", sorted(Perft.BACKENDS))
+def testFindsMateInOne(backend):
+    gs = newGameState(STALEMATE_TRAP, boardBackend=Perft.BACKENDS[backend])
+    result = SmartMoveFinder.Searcher().search(gs, gs.getValidMoves(), depth=2)
+    assert result.bestMove.getChessNotation() == "f1f8"
+    assert result.score >= SmartMoveFinder.CHECKMATE
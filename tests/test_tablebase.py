@@ -0,0 +1,176 @@
+"""
+Retrograde tables against independent checks: hexapawn against a plain recursive solve of the whole game,
+the Gardner rook endgames against known positions and against the probes of their own children
+"""
+import random
+
+import pytest
+
+import ChessEngine
+import Tablebase
+
+
+def hexapawnGameState():
+    gs = ChessEngine.GameState(gameMode=ChessEngine.HEXAPAWN)
+    gs.toHexapawn()
+    return gs
+
+
+def solveByHand(gs, solved):
+    """
+    (result, distance) for the side to move by negamax over the whole game tree, memoized on the FEN
+    Fastest win, slowest loss, like the table
+    """
+    fen = gs.to_fen()
+    if fen in solved:
+        return solved[fen]
+    moves = gs.getValidMoves()
+    if gs.checkmate:
+        solved[fen] = (Tablebase.LOSS, 0)
+    elif gs.stalemate:
+        solved[fen] = (Tablebase.DRAW, 0)
+    else:
+        children = []
+        for move in moves:
+            gs.makeMove(move)
+            children.append(solveByHand(gs, solved))
+            gs.undoMove()
+        lossDistances = [distance for result, distance in children if result == Tablebase.LOSS]
+        if lossDistances:
+            solved[fen] = (Tablebase.WIN, min(lossDistances) + 1)
+        elif all(result == Tablebase.WIN for result, distance in children):
+            solved[fen] = (Tablebase.LOSS, max(distance for result, distance in children) + 1)
+        else:
+            solved[fen] = (Tablebase.DRAW, 0)
+    return solved[fen]
+
+
+@pytest.fixture(scope="module")
+def tablebases(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("tablebases")
+    Tablebase.generateHexapawn(str(directory))
+    tables = Tablebase.Tablebases(str(directory))
+    yield tables
+    tables.close()
+
+
+def testEveryPositionMatchesTheRecursiveSolve(tablebases):
+    gs = hexapawnGameState()
+    solved = {}
+    solveByHand(gs, solved)
+    probed = 0
+    for fen, expected in solved.items():
+        gs.setFen(fen)
+        probe = tablebases.probe(gs)
+        if probe is not None: # Finished games with a queen on the board are not stored
+            assert probe == expected, fen
+            probed += 1
+    assert probed > 50
+
+
+def testStartPositionIsLostForWhite(tablebases):
+    gs = hexapawnGameState()
+    assert tablebases.probe(gs)[0] == Tablebase.LOSS
+
+
+def testFindMoveKeepsTheResult(tablebases):
+    # Playing the table's move on both sides never changes the result, and the game ends on time
+    gs = hexapawnGameState()
+    result, distance = tablebases.probe(gs)
+    while distance > 0:
+        move, rootResult, rootDistance = tablebases.findMove(gs, gs.getValidMoves())
+        assert (rootResult, rootDistance) == (result, distance)
+        gs.makeMove(move)
+        probed = tablebases.probeAfterMove(gs)
+        result = {Tablebase.WIN: Tablebase.LOSS, Tablebase.LOSS: Tablebase.WIN}[result]
+        assert probed == (result, distance - 1)
+        distance -= 1
+    gs.getValidMoves()
+    assert gs.checkmate
+
+
+ROOK_ENDGAMES = (('wK', 'bK', 'wR'), ('wK', 'bK', 'bR'))
+
+
+def gardnerGameState(fen):
+    gs = ChessEngine.GameState(gameMode=ChessEngine.GARDNER)
+    gs.toGardner()
+    gs.setFen(fen)
+    return gs
+
+
+def mirrorFen(fen):
+    # Upside down with the colors swapped, the same position for the other side
+    fields = fen.split()
+    ranks = [rank.swapcase() for rank in reversed(fields[0].split('/'))]
+    return "%s %s - - 0 1" % ('/'.join(ranks), 'b' if fields[1] == 'w' else 'w')
+
+
+@pytest.fixture(scope="module")
+def gardnerTablebases(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("gardner")
+    for pieces in ROOK_ENDGAMES:
+        Tablebase.generateGardnerEndgame(str(directory), pieces)
+    tables = Tablebase.Tablebases(str(directory))
+    yield tables
+    tables.close()
+
+
+@pytest.mark.parametrize("fen,expected", [
+    ("k4/2R2/1K3/5/5 w - - 0 1", (Tablebase.WIN, 1)),  # Rc5 mate
+    ("k1R2/5/1K3/5/5 b - - 0 1", (Tablebase.LOSS, 0)), # Mated
+    ("k4/1R3/5/5/4K b - - 0 1", (Tablebase.DRAW, 0)),  # Kxb4 leaves bare kings
+    ("k4/1R3/5/5/4K w - - 0 1", (Tablebase.WIN, None)),
+])
+def testKnownRookEndgames(gardnerTablebases, fen, expected):
+    for position in (fen, mirrorFen(fen)):
+        probe = gardnerTablebases.probe(gardnerGameState(position))
+        assert probe is not None and probe[0] == expected[0], position
+        if expected[1] is not None:
+            assert probe[1] == expected[1], position
+
+
+def testRookEndgamesAgreeWithTheirChildren(gardnerTablebases):
+    # A win has a move to a loss one ply sooner, a loss only has moves to wins, the slowest one ply later,
+    # a draw has no move to a loss; the black rook table has to give the mirrored answer
+    rng = random.Random(0)
+    checked = 0
+    while checked < 300:
+        pieces = ROOK_ENDGAMES[checked % 2]
+        squares = rng.sample(range(Tablebase.GARDNER_SIZE ** 2), len(pieces))
+        fen = Tablebase.gardnerFen(Tablebase.GARDNER_SIZE, pieces, squares, rng.random() < 0.5)
+        gs = gardnerGameState(fen)
+        probe = gardnerTablebases.probe(gs)
+        if probe is None: # The side that just moved is in check, not a legal position
+            continue
+        result, distance = probe
+        moves = gs.getValidMoves()
+        children = []
+        for move in moves:
+            gs.makeMove(move)
+            children.append(gardnerTablebases.probeAfterMove(gs))
+            gs.undoMove()
+        assert None not in children, fen
+        losses = [childDistance for childResult, childDistance in children if childResult == Tablebase.LOSS]
+        if result == Tablebase.WIN:
+            assert min(losses) == distance - 1, fen
+        elif result == Tablebase.LOSS:
+            assert all(childResult == Tablebase.WIN for childResult, childDistance in children), fen
+            assert max([childDistance + 1 for childResult, childDistance in children] or [0]) == distance, fen
+        else:
+            assert not losses, fen
+        assert gardnerTablebases.probe(gardnerGameState(mirrorFen(fen))) == probe, fen
+        checked += 1
+
+
+def testTableHeaderIsChecked(tmp_path):
+    path, positions = Tablebase.generateHexapawn(str(tmp_path))
+    with open(path, "rb") as tableFile:
+        data = tableFile.read()
+    truncated = tmp_path / "truncated.tb"
+    truncated.write_bytes(data[:-2])
+    wrongMagic = tmp_path / "magic.tb"
+    wrongMagic.write_bytes(b"XXXX" + data[4:])
+    for badPath in (truncated, wrongMagic):
+        with pytest.raises(ValueError):
+            Tablebase.Tablebase(str(badPath))
@@ -0,0 +1,57 @@
+"""
+Incremental Zobrist keys against a full recompute
+"""
+import pytest
+
+from tests.helpers import BACKEND_GENERATORS, FENS, gameStateArgs, newGameState, randomGame
+
+
+@pytest.mark.parametrize("backend,generator", BACKEND_GENERATORS)
+@pytest.mark.parametrize("fen", FENS)
+def testIncrementalKeyMatchesRecompute(backend, generator, fen):
+    gs = newGameState(fen, **gameStateArgs(backend, generator))
+    keys = [gs.zobristKey]
+    for seed in range(3):
+        for _ in randomGame(gs, seed, plies=40):
+            assert gs.zobristKey == gs.computeZobristKey()
+            keys.append(gs.zobristKey)
+        while gs.moveLog: # Undo restores every key on the way back
+            assert gs.zobristKey == keys.pop()
+            gs.undoMove()
+            assert gs.zobristKey == gs.computeZobristKey()
+        assert keys == [gs.zobristKey]
+
+
+def testVerifyZobristModeAcceptsRandomGames():
+    gs = newGameState(FENS[1], verifyZobrist=True)
+    for _ in randomGame(gs, 0):
+        pass
+
+
+def testTranspositionsShareAKey():
+    first = newGameState()
+    second = newGameState()
+    for gs, moves in ((first, ["g1f3", "g8f6", "b1c3", "b8c6"]), (second, ["b1c3", "b8c6", "g1f3", "g8f6"])):
+        for text in moves:
+            gs.makeMove(next(move for move in gs.getValidMoves() if move.getChessNotation() == text))
+    assert first.zobristKey == second.zobristKey
+    # Knights out and back gives the start position again, the move counters are not hashed
+    for text in ["f3g1", "f6g8", "c3b1", "c6b8"]:
+        first.makeMove(next(move for move in first.getValidMoves() if move.getChessNotation() == text))
+    assert first.zobristKey == newGameState().zobristKey
+
+
+@pytest.mark.parametrize("other", [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR b KQkq - 0 1", # Side to move
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w Qkq - 0 1",  # Castling rights
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQk - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1",
+])
+def testKeyDependsOnStateOutsideTheBoard(other):
+    assert newGameState(other).zobristKey != newGameState().zobristKey
+
+
+def testKeyDependsOnEnpassantSquare():
+    withSquare = newGameState("rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3")
+    withoutSquare = newGameState("rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq - 0 3")
+    assert withSquare.zobristKey != withoutSquare.zobristKey